@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+评论树遍历基准测试
+
+在 1k / 10k / 100k 条评论的合成评论树上测量遍历、计数和格式化的
+耗时与峰值内存，验证两者都随评论数线性增长。评论树混合了
+宽分支和很深的单链，不依赖网络。
+"""
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reddit_translator import TranslationConfig, EnhancedRedditMCP, iter_comment_tree, count_comments
+
+SIZES = (1_000, 10_000, 100_000)
+
+
+def make_tree(size: int, seed: int = 42):
+    """生成 size 条评论的合成评论树，其中约 10% 组成一条深链"""
+    rng = random.Random(seed)
+    nodes = []
+    roots = []
+    chain_length = size // 10
+    for i in range(size):
+        comment = {
+            "id": f"c{i}",
+            "author": f"user{i % 500}",
+            "body": f"Synthetic comment {i} with a few words of text.",
+            "score": rng.randint(0, 500),
+            "created_utc": 1703124000 + i,
+            "replies": []
+        }
+        if i == 0 or (i >= chain_length and rng.random() < 0.05):
+            roots.append(comment)
+        elif i < chain_length:
+            nodes[-1]["replies"].append(comment)
+        else:
+            rng.choice(nodes)["replies"].append(comment)
+        nodes.append(comment)
+    return roots
+
+
+def measure(label: str, func):
+    """返回 (结果, 耗时, 峰值内存)；耗时单独测量，不受 tracemalloc 影响"""
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    reddit_mcp = EnhancedRedditMCP(TranslationConfig(enabled=False))
+    print("🏁 评论树基准测试")
+    print(f"{'评论数':>8} | {'最大深度':>8} | {'遍历':>9} | {'计数':>9} | {'格式化':>9} | {'格式化峰值内存':>12}")
+    for size in SIZES:
+        tree = make_tree(size)
+        depth, t_iter, _ = measure("遍历", lambda: max(d for _, d in iter_comment_tree(tree)))
+        total, t_count, _ = measure("计数", lambda: count_comments(tree))
+        assert total == size
+        _, t_format, peak = measure("格式化", lambda: reddit_mcp.format_comments(tree))
+        print(
+            f"{size:>8} | {depth:>8} | {t_iter * 1000:7.1f}ms | {t_count * 1000:7.1f}ms | "
+            f"{t_format * 1000:7.1f}ms | {peak / 1024 / 1024:10.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+语言检测基准测试
+
+在 1M 条合成短评论上对比:
+- 旧实现：每条文本两次 re.findall（未预编译），按中文字符比例判断
+- should_translate_text：单遍查表分类，纯 ASCII 文本走快速路径
+- should_translate_many：整批判断
+
+评论构成约为 85% 纯 ASCII 英文、5% 含表情或弯引号的英文、5% 中文、3% 日文、2% 韩文。
+同时统计各实现判定为“需要翻译”的非英文评论数（白白花钱翻译的部分）。不依赖网络。
+"""
+
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reddit_translator import should_translate_text, should_translate_many
+
+COMMENT_COUNT = 1_000_000
+BATCH_SIZE = 500
+
+ENGLISH = [
+    "This is the best answer in the thread.", "Source?", "This.", "[deleted]",
+    "I had the same problem with the async runtime last week.", "Thanks, that fixed it for me!",
+    "Can confirm, the new release is noticeably faster.", "lol", "Why would anyone do this in production?",
+]
+ENGLISH_UNICODE = ["I ❤️ this framework", "That’s a “feature”, not a bug", "Great work 👍", "Naïve café benchmark"]
+CHINESE = ["这个框架的设计很有意思", "谢谢分享，学到了", "同意楼上的看法", "性能提升很明显"]
+JAPANESE = ["これはすごいですね", "ありがとうございます", "東京で試してみました", "このライブラリは便利です"]
+KOREAN = ["정말 유용한 정보네요", "감사합니다", "저도 같은 문제가 있었어요"]
+
+
+def legacy_should_translate(text: str) -> bool:
+    """旧实现（原样保留用于对比）"""
+    if not text or len(text.strip()) < 3:
+        return False
+    chinese_chars = len(re.findall(r'[一-鿿]', text))
+    total_chars = len(re.findall(r'[\w一-鿿]', text))
+    if total_chars == 0:
+        return False
+    return chinese_chars / total_chars < 0.3
+
+
+def make_comments(count: int, seed: int = 11):
+    rng = random.Random(seed)
+    pools = [(ENGLISH, 0.85, "en"), (ENGLISH_UNICODE, 0.05, "en"), (CHINESE, 0.05, "zh"),
+             (JAPANESE, 0.03, "ja"), (KOREAN, 0.02, "ko")]
+    cum_weights = []
+    total = 0.0
+    for _, weight, _ in pools:
+        total += weight
+        cum_weights.append(total)
+    comments = []
+    labels = []
+    for pool, _, label in rng.choices(pools, cum_weights=cum_weights, k=count):
+        # 加上序号避免所有字符串都是同一个对象
+        comments.append(f"{rng.choice(pool)} #{len(comments)}")
+        labels.append(label)
+    return comments, labels
+
+
+def run(name: str, fn, comments, labels):
+    start = time.perf_counter()
+    decisions = fn(comments)
+    elapsed = time.perf_counter() - start
+    wasted = sum(1 for decision, label in zip(decisions, labels) if decision and label != "en")
+    missed = sum(1 for decision, label in zip(decisions, labels) if not decision and label == "en")
+    print(f"{name:<24} {elapsed:6.2f} s | {elapsed / len(comments) * 1e9:6.0f} ns/条 | "
+          f"误翻非英文 {wasted:>7} | 漏翻英文 {missed:>5}")
+
+
+def main():
+    comments, labels = make_comments(COMMENT_COUNT)
+    print(f"🏁 语言检测基准测试: {COMMENT_COUNT:,} 条短评论")
+    run("旧实现 re.findall", lambda texts: [legacy_should_translate(t) for t in texts], comments, labels)
+    run("should_translate_text", lambda texts: [should_translate_text(t) for t in texts], comments, labels)
+    run("should_translate_many", lambda texts: [
+        decision
+        for start in range(0, len(texts), BATCH_SIZE)
+        for decision in should_translate_many(texts[start:start + BATCH_SIZE])
+    ], comments, labels)
+
+
+if __name__ == "__main__":
+    main()
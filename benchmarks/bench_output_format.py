@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+输出格式基准测试
+
+在合成的大帖子（默认 2,000 条评论，译文字段已填好，不调用翻译接口）上比较
+fetch_post_details 各 output_format 的输出大小和渲染耗时，并在 1/4、1/2 和全部评论数上
+测量每条评论的渲染耗时，检查格式化是线性的:
+
+    python benchmarks/bench_output_format.py --comments 2000 --runs 5
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from bench_suite import make_post
+from reddit_translator import (
+    EnhancedRedditMCP, TranslationConfig, OUTPUT_FORMATS, JSON_OUTPUT_LANGUAGES,
+    iter_comment_tree, count_comments, render_json
+)
+
+
+def add_translations(post: dict, comments: list):
+    """模拟翻译完成后的帖子：每个文本字段旁加上 *_zh 译文"""
+    post["title_zh"] = "译文:" + post["title"]
+    if post["selftext"]:
+        post["selftext_zh"] = "译文:" + post["selftext"]
+    for comment, _ in iter_comment_tree(comments):
+        comment["body_zh"] = "译文:" + comment["body"]
+
+
+def render(reddit_mcp: EnhancedRedditMCP, post: dict, comments: list, output_format: str) -> str:
+    """与 run_tool 中 fetch_post_details 相同的输出拼装方式"""
+    max_comments = count_comments(comments)
+    languages = JSON_OUTPUT_LANGUAGES.get(output_format)
+    if languages is not None:
+        return render_json({
+            "post": reddit_mcp.post_to_json(post, languages),
+            "comment_count": max_comments,
+            "comments": reddit_mcp.comments_to_json(comments, languages, None, max_comments)
+        })
+    return "".join([
+        f"📖 帖子详情:\n\n{reddit_mcp.format_post(post)}\n\n",
+        f"💬 评论区 (共 {max_comments} 条):\n\n",
+        reddit_mcp.format_comments(comments, True, None, max_comments)
+    ])
+
+
+def measure(reddit_mcp, post, comments, output_format, runs) -> tuple:
+    """返回 (输出字节数, 渲染耗时中位数秒)"""
+    timings = []
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        text = render(reddit_mcp, post, comments, output_format)
+        timings.append(time.perf_counter() - started_at)
+    return len(text.encode("utf-8")), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="output_format 输出大小和渲染耗时基准测试")
+    parser.add_argument("--comments", type=int, default=2000, help="合成帖子的评论数")
+    parser.add_argument("--runs", type=int, default=5, help="每种格式渲染的次数，取中位数")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    reddit_mcp = EnhancedRedditMCP(TranslationConfig(enabled=False))
+    post, comments = make_post(random.Random(args.seed), "bench", "programming", args.comments)
+    add_translations(post, comments)
+
+    print(f"📏 {args.comments} 条评论的帖子详情（{args.runs} 次中位数）")
+    text_bytes = None
+    for output_format in OUTPUT_FORMATS:
+        size, seconds = measure(reddit_mcp, post, comments, output_format, args.runs)
+        text_bytes = text_bytes or size
+        print(f"   {output_format:<17} {size / 1024:9.1f} KB ({size / text_bytes:6.1%})  {seconds * 1000:8.2f} ms")
+
+    # 评论数翻倍时每条评论的渲染耗时应基本不变
+    print("\n📈 每条评论的渲染耗时:")
+    for count in (args.comments // 4, args.comments // 2, args.comments):
+        sub_post, sub_comments = make_post(random.Random(args.seed), "bench", "programming", count)
+        add_translations(sub_post, sub_comments)
+        for output_format in ("text", "json"):
+            _, seconds = measure(reddit_mcp, sub_post, sub_comments, output_format, args.runs)
+            print(f"   {count:>6} 条 {output_format:<5} {seconds / count * 1e6:8.2f} µs/条")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+帖子详情翻译基准测试
+
+对一个 100 条评论的合成帖子测量 fetch_post_details 的 p50/p99 耗时:
+- 逐字段顺序翻译（旧实现：标题、正文、每条评论依次 await）
+- 收集全部字段后批量并发翻译（当前实现）
+
+使用本地模拟的 Google gtx 接口（带固定延迟），无需联网。
+"""
+
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_session_pool import start_mock_google
+from reddit_translator import TranslationConfig, EnhancedRedditMCP
+
+COMMENT_COUNT = 100
+ROUNDS = 20
+LATENCY = 0.02
+
+
+def make_thread(post_id: str, comment_count: int):
+    """生成带一层回复的合成帖子和评论"""
+    thread = {
+        "id": post_id,
+        "title": "Synthetic benchmark thread about async translation",
+        "author": "bench_user",
+        "score": 100,
+        "num_comments": comment_count,
+        "created_utc": 1703123456,
+        "url": f"https://reddit.com/r/programming/comments/{post_id}",
+        "selftext": "This is the body of a synthetic benchmark thread.",
+        "subreddit": "programming",
+        "post_hint": "self"
+    }
+    comments = []
+    for i in range(comment_count // 2):
+        comments.append({
+            "id": f"c{i}",
+            "author": f"user{i}",
+            "body": f"Top level comment number {i} with some words.",
+            "score": i,
+            "created_utc": 1703124000,
+            "replies": [{
+                "id": f"r{i}",
+                "author": f"replier{i}",
+                "body": f"Reply number {i} to the comment above.",
+                "score": i,
+                "created_utc": 1703124300
+            }]
+        })
+    return thread, comments
+
+
+async def sequential_post_details(reddit_mcp: EnhancedRedditMCP, post_id: str):
+    """旧实现：逐个字段顺序翻译"""
+    manager = reddit_mcp.translation_manager
+    thread = reddit_mcp.find_post(post_id)
+    thread["title_zh"] = await manager.translate_text(thread["title"])
+    thread["selftext_zh"] = await manager.translate_text(thread["selftext"])
+    for comment in thread["comments"]:
+        comment["body_zh"] = await manager.translate_text(comment["body"])
+        for reply in comment.get("replies", []):
+            reply["body_zh"] = await manager.translate_text(reply["body"])
+    return thread
+
+
+def percentile(values: list, pct: float) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))
+    return values[index]
+
+
+async def measure(name: str, func):
+    durations = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            await func()
+        durations.append(time.perf_counter() - start)
+    print(f"{name:<16} p50 {percentile(durations, 50) * 1000:8.1f} ms | p99 {percentile(durations, 99) * 1000:8.1f} ms")
+
+
+async def main():
+    runner, endpoint = await start_mock_google(latency=LATENCY)
+    try:
+        config = TranslationConfig(
+            service="google", endpoint=endpoint,
+            cache_enabled=False, persistent_cache_enabled=False, rate_limit_requests_per_second=0
+        )
+        reddit_mcp = EnhancedRedditMCP(config)
+        thread, comments = make_thread("bench1", COMMENT_COUNT)
+        reddit_mcp.add_post(thread, comments)
+
+        print(f"🏁 帖子详情基准测试: {COMMENT_COUNT} 条评论, 模拟延迟 {LATENCY * 1000:.0f} ms, {ROUNDS} 轮")
+        await measure("逐字段顺序翻译", lambda: sequential_post_details(reddit_mcp, "bench1"))
+        await measure("批量并发翻译", lambda: reddit_mcp.fetch_post_details("bench1"))
+        await reddit_mcp.close()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+帖子查找基准测试
+
+向 EnhancedRedditMCP 加入 1k / 10k / 100k 个合成帖子，测量按 ID 查找
+（find_post）的平均耗时，验证查找耗时不随帖子数量增长。不依赖网络。
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reddit_translator import TranslationConfig, EnhancedRedditMCP
+
+SIZES = (1_000, 10_000, 100_000)
+LOOKUPS = 10_000
+
+
+def main():
+    rng = random.Random(1)
+    print("🏁 帖子查找基准测试")
+    reddit_mcp = EnhancedRedditMCP(TranslationConfig(enabled=False))
+    added = 0
+    for size in SIZES:
+        while added < size:
+            reddit_mcp.add_post({
+                "id": f"p{added}",
+                "title": f"Synthetic post {added}",
+                "author": "bench_user",
+                "score": 1,
+                "num_comments": 0,
+                "created_utc": 1703123456,
+                "url": f"https://reddit.com/comments/p{added}",
+                "selftext": "",
+                "subreddit": f"sub{added % 50}",
+                "post_hint": "self"
+            })
+            added += 1
+        ids = [f"p{rng.randrange(size)}" for _ in range(LOOKUPS)]
+        start = time.perf_counter()
+        for post_id in ids:
+            reddit_mcp.find_post(post_id)
+        elapsed = (time.perf_counter() - start) / LOOKUPS
+        print(f"{size:>8} 个帖子: 平均每次查找 {elapsed * 1e6:6.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+服务商限流基准测试
+
+本地模拟一个每秒最多接受 CEILING 个请求的 Google gtx 接口，超出时返回 429。
+对比不限流和按略低于上限的速度限流时的吞吐量、429 次数和失败条数。
+
+使用本地模拟接口，无需联网。
+"""
+
+import asyncio
+import collections
+import os
+import sys
+import time
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reddit_translator import TranslationConfig, TranslationManager, get_rate_limit_stats
+
+CEILING = 50  # 模拟接口每秒允许的请求数
+TEXT_COUNT = 150
+CONCURRENCY = 20
+
+
+async def start_quota_google(ceiling: int):
+    """启动有 QPS 上限的模拟 Google 翻译接口（1 秒滑动窗口）"""
+    window = collections.deque()
+    stats = {"accepted": 0, "rejected": 0}
+
+    async def handle(request):
+        now = time.monotonic()
+        while window and now - window[0] >= 1.0:
+            window.popleft()
+        if len(window) >= ceiling:
+            stats["rejected"] += 1
+            return web.Response(status=429, headers={"Retry-After": "1"})
+        window.append(now)
+        stats["accepted"] += 1
+        await asyncio.sleep(0.005)
+        text = request.query.get("q", "")
+        return web.json_response([[[f"译文:{text}", text, None, None, 1]], None, "en"])
+
+    app = web.Application()
+    app.router.add_get("/translate_a/single", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/translate_a/single", stats
+
+
+async def run(name: str, requests_per_second: float):
+    runner, endpoint, stats = await start_quota_google(CEILING)
+    try:
+        config = TranslationConfig(
+            service="google", endpoint=endpoint, cache_enabled=False, persistent_cache_enabled=False,
+            concurrent_requests=CONCURRENCY, rate_limit_requests_per_second=requests_per_second,
+            rate_limit_burst=5
+        )
+        texts = [f"Rate limit benchmark sentence {i}." for i in range(TEXT_COUNT)]
+        async with TranslationManager(config) as manager:
+            start = time.perf_counter()
+            results = await manager.translate_batch(texts)
+            wall = time.perf_counter() - start
+        translated = sum(1 for text, result in zip(texts, results) if result != text)
+        limiter = get_rate_limit_stats()["google"]
+        print(
+            f"{name:<10} 成功 {translated:>4}/{TEXT_COUNT} | 吞吐 {translated / wall:6.1f} 条/s | "
+            f"429 {stats['rejected']:>4} 次 | 总耗时 {wall:5.2f} s | "
+            f"排队等待 平均 {limiter['wait_avg'] * 1000:6.1f} ms 最大 {limiter['wait_max'] * 1000:6.1f} ms"
+        )
+    finally:
+        await runner.cleanup()
+
+
+async def main():
+    print(f"🏁 限流基准测试: {TEXT_COUNT} 条文本，接口上限 {CEILING} 请求/秒，并发 {CONCURRENCY}")
+    await run("不限流", 0)
+    await run("限流 90%", CEILING * 0.9)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+搜索基准测试
+
+在 10k / 100k 个合成帖子上对比:
+- 旧实现：遍历全部帖子，对标题和正文做 .lower() 和子串匹配
+- 倒排索引 + BM25（PostSearchIndex）
+
+同时报告索引的构建耗时。不依赖网络。
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reddit_translator import PostSearchIndex
+
+SIZES = (10_000, 100_000)
+QUERIES = ["python performance", "rust async runtime", "javascript framework release", "gpu memory"]
+REPEAT = 20
+
+TOPIC_WORDS = (
+    "python rust javascript typescript golang java kotlin framework library release performance "
+    "memory gpu cpu async runtime compiler benchmark database query index cache network latency"
+).split()
+
+
+def make_vocabulary(rng: random.Random, size: int = 20_000):
+    """生成合成词表，词频近似 Zipf 分布，主题词混在高频区"""
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = ["".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(size)]
+    for i, word in enumerate(TOPIC_WORDS):
+        words[50 + i * 37] = word
+    weights = [1 / (rank + 1) for rank in range(size)]
+    cumulative = []
+    total = 0.0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return words, cumulative
+
+
+def make_posts(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    words, cumulative = make_vocabulary(rng)
+    subreddits = ["programming", "python", "rust", "MachineLearning", "webdev"]
+    posts = []
+    for i in range(count):
+        posts.append({
+            "id": f"p{i}",
+            "title": " ".join(rng.choices(words, cum_weights=cumulative, k=10)).capitalize(),
+            "selftext": " ".join(rng.choices(words, cum_weights=cumulative, k=80)),
+            "subreddit": rng.choice(subreddits)
+        })
+    return posts
+
+
+def linear_search(posts, query):
+    """旧实现的搜索逻辑"""
+    results = []
+    search_terms = query.lower().split()
+    for thread in posts:
+        title_lower = thread["title"].lower()
+        content_lower = thread["selftext"].lower()
+        if any(term in title_lower or term in content_lower for term in search_terms):
+            results.append(thread.copy())
+    return results
+
+
+def timed(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    print("🏁 搜索基准测试（每次查询平均耗时）")
+    for size in SIZES:
+        posts = make_posts(size)
+        start = time.perf_counter()
+        index = PostSearchIndex()
+        for post in posts:
+            index.add(post)
+        build = time.perf_counter() - start
+        print(f"\n{size} 个帖子，索引构建 {build:.2f} s")
+        for query in QUERIES:
+            scan = timed(lambda: linear_search(posts, query), max(1, REPEAT // 10))
+            or_search = timed(lambda: index.search(query, limit=50), REPEAT)
+            and_search = timed(lambda: index.search(query, match_all=True, limit=50), REPEAT)
+            print(
+                f"  {query:<30} 线性扫描 {scan * 1000:8.1f} ms | "
+                f"索引 OR {or_search * 1000:7.1f} ms | 索引 AND {and_search * 1000:7.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
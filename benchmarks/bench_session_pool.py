@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+连接池基准测试
+
+对比两种 HTTP 会话策略下单条文本的翻译延迟:
+- 每次调用新建 aiohttp.ClientSession（旧实现）
+- TranslationManager 持有的进程级共享连接池
+
+使用本地模拟的 Google gtx 接口，无需联网。
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reddit_translator import TranslationConfig, TranslationManager, GoogleTranslator
+
+TEXT_COUNT = 200
+CONCURRENCY = 20
+
+
+async def start_mock_google(latency: float = 0.002):
+    """启动本地模拟的 Google 翻译接口"""
+    async def handle(request):
+        await asyncio.sleep(latency)
+        text = request.query.get("q", "")
+        return web.json_response([[[f"译文:{text}", text, None, None, 1]], None, "en"])
+
+    app = web.Application()
+    app.router.add_get("/translate_a/single", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/translate_a/single"
+
+
+def summarize(name: str, latencies: list, wall: float) -> str:
+    """格式化延迟统计"""
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    mean = statistics.mean(latencies) * 1000
+    return f"{name:<12} 平均 {mean:7.2f} ms | p50 {p50:7.2f} ms | p99 {p99:7.2f} ms | 总耗时 {wall:6.2f} s"
+
+
+async def bench_per_call(config: TranslationConfig, texts: list, concurrency: int):
+    """旧实现：每条文本新建一个会话"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(text):
+        async with semaphore:
+            start = time.perf_counter()
+            async with GoogleTranslator(config) as translator:
+                await translator.translate(text)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(t) for t in texts))
+    return latencies, time.perf_counter() - start
+
+
+async def bench_pooled(config: TranslationConfig, texts: list, concurrency: int):
+    """新实现：共享连接池"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with TranslationManager(config) as manager:
+        async def one(text):
+            async with semaphore:
+                start = time.perf_counter()
+                await manager.translate_text(text)
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(t) for t in texts))
+        return latencies, time.perf_counter() - start
+
+
+async def main():
+    runner, endpoint = await start_mock_google()
+    try:
+        config = TranslationConfig(
+            service="google", endpoint=endpoint, cache_enabled=False, rate_limit_requests_per_second=0
+        )
+        texts = [f"Benchmark comment number {i} about connection pooling." for i in range(TEXT_COUNT)]
+
+        print(f"🏁 连接池基准测试: {TEXT_COUNT} 条文本")
+        for concurrency in (1, CONCURRENCY):
+            print(f"\n并发数 {concurrency}:")
+            latencies, wall = await bench_per_call(config, texts, concurrency)
+            print(summarize("每次新建会话", latencies, wall))
+            latencies, wall = await bench_pooled(config, texts, concurrency)
+            print(summarize("共享连接池", latencies, wall))
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+启动耗时基准测试
+
+MCP 客户端每个会话都会启动一次 reddit_translator.py，启动耗时就是用户可感知的延迟。测量三项:
+
+- import:     子进程中 `import reddit_translator` 的耗时（`python -X importtime` 的累计值），
+              并列出自身耗时最多的模块，检查 aiohttp / mcp / translate 没有被提前导入
+- handshake:  启动 MCP 服务器到收到 initialize 响应的耗时
+- first_call: 握手完成后第一次工具调用（演示数据，不翻译）的耗时
+
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 500
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+SERVER_SCRIPT = os.path.join(REPO_DIR, "reddit_translator.py")
+
+# 导入 reddit_translator 时不应加载的重依赖
+LAZY_MODULES = ("aiohttp", "mcp", "translate")
+
+# 默认时间预算（秒），test_translation.py 中的启动测试有自己的一份相同数值（STARTUP_*_BUDGET），修改时同步
+IMPORT_BUDGET = 0.5
+HANDSHAKE_BUDGET = 3.0
+
+IMPORT_PROBE = (
+    "import sys, reddit_translator\n"
+    f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+)
+
+
+def parse_importtime(stderr: str) -> list:
+    """解析 -X importtime 输出，返回 [(模块, 自身微秒, 累计微秒)]"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure_import(top: int = 5) -> dict:
+    """在子进程中导入 reddit_translator 一次，返回耗时、最慢的模块和提前加载的重依赖"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_PROBE],
+        cwd=REPO_DIR, capture_output=True, text=True, check=True
+    )
+    rows = parse_importtime(result.stderr)
+    cumulative = next(us for name, _, us in rows if name == "reddit_translator")
+    slowest = sorted(rows, key=lambda row: row[1], reverse=True)[:top]
+    return {
+        "seconds": cumulative / 1e6,
+        "slowest": [{"module": name, "self_ms": round(us / 1000, 2)} for name, us, _ in slowest],
+        "eager_modules": [name for name in result.stdout.strip().split(",") if name],
+    }
+
+
+def _send(process, message: dict):
+    process.stdin.write(json.dumps(message) + "\n")
+    process.stdin.flush()
+
+
+def _receive(process, request_id: int) -> dict:
+    """读取 stdout 直到拿到指定 id 的响应（跳过通知）"""
+    while True:
+        line = process.stdout.readline()
+        if not line:
+            raise RuntimeError("MCP 服务器提前退出")
+        message = json.loads(line)
+        if message.get("id") == request_id:
+            return message
+
+
+def measure_handshake() -> dict:
+    """启动 MCP 服务器，测量 initialize 响应和第一次工具调用的耗时"""
+    env = dict(os.environ, REDDIT_SOURCE="demo")
+    started_at = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, SERVER_SCRIPT], cwd=REPO_DIR, env=env, text=True,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    try:
+        _send(process, {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {
+            "protocolVersion": "2024-11-05", "capabilities": {},
+            "clientInfo": {"name": "bench_startup", "version": "1.0"}
+        }})
+        _receive(process, 1)
+        handshake = time.perf_counter() - started_at
+
+        _send(process, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+        call_started_at = time.perf_counter()
+        _send(process, {"jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {
+            "name": "fetch_hot_threads", "arguments": {"subreddit": "python", "limit": 3, "translate": False}
+        }})
+        response = _receive(process, 2)
+        if response.get("error") or response["result"].get("isError"):
+            raise RuntimeError(f"工具调用失败: {response}")
+        first_call = time.perf_counter() - call_started_at
+    finally:
+        process.stdin.close()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    return {"handshake": handshake, "first_call": first_call}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="reddit_translator 启动耗时基准测试")
+    parser.add_argument("--runs", type=int, default=5, help="每项测量的次数，取中位数")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET * 1000, help="导入耗时预算（毫秒）")
+    parser.add_argument("--handshake-budget-ms", type=float, default=HANDSHAKE_BUDGET * 1000,
+                        help="握手耗时预算（毫秒）")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    handshakes = [measure_handshake() for _ in range(args.runs)]
+    import_ms = statistics.median(run["seconds"] for run in imports) * 1000
+    handshake_ms = statistics.median(run["handshake"] for run in handshakes) * 1000
+    first_call_ms = statistics.median(run["first_call"] for run in handshakes) * 1000
+
+    print(f"🚀 启动耗时（{args.runs} 次中位数）")
+    print(f"   import reddit_translator: {import_ms:8.1f} ms（预算 {args.budget_ms:.0f} ms）")
+    print(f"   MCP initialize 响应:       {handshake_ms:8.1f} ms（预算 {args.handshake_budget_ms:.0f} ms）")
+    print(f"   第一次工具调用:            {first_call_ms:8.1f} ms")
+    print("\n🐢 自身导入耗时最多的模块:")
+    for row in imports[-1]["slowest"]:
+        print(f"   {row['self_ms']:8.2f} ms  {row['module']}")
+
+    eager = imports[-1]["eager_modules"]
+    if eager:
+        print(f"\n⚠️ 导入时已加载重依赖: {', '.join(eager)}")
+    over_budget = import_ms > args.budget_ms or handshake_ms > args.handshake_budget_ms
+    if over_budget:
+        print("\n❌ 超出启动耗时预算")
+    sys.exit(1 if eager or over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
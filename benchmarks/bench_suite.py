@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+离线基准测试套件
+
+用 mock_providers 在本地模拟 Google gtx、DeepL、百度和 OpenAI 四种接口（可配置延迟、抖动、
+错误率和 429 限流），在合成的版块和评论树上运行以下场景:
+
+- batch:        TranslationManager.translate_batch，每次 50 条评论
+- hot_threads:  EnhancedRedditMCP.fetch_hot_threads，每个版块 25 个帖子
+- post_details: EnhancedRedditMCP.fetch_post_details，每个帖子约 300 条评论
+
+合成评论包含引用父评论、机器人模板、代码块和链接。每个 (场景, 服务) 组合在单独的子进程中运行，
+峰值 RSS 互不影响。结果以 JSON 输出（吞吐量、p50/p95/p99 延迟、上游请求数、429 次数、峰值 RSS），
+可用 --compare 与之前提交的结果对比:
+
+    python benchmarks/bench_suite.py --output before.json
+    python benchmarks/bench_suite.py --output after.json --compare before.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from mock_providers import PROVIDER_PATHS, start_mock_providers
+from reddit_translator import TranslationConfig, TranslationManager, EnhancedRedditMCP, METRICS
+
+SCENARIOS = ("batch", "hot_threads", "post_details")
+PROVIDERS = tuple(PROVIDER_PATHS)
+
+WORDS = (
+    "async runtime thread pool latency cache memory compiler release benchmark library framework "
+    "database query index server client request response performance regression feature bug "
+    "design pattern interface module package version update migration deploy container"
+).split()
+BOT_FOOTER = (
+    "I am a bot, and this action was performed automatically. "
+    "Please contact the moderators of this subreddit if you have any questions or concerns."
+)
+
+
+def make_sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(6, 14))]
+    return " ".join(words).capitalize() + rng.choice(".!?")
+
+
+def make_comment_body(rng: random.Random, parent_body: str = None) -> str:
+    """生成一条合成评论：多句正文，部分引用父评论、附带代码、链接或机器人模板"""
+    parts = []
+    if parent_body and rng.random() < 0.3:
+        quoted = parent_body.split("\n\n")[0]
+        parts.append("&gt; " + quoted)
+    parts.append(" ".join(make_sentence(rng) for _ in range(rng.randint(1, 4))))
+    if rng.random() < 0.1:
+        parts.append("```python\nresult = await client.fetch(url, timeout=30)\nprint(result)\n```")
+    if rng.random() < 0.15:
+        parts.append(f"See https://example.com/docs/{rng.randint(1, 500)} and r/programming for details.")
+    if rng.random() < 0.05:
+        parts.append(BOT_FOOTER)
+    return "\n\n".join(parts)
+
+
+def make_post(rng: random.Random, post_id: str, subreddit: str, comment_count: int):
+    """生成一个合成帖子和评论树（随机挂到已有评论下，形成深浅不一的树）"""
+    post = {
+        "id": post_id,
+        "title": make_sentence(rng),
+        "author": f"author_{rng.randint(1, 1000)}",
+        "score": rng.randint(0, 5000),
+        "num_comments": comment_count,
+        "created_utc": 1703123456,
+        "url": f"https://reddit.com/r/{subreddit}/comments/{post_id}",
+        "selftext": make_comment_body(rng) if rng.random() < 0.6 else "",
+        "subreddit": subreddit,
+        "post_hint": "self"
+    }
+    roots = []
+    nodes = []
+    for i in range(comment_count):
+        parent = rng.choice(nodes) if nodes and rng.random() < 0.7 else None
+        comment = {
+            "id": f"{post_id}_c{i}",
+            "author": f"user{rng.randint(1, 2000)}",
+            "body": make_comment_body(rng, parent["body"] if parent else None),
+            "score": rng.randint(-10, 1000),
+            "created_utc": 1703124000 + i,
+            "replies": []
+        }
+        (parent["replies"] if parent else roots).append(comment)
+        nodes.append(comment)
+    return post, roots
+
+
+def percentile(values: list, pct: float) -> float:
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))
+    return values[index]
+
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值 RSS（MB）"""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def run_operations(operations: list, concurrency: int) -> list:
+    """以固定并发执行一组操作，返回各操作的耗时"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(operation):
+        async with semaphore:
+            start = time.perf_counter()
+            await operation()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[one(operation) for operation in operations])
+    return latencies
+
+
+def build_config(provider: str, base_url: str, args) -> TranslationConfig:
+    return TranslationConfig(
+        service=provider, endpoint=base_url + PROVIDER_PATHS[provider], api_key="bench-key", secret_key="bench-secret",
+        model="gpt-3.5-turbo", persistent_cache_enabled=False, concurrent_requests=args.concurrent_requests,
+        rate_limit_requests_per_second=args.provider_rps, retry_backoff_base=0.05, retry_backoff_max=2.0
+    )
+
+
+async def run_scenario(scenario: str, provider: str, args) -> dict:
+    """在当前进程中运行一个 (场景, 服务) 组合，返回结果字典"""
+    rng = random.Random(args.seed)
+    runner, base_url, stats = await start_mock_providers(
+        args.latency, args.jitter, args.error_rate, args.rate_limit, args.retry_after, args.seed
+    )
+    config = build_config(provider, base_url, args)
+    scale = args.scale
+    texts_translated = 0
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            if scenario == "batch":
+                manager = TranslationManager(config)
+                parents = [make_comment_body(rng) for _ in range(200)]
+                batches = [
+                    [make_comment_body(rng, rng.choice(parents)) for _ in range(50)]
+                    for _ in range(max(1, int(40 * scale)))
+                ]
+                texts_translated = sum(len(batch) for batch in batches)
+                operations = [lambda batch=batch: manager.translate_batch(batch, "bench") for batch in batches]
+                concurrency = 4
+            else:
+                reddit_mcp = EnhancedRedditMCP(config)
+                manager = reddit_mcp.translation_manager
+                if scenario == "hot_threads":
+                    subreddits = [f"bench{i}" for i in range(max(1, int(20 * scale)))]
+                    for subreddit in subreddits:
+                        for j in range(25):
+                            reddit_mcp.add_post(*make_post(rng, f"{subreddit}_{j}", subreddit, 0))
+                    texts_translated = len(subreddits) * 25
+                    operations = [
+                        lambda subreddit=subreddit: reddit_mcp.fetch_hot_threads(subreddit, 25)
+                        for subreddit in subreddits
+                    ]
+                    concurrency = 4
+                else:
+                    post_ids = [f"thread{i}" for i in range(max(1, int(10 * scale)))]
+                    for post_id in post_ids:
+                        reddit_mcp.add_post(*make_post(rng, post_id, "benchmarks", 300))
+                    texts_translated = len(post_ids) * 301
+                    operations = [
+                        lambda post_id=post_id: reddit_mcp.fetch_post_details(post_id, max_comments=None)
+                        for post_id in post_ids
+                    ]
+                    concurrency = 2
+
+            METRICS.reset()
+            start = time.perf_counter()
+            latencies = await run_operations(operations, concurrency)
+            wall = time.perf_counter() - start
+            upstream = METRICS.snapshot()["histograms"].get("translation_provider_request_seconds", {})
+            upstream = upstream.get(f"provider={provider}", {})
+            chars = manager.char_stats()
+            if scenario == "batch":
+                await manager.close()
+            else:
+                await reddit_mcp.close()
+    finally:
+        await runner.cleanup()
+
+    return {
+        "scenario": scenario,
+        "provider": provider,
+        "operations": len(latencies),
+        "texts": texts_translated,
+        "duration_s": round(wall, 4),
+        "throughput_ops": round(len(latencies) / wall, 2),
+        "throughput_texts": round(texts_translated / wall, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+        },
+        "upstream_requests": stats["requests"][provider],
+        "upstream_segments": stats["segments"][provider],
+        "upstream_429": stats["rate_limited"][provider],
+        "upstream_errors": stats["errors"][provider],
+        "upstream_latency_ms": {
+            "p50": round(upstream.get("p50", 0.0) * 1000, 2),
+            "p95": round(upstream.get("p95", 0.0) * 1000, 2),
+        },
+        "sent_chars": chars["sent_chars"],
+        "original_chars": chars["original_chars"],
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def print_summary(result: dict):
+    latency = result["latency_ms"]
+    print(
+        f"{result['scenario']:<13} {result['provider']:<7} 吞吐 {result['throughput_texts']:8.1f} 条/s | "
+        f"p50 {latency['p50']:8.1f} ms p95 {latency['p95']:8.1f} ms p99 {latency['p99']:8.1f} ms | "
+        f"上游请求 {result['upstream_requests']:>5} (429 {result['upstream_429']}) | RSS {result['peak_rss_mb']:6.1f} MB",
+        file=sys.stderr
+    )
+
+
+def print_comparison(results: list, baseline_path: str):
+    """与之前的结果对比吞吐量和 p95 延迟"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["scenario"], r["provider"]): r for r in json.load(f)["results"]}
+    print(f"\n📈 对比 {baseline_path}:", file=sys.stderr)
+    for result in results:
+        old = baseline.get((result["scenario"], result["provider"]))
+        if old is None:
+            continue
+        throughput = result["throughput_texts"] / old["throughput_texts"] - 1 if old["throughput_texts"] else 0.0
+        p95 = result["latency_ms"]["p95"] / old["latency_ms"]["p95"] - 1 if old["latency_ms"]["p95"] else 0.0
+        requests = result["upstream_requests"] - old["upstream_requests"]
+        print(
+            f"{result['scenario']:<13} {result['provider']:<7} 吞吐 {throughput:+7.1%} | p95 {p95:+7.1%} | "
+            f"上游请求 {requests:+d}",
+            file=sys.stderr
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="离线基准测试套件（本地模拟翻译服务）")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="逗号分隔的场景")
+    parser.add_argument("--providers", default=",".join(PROVIDERS), help="逗号分隔的服务")
+    parser.add_argument("--scale", type=float, default=1.0, help="工作量倍数")
+    parser.add_argument("--latency", type=float, default=0.02, help="模拟接口延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.005, help="延迟抖动（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟接口返回 500 的概率")
+    parser.add_argument("--rate-limit", type=int, default=0, help="模拟接口每秒允许的请求数，超出返回 429，0 为不限制")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 响应的 Retry-After 秒数")
+    parser.add_argument("--provider-rps", type=float, default=0, help="客户端限流（请求/秒），0 为不限流")
+    parser.add_argument("--concurrent-requests", type=int, default=5, help="同时在途的翻译请求上限")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="结果 JSON 文件，默认输出到标准输出")
+    parser.add_argument("--compare", help="与之前保存的结果 JSON 对比")
+    parser.add_argument("--run", nargs=2, metavar=("SCENARIO", "PROVIDER"), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.run:
+        # 子进程：运行单个组合，结果写到标准输出
+        print(json.dumps(asyncio.run(run_scenario(args.run[0], args.run[1], args))))
+        return
+
+    # 子进程使用相同的工作量和模拟接口参数
+    passthrough = [
+        "--scale", str(args.scale), "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--error-rate", str(args.error_rate), "--rate-limit", str(args.rate_limit),
+        "--retry-after", str(args.retry_after), "--provider-rps", str(args.provider_rps),
+        "--concurrent-requests", str(args.concurrent_requests), "--seed", str(args.seed),
+    ]
+
+    scenarios = [name for name in args.scenarios.split(",") if name]
+    providers = [name for name in args.providers.split(",") if name]
+    print(f"🏁 离线基准测试: {len(scenarios)} 个场景 × {len(providers)} 个服务，"
+          f"模拟延迟 {args.latency * 1000:.0f}±{args.jitter * 1000:.0f} ms", file=sys.stderr)
+    results = []
+    for scenario in scenarios:
+        for provider in providers:
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), *passthrough, "--run", scenario, provider],
+                capture_output=True, text=True
+            )
+            if completed.returncode != 0:
+                print(f"❌ {scenario} / {provider} 失败:\n{completed.stderr}", file=sys.stderr)
+                continue
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print_summary(result)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "mock": {
+            "latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate,
+            "rate_limit": args.rate_limit, "retry_after": args.retry_after
+        },
+        "scale": args.scale,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存到 {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
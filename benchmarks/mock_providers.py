@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+本地模拟翻译服务
+
+用 aiohttp 实现 Google gtx、DeepL、百度和 OpenAI 四种接口协议，供基准测试使用，无需联网。
+可配置延迟、抖动、错误率和 429 限流行为；译文为 "译文:" 加原文（多行文本逐行翻译）。
+
+单独运行时在本地启动服务并打印各接口地址:
+
+    python benchmarks/mock_providers.py --latency 0.05 --jitter 0.02 --error-rate 0.01 --rate-limit 50
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import random
+import time
+
+from aiohttp import web
+
+# 服务名 -> 接口路径
+PROVIDER_PATHS = {
+    "google": "/translate_a/single",
+    "deepl": "/v2/translate",
+    "baidu": "/api/trans/vip/translate",
+    "openai": "/v1/chat/completions",
+}
+
+
+def mock_translate(text: str) -> str:
+    """逐行加上 译文: 前缀，与真实接口一样保留换行"""
+    return "\n".join(f"译文:{line}" if line.strip() else line for line in text.split("\n"))
+
+
+async def start_mock_providers(latency: float = 0.02, jitter: float = 0.0, error_rate: float = 0.0,
+                               rate_limit: int = 0, retry_after: float = 1.0, seed: int = 7):
+    """启动模拟服务，返回 (runner, base_url, 统计信息)
+
+    latency / jitter: 每个请求的延迟秒数，在 latency ± jitter 内均匀分布
+    error_rate: 返回 500 的概率
+    rate_limit: 每个服务每秒允许的请求数（1 秒滑动窗口），超出时返回 429 和 Retry-After，0 表示不限制
+    """
+    rng = random.Random(seed)
+    windows = collections.defaultdict(collections.deque)
+    stats = {
+        "requests": collections.Counter(),
+        "segments": collections.Counter(),
+        "rate_limited": collections.Counter(),
+        "errors": collections.Counter(),
+    }
+
+    def admit(provider: str):
+        """模拟限流和随机错误，返回需要直接返回的错误响应"""
+        stats["requests"][provider] += 1
+        if rate_limit:
+            now = time.monotonic()
+            window = windows[provider]
+            while window and now - window[0] >= 1.0:
+                window.popleft()
+            if len(window) >= rate_limit:
+                stats["rate_limited"][provider] += 1
+                return web.Response(status=429, headers={"Retry-After": f"{retry_after:g}"})
+            window.append(now)
+        if error_rate and rng.random() < error_rate:
+            stats["errors"][provider] += 1
+            return web.Response(status=500)
+        return None
+
+    async def delay():
+        await asyncio.sleep(max(0.0, latency + rng.uniform(-jitter, jitter)))
+
+    async def google(request):
+        rejected = admit("google")
+        if rejected is not None:
+            return rejected
+        await delay()
+        text = request.query.get("q", "")
+        stats["segments"]["google"] += text.count("\n") + 1
+        return web.json_response([[[mock_translate(text), text, None, None, 1]], None, "en"])
+
+    async def deepl(request):
+        rejected = admit("deepl")
+        if rejected is not None:
+            return rejected
+        data = await request.json()
+        await delay()
+        stats["segments"]["deepl"] += len(data["text"])
+        return web.json_response({"translations": [{"text": mock_translate(text)} for text in data["text"]]})
+
+    async def baidu(request):
+        rejected = admit("baidu")
+        if rejected is not None:
+            return rejected
+        form = await request.post()
+        await delay()
+        lines = form["q"].split("\n")
+        stats["segments"]["baidu"] += len(lines)
+        return web.json_response({"trans_result": [{"src": line, "dst": mock_translate(line)} for line in lines]})
+
+    async def openai(request):
+        rejected = admit("openai")
+        if rejected is not None:
+            return rejected
+        data = await request.json()
+        await delay()
+        # 提示词最后一段为待翻译内容，多段时为 JSON 数组
+        body = data["messages"][-1]["content"].rsplit("\n\n", 1)[-1]
+        if body.startswith("["):
+            texts = json.loads(body)
+            stats["segments"]["openai"] += len(texts)
+            content = json.dumps([mock_translate(text) for text in texts], ensure_ascii=False)
+        else:
+            stats["segments"]["openai"] += 1
+            content = mock_translate(body)
+        return web.json_response({"choices": [{"message": {"content": content}}]})
+
+    app = web.Application()
+    app.router.add_get(PROVIDER_PATHS["google"], google)
+    app.router.add_post(PROVIDER_PATHS["deepl"], deepl)
+    app.router.add_post(PROVIDER_PATHS["baidu"], baidu)
+    app.router.add_post(PROVIDER_PATHS["openai"], openai)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="启动本地模拟翻译服务")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    args = parser.parse_args()
+
+    runner, base_url, stats = await start_mock_providers(
+        args.latency, args.jitter, args.error_rate, args.rate_limit, args.retry_after
+    )
+    print("🧪 模拟翻译服务已启动（Ctrl+C 退出）:")
+    for provider, path in PROVIDER_PATHS.items():
+        print(f"   {provider:<7} {base_url}{path}")
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await runner.cleanup()
+        print(f"\n📊 请求数: {dict(stats['requests'])}")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
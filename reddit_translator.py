@@ -18,22 +18,73 @@ import json
 import time
 import re
 import asyncio
-import aiohttp
+import bisect
+import contextlib
 import hashlib
 import hmac
+import importlib
+import importlib.util
+import logging
+import logging.handlers
 import base64
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Tuple
 from urllib.parse import quote
+import heapq
+import math
 import os
-from dataclasses import dataclass
+import queue
+import random
+import sqlite3
+import threading
+import unicodedata
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from itertools import islice
+from types import MappingProxyType
 
-# 尝试导入 translate 库作为备选翻译方案
+class _LazyModule:
+    """模块代理，首次访问属性时才真正导入
+    
+    MCP 客户端每个会话都会启动一次本进程，启动耗时就是用户可感知的延迟；
+    aiohttp 等较重的依赖推迟到第一次使用时再导入。
+    """
+    
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+    
+    def load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+    
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
+
+aiohttp = _LazyModule("aiohttp")
+
+if TYPE_CHECKING:
+    import aiohttp  # noqa: F811
+    from mcp.types import Tool, TextContent
+
+# translate 库作为备选翻译方案，只检查是否安装，实际使用时才导入
+TRANSLATE_AVAILABLE = importlib.util.find_spec("translate") is not None
+
+# 尝试导入 xxhash 计算缓存键，未安装时使用标准库 blake2b
 try:
-    from translate import Translator
-    TRANSLATE_AVAILABLE = True
+    import xxhash
+    
+    def _text_digest(data: bytes) -> str:
+        return "xxh3:" + xxhash.xxh3_128_hexdigest(data)
 except ImportError:
-    TRANSLATE_AVAILABLE = False
+    def _text_digest(data: bytes) -> str:
+        return "b2:" + hashlib.blake2b(data, digest_size=16).hexdigest()
+
+# 缓存键格式版本，键的组成或文本切分方式（长文本分块、句子边界）变化时递增，旧的持久化缓存随之失效
+CACHE_KEY_VERSION = 3
 
 @dataclass
 class TranslationConfig:
@@ -46,69 +97,1359 @@ class TranslationConfig:
     enabled: bool = True
     cache_enabled: bool = True
     max_length: int = 5000
+    preserve_markdown: bool = True  # 代码、链接、用户名和版块引用原样保留，只翻译自然语言部分
     batch_size: int = 10
+    concurrent_requests: int = 5  # 同时在途的翻译请求上限
+    # HTTP 连接池配置（进程内共享，长连接复用）
+    pool_limit: int = 100
+    pool_limit_per_host: int = 10
+    keepalive_timeout: float = 30.0
+    dns_cache_ttl: int = 300
+    # 内存缓存容量（LRU 淘汰），0 表示不限制；TTL 单位为秒，0 表示不过期
+    cache_max_entries: int = 10000
+    cache_max_bytes: int = 64 * 1024 * 1024
+    cache_ttl: float = 0
+    # 持久化缓存（SQLite），跨进程、跨重启共享翻译结果
+    persistent_cache_enabled: bool = True
+    persistent_cache_path: Optional[str] = None
+    cache_warm_entries: int = 2000
+    # 请求超时与重试：指数退避 + 随机抖动，429 时参考 Retry-After
+    request_timeout: float = 30.0
+    max_retries: int = 2
+    retry_backoff_base: float = 0.5
+    retry_backoff_max: float = 8.0
+    # 熔断：连续失败达到阈值后暂停调用该服务，reset_timeout 秒后放行一次探测请求
+    circuit_failure_threshold: int = 5
+    circuit_reset_timeout: float = 30.0
+    # 按顺序接替的备用服务，元素为服务名或 {"service": ..., "api_key": ...} 配置
+    fallback_services: List[Any] = field(default_factory=list)
+    # 按服务商限流（进程内共享），None 使用服务商默认值，0 表示不限制
+    rate_limit_requests_per_second: Optional[float] = None
+    rate_limit_chars_per_second: Optional[float] = None
+    rate_limit_burst: Optional[int] = None
+
+class TranslationHTTPError(Exception):
+    """翻译服务返回非 200 状态码"""
+    
+    def __init__(self, service: str, status: int, retry_after: Optional[float] = None):
+        super().__init__(f"{service} 翻译请求失败: HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+    
+    @property
+    def retryable(self) -> bool:
+        return self.status == 429 or self.status >= 500
+
+class CircuitOpenError(Exception):
+    """熔断器打开，请求未发送"""
+
+class CircuitBreaker:
+    """熔断器
+    
+    连续失败 failure_threshold 次后打开，打开期间直接拒绝请求；
+    reset_timeout 秒后进入半开状态，只放行一个探测请求，
+    成功则关闭，失败则重新打开，被取消则放行下一个探测请求。
+    failure_threshold 为 0 时不熔断。
+    """
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+    
+    def allow(self) -> bool:
+        """是否允许发送请求"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open" or self._probing:
+            return False
+        self._probing = True
+        return True
+    
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+    
+    def record_abort(self):
+        """请求未完成就被取消（如客户端断开），不计入成功或失败"""
+        self._probing = False
+    
+    def record_failure(self):
+        self._probing = False
+        self.failures += 1
+        if self.failure_threshold and (self.failures >= self.failure_threshold or self.opened_at is not None):
+            self.opened_at = time.monotonic()
+
+class TokenBucket:
+    """令牌桶限流器
+    
+    按 rate（每秒令牌数）匀速补充，最多积累 capacity 个令牌以允许突发；
+    等待者按到达顺序依次获取。pause() 可在服务端要求时暂停发放。
+    """
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = None
+        self._lock_loop = None  # _lock 所属的事件循环
+    
+    def _refill(self, now: float):
+        if self.rate > 0:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    async def acquire(self, amount: float = 1.0) -> float:
+        """获取令牌，返回排队等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        # asyncio.Lock 绑定到首次使用它的事件循环，进程内共享的令牌桶在新的事件循环中使用时重新创建
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        
+        start = time.monotonic()
+        # 超过桶容量的请求在桶满时放行，余额记为负数由后续补充
+        need = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                if self.tokens >= need:
+                    self.tokens -= amount
+                    return time.monotonic() - start
+                await asyncio.sleep((need - self.tokens) / self.rate)
+    
+    def pause(self, seconds: float):
+        """在 seconds 秒内暂停发放令牌"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+    
+    def reconfigure(self, rate: float, capacity: float):
+        """修改速度和容量；设置有变化时按新容量装满令牌桶"""
+        capacity = max(1.0, capacity)
+        if (rate, capacity) == (self.rate, self.capacity):
+            return
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+class ProviderRateLimiter:
+    """单个翻译服务商的限流器：请求数令牌桶 + 字符数令牌桶
+    
+    同一服务商的所有 TranslationService 实例共用一个限流器（见 get_provider_limiter），
+    并统计排队等待时间。
+    """
+    
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.requests = TokenBucket(0, 1)
+        self.chars = TokenBucket(0, 1)
+        self.settings = None  # 当前的 (请求数/秒, 字符数/秒, 突发容量)
+        self.stats = {"requests": 0, "chars": 0, "delayed": 0, "wait_total": 0.0, "wait_max": 0.0}
+    
+    def configure(self, requests_per_second: float, chars_per_second: float, burst: int):
+        """设置速度；burst 为请求桶容量，字符桶容量为一秒的字符额度
+        
+        设置不变时什么也不做，新建服务实例不会让已耗尽的额度重新装满；
+        第一次配置或速度、容量改变时按新设置重置令牌桶。
+        """
+        settings = (requests_per_second, chars_per_second, burst)
+        if settings == self.settings:
+            return
+        self.requests.reconfigure(requests_per_second, burst)
+        self.chars.reconfigure(chars_per_second, chars_per_second)
+        self.settings = settings
+    
+    async def acquire(self, chars: int) -> float:
+        """为一次请求取得令牌，返回排队等待的秒数"""
+        waited = await self.requests.acquire()
+        if chars:
+            waited += await self.chars.acquire(chars)
+        stats = self.stats
+        stats["requests"] += 1
+        stats["chars"] += chars
+        if waited > 0.001:
+            stats["delayed"] += 1
+        stats["wait_total"] += waited
+        stats["wait_max"] = max(stats["wait_max"], waited)
+        return waited
+    
+    def pause(self, seconds: float):
+        """服务商返回 429 时暂停该服务商的所有请求"""
+        self.requests.pause(seconds)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats["wait_avg"] = stats["wait_total"] / stats["requests"] if stats["requests"] else 0.0
+        stats["requests_per_second"] = self.requests.rate
+        stats["chars_per_second"] = self.chars.rate
+        return stats
+
+_PROVIDER_LIMITERS: Dict[str, ProviderRateLimiter] = {}
+
+def get_provider_limiter(provider: str) -> ProviderRateLimiter:
+    """获取进程内共享的服务商限流器"""
+    limiter = _PROVIDER_LIMITERS.get(provider)
+    if limiter is None:
+        limiter = _PROVIDER_LIMITERS[provider] = ProviderRateLimiter(provider)
+    return limiter
+
+def get_rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    """各服务商的限流统计（请求数、字符数、排队等待时间）"""
+    return {provider: limiter.snapshot() for provider, limiter in _PROVIDER_LIMITERS.items()}
+
+class MetricsRegistry:
+    """进程内指标注册表：计数器、延迟直方图和采集时回调
+    
+    只在事件循环线程中更新，不加锁；一次更新只是字典查找和加法。
+    缓存命中率等已有统计由采集回调在导出时读取，热路径上没有额外开销。
+    """
+    
+    # 延迟直方图的桶上限（秒）
+    DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._descriptions = {}  # 名称 -> (类型, 说明)
+        self._counters = {}      # (名称, 标签) -> 值
+        self._histograms = {}    # (名称, 标签) -> [各桶计数..., +Inf 桶计数, 总和]
+        self._collectors = []    # 弱引用的采集回调，返回 (名称, 标签, 值) 列表
+    
+    def describe(self, name: str, kind: str, help_text: str):
+        """登记指标类型（counter / gauge / histogram）和说明"""
+        self._descriptions[name] = (kind, help_text)
+    
+    def inc(self, name: str, labels: tuple = (), value: float = 1):
+        """计数器加 value，labels 为 ((标签名, 标签值), ...)"""
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+    
+    def observe(self, name: str, value: float, labels: tuple = ()):
+        """记录一次耗时（秒）"""
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = [0] * (len(self.buckets) + 2)
+        histogram[bisect.bisect_left(self.buckets, value)] += 1
+        histogram[-1] += value
+    
+    def add_collector(self, collector):
+        """登记导出时调用的回调；绑定方法按弱引用保存，对象回收后自动失效"""
+        ref = weakref.WeakMethod(collector) if hasattr(collector, "__self__") else (lambda: collector)
+        self._collectors.append(ref)
+    
+    def remove_collector(self, collector):
+        self._collectors = [ref for ref in self._collectors if ref() not in (None, collector)]
+    
+    def _collect(self) -> Dict[tuple, float]:
+        """调用采集回调，同名同标签的值相加（多个实例使用同一服务商时合并）"""
+        values = {}
+        alive = []
+        for ref in self._collectors:
+            collector = ref()
+            if collector is None:
+                continue
+            alive.append(ref)
+            for name, labels, value in collector():
+                values[(name, labels)] = values.get((name, labels), 0) + value
+        self._collectors = alive
+        return values
+    
+    def reset(self):
+        """清空已记录的计数器和直方图（采集回调保留）"""
+        self._counters.clear()
+        self._histograms.clear()
+    
+    def _quantile(self, histogram: list, q: float) -> float:
+        """按桶线性插值估算分位数，落在 +Inf 桶时返回最大的有限桶上限"""
+        count = sum(histogram[:-1])
+        if not count:
+            return 0.0
+        target = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(histogram[:-1]):
+            if cumulative + bucket_count >= target and bucket_count:
+                if index >= len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (target - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+    
+    @staticmethod
+    def _label_key(labels: tuple) -> str:
+        return ",".join(f"{name}={value}" for name, value in labels)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """返回 JSON 可序列化的快照：计数器、仪表和直方图摘要（次数、平均值、p50/p95/p99）"""
+        result = {"counters": {}, "gauges": {}, "histograms": {}}
+        values = dict(self._counters)
+        values.update(self._collect())
+        for (name, labels), value in sorted(values.items()):
+            kind = self._descriptions.get(name, ("counter", ""))[0]
+            section = result["gauges"] if kind == "gauge" else result["counters"]
+            section.setdefault(name, {})[self._label_key(labels)] = value
+        for (name, labels), histogram in sorted(self._histograms.items()):
+            count = sum(histogram[:-1])
+            result["histograms"].setdefault(name, {})[self._label_key(labels)] = {
+                "count": count,
+                "sum": histogram[-1],
+                "avg": histogram[-1] / count if count else 0.0,
+                "p50": self._quantile(histogram, 0.5),
+                "p95": self._quantile(histogram, 0.95),
+                "p99": self._quantile(histogram, 0.99)
+            }
+        return result
+    
+    @staticmethod
+    def _format_labels(labels: tuple) -> str:
+        if not labels:
+            return ""
+        escaped = (
+            f'{name}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+            for name, value in labels
+        )
+        return "{" + ",".join(escaped) + "}"
+    
+    def render_prometheus(self) -> str:
+        """按 Prometheus 文本格式（0.0.4）导出全部指标"""
+        samples = {}  # 名称 -> [(标签, 值)]
+        values = dict(self._counters)
+        values.update(self._collect())
+        for (name, labels), value in values.items():
+            samples.setdefault(name, []).append((labels, value))
+        for (name, labels), histogram in self._histograms.items():
+            samples.setdefault(name, []).append((labels, histogram))
+        
+        lines = []
+        for name in sorted(samples):
+            kind, help_text = self._descriptions.get(name, ("counter", ""))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(samples[name], key=lambda sample: sample[0]):
+                if kind != "histogram":
+                    lines.append(f"{name}{self._format_labels(labels)} {value}")
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ("+Inf",), value[:-1]):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{self._format_labels(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_sum{self._format_labels(labels)} {value[-1]}")
+                lines.append(f"{name}_count{self._format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+METRICS = MetricsRegistry()
+for _name, _kind, _help in (
+    ("reddit_tool_calls_total", "counter", "MCP 工具调用次数"),
+    ("reddit_tool_errors_total", "counter", "MCP 工具调用失败次数"),
+    ("reddit_tool_duration_seconds", "histogram", "MCP 工具调用耗时"),
+    ("reddit_tool_response_bytes_total", "counter", "MCP 工具返回的字节数"),
+    ("reddit_api_requests_total", "counter", "Reddit API 请求次数，按 HTTP 状态码"),
+    ("reddit_api_request_seconds", "histogram", "Reddit API 请求耗时"),
+    ("reddit_api_bytes_in_total", "counter", "Reddit API 响应字节数"),
+    ("translation_provider_requests_total", "counter", "翻译服务请求次数，按结果（ok / timeout / http_状态码 / error）"),
+    ("translation_provider_request_seconds", "histogram", "翻译服务单次请求耗时"),
+    ("translation_queue_wait_seconds", "histogram", "翻译请求等待并发名额和限流令牌的时间"),
+    ("translation_bytes_out_total", "counter", "发送给翻译服务的文本字节数"),
+    ("translation_bytes_in_total", "counter", "翻译服务返回的译文字节数"),
+    ("translation_cache_hits_total", "counter", "内存翻译缓存命中次数"),
+    ("translation_cache_misses_total", "counter", "内存翻译缓存未命中次数"),
+    ("translation_cache_evictions_total", "counter", "内存翻译缓存淘汰次数"),
+    ("translation_cache_entries", "gauge", "内存翻译缓存条目数"),
+    ("translation_cache_bytes", "gauge", "内存翻译缓存占用字节数"),
+):
+    METRICS.describe(_name, _kind, _help)
+
+# 日志：默认不输出，MCP 服务器和演示模式启动时由 setup_logging 配置
+logger = logging.getLogger("reddit_translator")
+logger.addHandler(logging.NullHandler())
+
+# 结构化日志字段，通过 extra={...} 传入
+LOG_FIELDS = ("tool", "post_id", "subreddit", "query", "provider", "status", "latency", "count", "attempt", "error")
+
+class StructuredFormatter(logging.Formatter):
+    """结构化日志格式：text 为 “时间 级别 消息 key=value ...”，json 为每行一个 JSON 对象"""
+    
+    def __init__(self, fmt: str = "text"):
+        super().__init__()
+        self.fmt = fmt
+    
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {name: getattr(record, name) for name in LOG_FIELDS if getattr(record, name, None) is not None}
+        timestamp = datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds")
+        message = record.getMessage()
+        if self.fmt == "json":
+            return json.dumps(
+                {"time": timestamp, "level": record.levelname, "message": message, **fields},
+                ensure_ascii=False, default=str
+            )
+        line = f"{timestamp} {record.levelname:<7} {message}"
+        if fields:
+            line += " " + " ".join(f"{name}={value}" for name, value in fields.items())
+        return line
+
+class SamplingFilter(logging.Filter):
+    """高频事件采样：带 sample=True 字段的 DEBUG / INFO 记录按 rate 的概率保留"""
+    
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "sample", False) and record.levelno < logging.WARNING:
+            return random.random() < self.rate
+        return True
+
+@dataclass
+class LoggingConfig:
+    """日志配置"""
+    level: str = "INFO"
+    path: Optional[str] = None  # 日志文件，未设置时写到 stderr
+    format: str = "text"        # text 或 json
+    sample_rate: float = 0.1    # 高频事件（每次翻译请求等）的采样比例
+
+def load_logging_config() -> LoggingConfig:
+    """从环境变量读取日志配置"""
+    return LoggingConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        path=os.getenv("LOG_FILE") or None,
+        format=os.getenv("LOG_FORMAT", "text").lower(),
+        sample_rate=float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+    )
+
+def setup_logging(config: LoggingConfig = None) -> logging.handlers.QueueListener:
+    """配置日志并启动后台写入线程，返回的 listener 需在退出时传给 shutdown_logging
+    
+    事件循环中的日志调用只做过滤和入队，格式化后的写入（stderr 或文件）
+    由 QueueListener 的线程完成，不阻塞事件循环。
+    """
+    config = config or LoggingConfig()
+    if config.path:
+        handler = logging.FileHandler(config.path, encoding="utf-8")
+    else:
+        handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(StructuredFormatter(config.format))
+    
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(config.sample_rate))
+    for existing in [h for h in logger.handlers if isinstance(h, logging.handlers.QueueHandler)]:
+        logger.removeHandler(existing)
+    logger.addHandler(queue_handler)
+    logger.setLevel(config.level)
+    logger.propagate = False
+    
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    return listener
+
+def shutdown_logging(listener: logging.handlers.QueueListener):
+    """写完队列中剩余的日志，停止后台线程并移除队列处理器"""
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+    for existing in [h for h in logger.handlers if isinstance(h, logging.handlers.QueueHandler)]:
+        logger.removeHandler(existing)
+
+class TranslationCache:
+    """有容量上限的内存翻译缓存
+    
+    按条数和字节数限制大小，超出时淘汰最久未使用的条目（LRU），
+    可选 TTL 过期，并统计命中、未命中和淘汰次数。
+    """
+    
+    def __init__(self, max_entries: int = 0, max_bytes: int = 0, ttl: float = 0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, 字节数, 过期时间)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def __contains__(self, key: str) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and not self._expired(entry)
+    
+    def _expired(self, entry: tuple) -> bool:
+        return entry[2] is not None and entry[2] <= time.monotonic()
+    
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，命中时把条目移到最近使用的位置"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if self._expired(entry):
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+    
+    def __getitem__(self, key: str) -> str:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+    
+    def __setitem__(self, key: str, value: str):
+        if key in self._data:
+            self._remove(key)
+        size = len(key) + len(value.encode('utf-8'))
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        self._data[key] = (value, size, expires_at)
+        self._bytes += size
+        self._evict()
+    
+    def _remove(self, key: str):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+    
+    def _evict(self):
+        while self._data and (
+            (self.max_entries and len(self._data) > self.max_entries)
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            _, (_, size, _) = self._data.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+    
+    def clear(self):
+        self._data.clear()
+        self._bytes = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存统计信息"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+class PersistentTranslationCache:
+    """基于 SQLite (WAL) 的持久化翻译缓存
+    
+    所有数据库操作都在单独的线程中串行执行，不阻塞事件循环；
+    写入先进入缓冲区，定时或积累到一定数量后批量提交。
+    多个服务器进程可以同时读写同一个数据库文件；每个缓存键版本使用单独的表，
+    不同版本的程序共用同一个文件时互不读取、互不删除对方的数据。
+    """
+    
+    SCHEMA_VERSION = CACHE_KEY_VERSION
+    TABLE = f"translations_v{SCHEMA_VERSION}"
+    FLUSH_DELAY = 0.5
+    FLUSH_THRESHOLD = 200
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = os.path.expanduser(path or "~/.cache/mcp-reddit-translator/translations.db")
+        self._executor = None
+        self._conn = None
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._flush_task = None
+        self._tasks = set()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """打开数据库连接并初始化表结构（在缓存线程中调用）"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute(
+                f"""CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                    cache_key TEXT NOT NULL,
+                    service TEXT NOT NULL,
+                    source_lang TEXT NOT NULL,
+                    target_lang TEXT NOT NULL,
+                    translated TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (cache_key, service, source_lang, target_lang)
+                ) WITHOUT ROWID"""
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+    
+    def _get_many_sync(self, namespace: tuple, keys: List[str]) -> Dict[str, str]:
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            # SQLite 默认最多 999 个绑定参数，分批查询
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"""SELECT cache_key, translated FROM {self.TABLE}
+                        WHERE service = ? AND source_lang = ? AND target_lang = ?
+                        AND cache_key IN ({placeholders})""",
+                    (*namespace, *chunk)
+                ).fetchall()
+                found.update(rows)
+        return found
+    
+    def _put_many_sync(self, rows: List[tuple]):
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                f"""INSERT OR REPLACE INTO {self.TABLE}
+                   (cache_key, service, source_lang, target_lang, translated, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                rows
+            )
+            conn.commit()
+    
+    def _warm_sync(self, namespace: tuple, limit: int) -> Dict[str, str]:
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute(
+                f"""SELECT cache_key, translated FROM {self.TABLE}
+                   WHERE service = ? AND source_lang = ? AND target_lang = ?
+                   ORDER BY created_at DESC LIMIT ?""",
+                (*namespace, limit)
+            ).fetchall()
+        return dict(rows)
+    
+    async def _run(self, func, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="translation-cache")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+    
+    async def get_many(self, namespace: tuple, keys: List[str]) -> Dict[str, str]:
+        """批量查询缓存，namespace 为 (服务, 源语言, 目标语言)"""
+        if not keys:
+            return {}
+        found = {key: self._pending[(namespace, key)] for key in keys if (namespace, key) in self._pending}
+        missing = [key for key in keys if key not in found]
+        if missing:
+            found.update(await self._run(self._get_many_sync, namespace, missing))
+        return found
+    
+    async def warm(self, namespace: tuple, limit: int) -> Dict[str, str]:
+        """预热：读取最近写入的若干条缓存"""
+        if limit <= 0:
+            return {}
+        return await self._run(self._warm_sync, namespace, limit)
+    
+    def put_many(self, namespace: tuple, items: Dict[str, str]):
+        """写入缓冲区，稍后在缓存线程中批量提交"""
+        for key, value in items.items():
+            self._pending[(namespace, key)] = value
+        if len(self._pending) >= self.FLUSH_THRESHOLD:
+            task = asyncio.get_running_loop().create_task(self.flush())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+    
+    async def _flush_later(self):
+        await asyncio.sleep(self.FLUSH_DELAY)
+        await self.flush()
+    
+    async def flush(self):
+        """立即提交缓冲区中的写入"""
+        if not self._pending:
+            return
+        now = time.time()
+        rows = [(key, *namespace, value, now) for (namespace, key), value in self._pending.items()]
+        self._pending = {}
+        await self._run(self._put_many_sync, rows)
+    
+    async def close(self):
+        """提交剩余写入并关闭数据库"""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        try:
+            await self.flush()
+        finally:
+            if self._executor is not None:
+                await self._run(self._close_sync)
+                self._executor.shutdown(wait=False)
+                self._executor = None
+    
+    def _close_sync(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+# 文字分类：按码位查表，0 表示非字母（数字、标点、空白、表情等）
+SCRIPT_NONE, SCRIPT_LATIN, SCRIPT_HAN, SCRIPT_KANA, SCRIPT_HANGUL, SCRIPT_OTHER = range(6)
+SCRIPT_NAMES = ("none", "latin", "han", "kana", "hangul", "other")
+# 长文本只检查开头这么多字符
+CLASSIFY_SAMPLE_CHARS = 2048
+# 拉丁字母占全部字母的比例不低于该值时才翻译（源语言为英文）
+MIN_LATIN_RATIO = 0.7
+
+_ASCII_NON_LETTERS = bytes(b for b in range(128) if not chr(b).isalpha())
+_ASCII_LETTER_RE = re.compile(r'[A-Za-z]')
+_NON_ASCII_RUN_RE = re.compile(r'[^\x00-\x7f]+')
+_script_table = None
+
+def _get_script_table() -> bytes:
+    """构建基本多文种平面（BMP）的码位 -> 文字分类表，首次遇到非 ASCII 文本时创建"""
+    global _script_table
+    if _script_table is None:
+        table = bytearray(0x10000)
+        for cp in range(0x80, 0x10000):
+            if chr(cp).isalpha():
+                table[cp] = SCRIPT_OTHER
+        ranges = (
+            (SCRIPT_LATIN, 0x00c0, 0x024f), (SCRIPT_LATIN, 0x1e00, 0x1eff), (SCRIPT_LATIN, 0xff21, 0xff5a),
+            (SCRIPT_HAN, 0x3400, 0x4dbf), (SCRIPT_HAN, 0x4e00, 0x9fff), (SCRIPT_HAN, 0xf900, 0xfaff),
+            (SCRIPT_KANA, 0x3040, 0x30ff), (SCRIPT_KANA, 0x31f0, 0x31ff), (SCRIPT_KANA, 0xff66, 0xff9f),
+            (SCRIPT_HANGUL, 0x1100, 0x11ff), (SCRIPT_HANGUL, 0x3130, 0x318f), (SCRIPT_HANGUL, 0xac00, 0xd7af),
+        )
+        for script, first, last in ranges:
+            for cp in range(first, last + 1):
+                if script != SCRIPT_LATIN or table[cp]:
+                    table[cp] = script
+        table[0x3005] = SCRIPT_HAN  # 叠字符号“々”
+        _script_table = bytes(table)
+    return _script_table
+
+def script_counts(text: str) -> List[int]:
+    """统计文本开头 CLASSIFY_SAMPLE_CHARS 个字符中各类文字的字母数，按 SCRIPT_* 下标
+    （SCRIPT_NONE 一项为非 ASCII 的非字母字符数，如表情和全角标点）。
+    
+    ASCII 部分用 bytes.translate 在 C 层计数，只有非 ASCII 字符逐个查表。
+    """
+    sample = text[:CLASSIFY_SAMPLE_CHARS]
+    counts = [0] * 6
+    ascii_bytes = sample.encode("ascii", "ignore")
+    counts[SCRIPT_LATIN] = len(ascii_bytes.translate(None, _ASCII_NON_LETTERS))
+    if len(ascii_bytes) != len(sample):
+        table = _get_script_table()
+        for run in _NON_ASCII_RUN_RE.findall(sample):
+            for ch in run:
+                cp = ord(ch)
+                if cp < 0x10000:
+                    counts[table[cp]] += 1
+                elif ch.isalpha():
+                    counts[SCRIPT_HAN if 0x20000 <= cp <= 0x3134f else SCRIPT_OTHER] += 1
+    return counts
+
+def classify_script(text: str) -> str:
+    """返回文本中字母数最多的文字类别：latin / han / kana / hangul / other / none
+    
+    含假名的文本按日文（kana）处理，即使汉字更多。
+    """
+    counts = script_counts(text)
+    if counts[SCRIPT_KANA] and counts[SCRIPT_KANA] + counts[SCRIPT_HAN] >= counts[SCRIPT_LATIN]:
+        return "kana"
+    best = max(range(1, 6), key=counts.__getitem__)
+    return SCRIPT_NAMES[best] if counts[best] else "none"
+
+def _should_translate_ascii(sample: str) -> bool:
+    # 纯 ASCII（绝大多数英文评论）：有字母即可，不必计数
+    return len(sample.strip()) >= 3 and _ASCII_LETTER_RE.search(sample) is not None
+
+def should_translate_text(text: str) -> bool:
+    """判断文本是否需要翻译：主要由拉丁字母组成的文本才发送
+    
+    中文（目标语言）、日文、韩文及其他文字的文本，以及没有字母的文本都跳过。
+    """
+    if not text:
+        return False
+    sample = text[:CLASSIFY_SAMPLE_CHARS]
+    if sample.isascii():
+        return _should_translate_ascii(sample)
+    if len(sample.strip()) < 3:
+        return False
+    counts = script_counts(sample)
+    letters = sum(counts[SCRIPT_LATIN:])
+    return letters > 0 and counts[SCRIPT_LATIN] >= MIN_LATIN_RATIO * letters
+
+def should_translate_many(texts: List[str]) -> List[bool]:
+    """批量判断，整批都是 ASCII 时只做一次 isascii 检查"""
+    if "".join(texts).isascii():
+        return [_should_translate_ascii(text[:CLASSIFY_SAMPLE_CHARS]) for text in texts]
+    return [should_translate_text(text) for text in texts]
+
+_PARAGRAPH_BREAK_RE = re.compile(r'(\n[ \t]*\n\s*)')
+# 句末标点后的空白为句子边界；分号不断句，常见缩写（e.g.、Mr. 等）后的句点不算句末
+_ABBREVIATIONS = ("e.g", "i.e", "etc", "vs", "cf", "approx", "Mr", "Mrs", "Ms", "Dr", "Prof", "Jr", "Sr", "St")
+_SENTENCE_BREAK_RE = re.compile(
+    r'(?<=[.!?。！？])'
+    + "".join(rf'(?<!\b{re.escape(abbreviation)}\.)' for abbreviation in _ABBREVIATIONS)
+    + r'(\s+)'
+)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+def normalize_segment(text: str) -> str:
+    """规范化句子用于翻译记忆：统一为 NFC，连续空白（含换行）合并为一个空格"""
+    if not text.isascii():
+        text = unicodedata.normalize("NFC", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+def split_text(text: str, limit: int) -> List[str]:
+    """把长文本切分为不超过 limit 个字符的片段，片段依次拼接即为原文
+    
+    先按空行分段，每段作为一个片段（段落间的空白单独成片段）；
+    超长的段落再在句末标点处切分，尽量把相邻句子合并到接近 limit；
+    单句仍超长时在 limit 之前最后一个空白处切开，没有空白时直接按长度切开。
+    """
+    if len(text) <= limit:
+        return [text]
+    
+    pieces = []
+    for paragraph in _PARAGRAPH_BREAK_RE.split(text):
+        if len(paragraph) <= limit:
+            if paragraph:
+                pieces.append(paragraph)
+            continue
+        
+        current = ""
+        for sentence in _SENTENCE_BREAK_RE.split(paragraph):
+            if len(current) + len(sentence) <= limit:
+                current += sentence
+                continue
+            if current:
+                pieces.append(current)
+            while len(sentence) > limit:
+                cut = max(sentence.rfind(" ", 0, limit), sentence.rfind("\n", 0, limit))
+                cut = cut + 1 if cut > 0 else limit
+                pieces.append(sentence[:cut])
+                sentence = sentence[cut:]
+            current = sentence
+        if current:
+            pieces.append(current)
+    return pieces
+
+_MARKDOWN_HINT_RE = re.compile(r'[`|&<>\[\]/#~\t]|www\.|^[ \t]*(?:[-*+]|\d+[.)])[ \t]|^ {4}', re.M)
+_FENCE_RE = re.compile(r'[ ]{0,3}(`{3,}|~{3,})')
+_INDENTED_CODE_RE = re.compile(r'(?: {4}|\t)')
+_TABLE_SEPARATOR_RE = re.compile(r'[ \t]*\|?[ \t]*:?-+:?[ \t]*(?:\|[ \t]*:?-+:?[ \t]*)+\|?[ \t]*$')
+# 行首的引用符号（Reddit 返回的正文中为 &gt;）、标题和列表标记
+_BLOCK_PREFIX_RE = re.compile(r'[ \t]*(?:(?:>|&gt;)[ \t]?)*[ \t]*(?:#{1,6}[ \t]+|[-*+][ \t]+|\d{1,9}[.)][ \t]+)?')
+_INLINE_PROTECTED_RE = re.compile(
+    r'(`+).+?\1(?!`)'                                   # 行内代码
+    r'|!?\[(?=[^\[\]\n]*\]\()'                          # 链接文字的左括号
+    r'|\]\([^()\s]*(?:\([^()\s]*\)[^()\s]*)*(?:\s+"[^"]*")?\)'  # 链接目标 ](url)
+    r'|<?(?:https?://|www\.)(?:[^\s<>()]*\([^\s<>()]*\))*[^\s<>()]*(?<![.,;:!?\'"\]])>?'  # 裸链接（可含成对括号）
+    r'|(?<![\w/])/?[uUrR]/[A-Za-z0-9_-]+'                # 用户名和版块引用
+    r'|&(?:#\d+|#x[0-9a-fA-F]+|[A-Za-z]+);'             # HTML 实体
+    r'|\|'                                              # 表格分隔符
+)
+
+def segment_markdown(text: str) -> List[Tuple[str, bool]]:
+    """把 Reddit markdown 切分为 (片段, 是否可翻译) 列表，片段依次拼接即为原文
+    
+    代码块、行内代码、链接地址、u/ 和 r/ 引用、HTML 实体、表格分隔行以及
+    行首的引用、标题和列表标记不可翻译；链接文字、引用内容和表格单元格按
+    自然语言处理。同一段落内换行的相邻行合并为一个片段。
+    """
+    if not _MARKDOWN_HINT_RE.search(text):
+        return [(text, True)]
+    
+    spans = []
+    
+    def add(part: str, translatable: bool):
+        if not part:
+            return
+        if spans and spans[-1][1] == translatable:
+            spans[-1] = (spans[-1][0] + part, translatable)
+        else:
+            spans.append((part, translatable))
+    
+    fence = None      # 当前所在围栏代码块的起始标记
+    in_code = False   # 上一行是否为缩进代码
+    blank = True      # 上一行是否为空行
+    for line in text.splitlines(keepends=True):
+        content = line.rstrip("\r\n")
+        newline = line[len(content):]
+        if fence is not None:
+            add(line, False)
+            match = _FENCE_RE.match(content)
+            if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence) and not content[match.end():].strip():
+                fence = None
+            continue
+        match = _FENCE_RE.match(content)
+        if match:
+            fence = match.group(1)
+            add(line, False)
+            continue
+        if not content.strip():
+            # 空行：段落边界，结束缩进代码块但不中断其后的缩进代码
+            add(line, False)
+            blank = True
+            continue
+        if (blank or in_code) and _INDENTED_CODE_RE.match(content):
+            add(line, False)
+            in_code, blank = True, False
+            continue
+        in_code = blank = False
+        if "|" in content and _TABLE_SEPARATOR_RE.match(content):
+            add(line, False)
+            continue
+        
+        prefix = _BLOCK_PREFIX_RE.match(content).end()
+        add(content[:prefix], False)
+        position = prefix
+        for protected in _INLINE_PROTECTED_RE.finditer(content, prefix):
+            add(content[position:protected.start()], True)
+            add(protected.group(), False)
+            position = protected.end()
+        add(content[position:], True)
+        
+        # 段落内的换行并入可翻译片段，让跨行的句子一起翻译
+        add(newline, bool(spans) and spans[-1][1])
+    return spans
 
 class TranslationService:
     """翻译服务基类"""
     
     def __init__(self, config: TranslationConfig):
         self.config = config
-        self.cache = {}
+        self.cache = TranslationCache(config.cache_max_entries, config.cache_max_bytes, config.cache_ttl)
+        self.store = None  # 持久化缓存，由 TranslationManager 注入
         self.session = None
+        self._owns_session = False
+        self.breaker = CircuitBreaker(config.circuit_failure_threshold, config.circuit_reset_timeout)
+        self.fallback = None  # 失败或熔断时接替的下一个服务，由 TranslationManager 串联
+        self.rate_limiter = get_provider_limiter(config.service)
+        self._inflight = {}  # 缓存键 -> 在途请求的 future
+        self.request_semaphore = None  # 限制同时在途的请求数，由 TranslationManager 注入
+        self._dedup_stats = {"requested": 0, "sent": 0, "coalesced": 0}
+        self._char_stats = {"original": 0, "translatable": 0, "sent": 0}
+        self._memory_stats = {}  # 版块 -> {"segments": 句子数, "hits": 无需发送的句子数}
+        self._metric_labels = (("provider", config.service),)
+        defaults = self.rate_limit_defaults
+        self.rate_limiter.configure(
+            defaults[0] if config.rate_limit_requests_per_second is None else config.rate_limit_requests_per_second,
+            defaults[1] if config.rate_limit_chars_per_second is None else config.rate_limit_chars_per_second,
+            defaults[2] if config.rate_limit_burst is None else config.rate_limit_burst
+        )
     
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        # 已由 TranslationManager 注入共享会话时直接复用，不再每次新建连接
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession()
+            self._owns_session = True
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
+        if self._owns_session and self.session:
             await self.session.close()
+            self.session = None
+            self._owns_session = False
+    
+    # 服务商默认限流：(每秒请求数, 每秒字符数, 突发请求数)，0 表示不限制
+    rate_limit_defaults = (0, 0, 1)
+    
+    # 持久化缓存按 (服务, 源语言, 目标语言) 区分命名空间
+    source_lang = "en"
+    target_lang = "zh"
+    # 文本预处理策略标识，截断/分段方式变化时修改
+    text_policy = "sentence"
+    # 单个片段（单次请求中的一段）的最大字符数，实际取与 config.max_length 的较小值
+    max_chunk_chars = 5000
     
     def _get_cache_key(self, text: str) -> str:
-        """生成缓存键"""
-        return hashlib.md5(text.encode('utf-8')).hexdigest()
+        """生成缓存键
+        
+        text 为实际发送给服务商的片段（长文本切分之后），
+        键中包含版本、服务、模型、语言对和预处理策略。
+        """
+        return "|".join((
+            f"v{CACHE_KEY_VERSION}",
+            self.config.service,
+            self.config.model or "",
+            f"{self.source_lang}>{self.target_lang}",
+            self.text_policy,
+            _text_digest(text.encode('utf-8'))
+        ))
+    
+    @property
+    def chunk_limit(self) -> int:
+        return max(1, min(self.max_chunk_chars, self.config.max_length))
+    
+    @property
+    def cache_namespace(self) -> tuple:
+        return (self.config.service, self.source_lang, self.target_lang)
     
     def _should_translate(self, text: str) -> bool:
         """判断是否需要翻译"""
-        if not text or len(text.strip()) < 3:
-            return False
+        return should_translate_text(text)
+    
+    async def translate(self, text: str, subreddit: Optional[str] = None) -> str:
+        """翻译文本"""
+        return (await self.translate_many([text], subreddit))[0]
+    
+    async def translate_many(self, texts: List[str], subreddit: Optional[str] = None) -> List[str]:
+        """翻译一组文本（一个服务端批次），结果与输入顺序一致
         
-        # 检查是否主要是中文
-        chinese_chars = len(re.findall(r'[\u4e00-\u9fff]', text))
-        total_chars = len(re.findall(r'[\w\u4e00-\u9fff]', text))
+        启用 preserve_markdown 时先用 segment_markdown 剔除代码、链接等不可翻译的部分；
+        其余部分按段落（超过 chunk_limit 时）和句子切分，每句规范化后作为一个
+        翻译记忆单元单独缓存，只发送没见过的句子，再按原顺序拼回
+        （句间和段落间的空白原样保留）；某句翻译失败时该句保留原文。
+        单次请求只支持一段文本的服务把同一文本中没见过的句子合并为一次请求（见 _plan_requests）。
+        subreddit 仅用于按版块统计翻译记忆命中率。
+        """
+        results = list(texts)
+        if not self.config.enabled:
+            return results
         
-        if total_chars == 0:
-            return False
+        chunks = []   # 待翻译片段
+        owners = []   # 各片段所属文本的下标
+        layouts = []  # (文本下标, 片段下标或原样保留的空白)
+        for index, (text, wanted) in enumerate(zip(texts, should_translate_many(texts))):
+            if not wanted:
+                continue
+            layout = []
+            spans = segment_markdown(text) if self.config.preserve_markdown else [(text, True)]
+            for span, translatable in spans:
+                if not translatable:
+                    layout.append(span)
+                    continue
+                for piece in split_text(span, self.chunk_limit):
+                    for sentence in _SENTENCE_BREAK_RE.split(piece):
+                        segment = normalize_segment(sentence)
+                        if not segment or not should_translate_text(segment):
+                            layout.append(sentence)
+                            continue
+                        core = sentence.strip()
+                        start = len(sentence) - len(sentence.lstrip())
+                        if start:
+                            layout.append(sentence[:start])
+                        layout.append(len(chunks))
+                        chunks.append(segment)
+                        owners.append(index)
+                        if start + len(core) < len(sentence):
+                            layout.append(sentence[start + len(core):])
+            layouts.append((index, layout))
+            self._char_stats["original"] += len(text)
+        self._char_stats["translatable"] += sum(len(chunk) for chunk in chunks)
         
-        chinese_ratio = chinese_chars / total_chars
-        return chinese_ratio < 0.3  # 如果中文字符少于30%，则翻译
+        translated = await self._translate_chunks(chunks, subreddit, owners)
+        for index, layout in layouts:
+            results[index] = "".join(translated[part] if isinstance(part, int) else part for part in layout)
+        return results
     
-    async def translate(self, text: str) -> str:
-        """翻译文本"""
-        if not self.config.enabled or not self._should_translate(text):
-            return text
+    async def _translate_chunks(self, chunks: List[str], subreddit: Optional[str] = None,
+                                owners: Optional[List[int]] = None) -> List[str]:
+        """翻译一组片段，失败的片段返回原文
         
-        # 检查缓存
-        if self.config.cache_enabled:
+        跳过已缓存的片段；相同的片段只发送一次，其他调用中正在翻译的片段
+        直接等待那次请求的结果（single-flight）。其余按服务商的单次请求限制
+        合并为尽量少的 HTTP 请求并发发送；某个请求重试后仍失败或服务已熔断时，
+        交给 fallback 服务翻译。owners 为各片段所属文本的下标，用于单段服务的分组。
+        """
+        results = list(chunks)
+        pending = []  # (下标, 缓存键, 片段)
+        for index, text in enumerate(chunks):
+            # 检查缓存（未启用缓存时键仍用于合并重复请求）
             cache_key = self._get_cache_key(text)
-            if cache_key in self.cache:
-                return self.cache[cache_key]
+            if self.config.cache_enabled:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    results[index] = cached
+                    continue
+            
+            pending.append((index, cache_key, text))
         
-        # 文本长度限制
-        if len(text) > self.config.max_length:
-            text = text[:self.config.max_length] + "..."
+        # 内存未命中的再查询持久化缓存
+        if pending and self.store is not None and self.config.cache_enabled:
+            try:
+                stored = await self.store.get_many(self.cache_namespace, [key for _, key, _ in pending])
+            except Exception as e:
+                # 数据库不可用时退回纯内存缓存
+                logger.warning("读取持久化缓存失败，已停用", extra={"error": str(e)})
+                self.store = None
+                stored = {}
+            if stored:
+                remaining = []
+                for index, cache_key, text in pending:
+                    if cache_key in stored:
+                        results[index] = self.cache[cache_key] = stored[cache_key]
+                    else:
+                        remaining.append((index, cache_key, text))
+                pending = remaining
         
-        try:
-            translated = await self._translate_impl(text)
+        # 合并重复片段：本批次内相同的键只发送一次，其他调用在途的键直接等待其结果
+        owned = {}    # 缓存键 -> (片段, [下标])
+        futures = {}  # 缓存键 -> 本次调用登记的 future
+        waiting = {}  # 缓存键 -> (future, [下标])
+        for index, cache_key, text in pending:
+            if cache_key in owned:
+                owned[cache_key][1].append(index)
+            elif cache_key in waiting:
+                waiting[cache_key][1].append(index)
+            elif cache_key in self._inflight:
+                waiting[cache_key] = (self._inflight[cache_key], [index])
+            else:
+                owned[cache_key] = (text, [index])
+                futures[cache_key] = self._inflight[cache_key] = asyncio.get_running_loop().create_future()
+        
+        stats = self._dedup_stats
+        stats["requested"] += len(pending)
+        stats["sent"] += len(owned)
+        stats["coalesced"] += sum(len(indices) for _, indices in waiting.values())
+        self._char_stats["sent"] += sum(len(text) for text, _ in owned.values())
+        memory = self._memory_stats.setdefault(subreddit or "-", {"segments": 0, "hits": 0})
+        memory["segments"] += len(chunks)
+        memory["hits"] += len(chunks) - len(owned)
+        
+        def resolve(cache_key: str, value: str):
+            for index in owned[cache_key][1]:
+                results[index] = value
+            future = futures[cache_key]
+            if self._inflight.get(cache_key) is future:
+                del self._inflight[cache_key]
+            if not future.done():
+                future.set_result(value)
+        
+        async def run_group(items: List[tuple]):
+            try:
+                translated = await self._request_with_retry([text for _, text in items])
+            except Exception as e:
+                if not isinstance(e, CircuitOpenError):
+                    logger.warning(
+                        "翻译失败，%s", "交给备用服务" if self.fallback is not None else "保留原文",
+                        extra={"provider": self.config.service, "count": len(items), "error": str(e) or type(e).__name__}
+                    )
+                if self.fallback is not None:
+                    # 备用服务的译文按其自身的缓存键缓存，主服务恢复后重新翻译
+                    translated = await self.fallback.translate_many([text for _, text in items])
+                else:
+                    translated = [text for _, text in items]  # 翻译失败时返回原文
+                for (cache_key, _), value in zip(items, translated):
+                    resolve(cache_key, value)
+                return
             
             # 缓存结果
             if self.config.cache_enabled:
-                self.cache[cache_key] = translated
-            
-            return translated
-        except Exception as e:
-            print(f"翻译失败: {str(e)}")
-            return text  # 翻译失败时返回原文
+                for (cache_key, _), value in zip(items, translated):
+                    self.cache[cache_key] = value
+                if self.store is not None:
+                    self.store.put_many(
+                        self.cache_namespace,
+                        {cache_key: value for (cache_key, _), value in zip(items, translated)}
+                    )
+            for (cache_key, _), value in zip(items, translated):
+                resolve(cache_key, value)
+        
+        unique = [(cache_key, text) for cache_key, (text, _) in owned.items()]
+        unique_owners = [owners[indices[0]] for _, indices in owned.values()] if owners else None
+        try:
+            # 各请求并发发送，由 request_semaphore 和限流器控制节奏
+            await asyncio.gather(*[
+                run_group([unique[i] for i in group])
+                for group in self._plan_requests([text for _, text in unique], unique_owners)
+            ])
+        finally:
+            # 异常或取消时也要释放在途登记，等待者退回原文
+            for cache_key, text in unique:
+                if not futures[cache_key].done():
+                    resolve(cache_key, text)
+        
+        for future, indices in waiting.values():
+            value = await asyncio.shield(future)
+            for index in indices:
+                results[index] = value
+        
+        return results
+    
+    def dedup_stats(self) -> Dict[str, Any]:
+        """重复请求合并统计：需翻译的文本数、实际发送数、等待在途请求数和去重比例"""
+        stats = dict(self._dedup_stats)
+        stats["dedup_ratio"] = 1 - stats["sent"] / stats["requested"] if stats["requested"] else 0.0
+        return stats
+    
+    def char_stats(self) -> Dict[str, Any]:
+        """字符统计：需翻译文本的原始字符数、剔除代码链接后的可翻译字符数和实际发送字符数"""
+        stats = {f"{key}_chars": value for key, value in self._char_stats.items()}
+        original = self._char_stats["original"]
+        stats["sent_ratio"] = self._char_stats["sent"] / original if original else 0.0
+        return stats
+    
+    def memory_stats(self) -> Dict[str, Dict[str, Any]]:
+        """按版块统计的翻译记忆命中率
+        
+        segments 为需要翻译的句子数，hits 为无需发送的句子数（缓存命中、
+        批内重复或等待在途请求），未指定版块的请求记在 "-" 下。
+        """
+        return {
+            subreddit: dict(stats, hit_rate=stats["hits"] / stats["segments"] if stats["segments"] else 0.0)
+            for subreddit, stats in self._memory_stats.items()
+        }
+    
+    # 单次请求的分段数和字节数上限，支持多段请求的子类覆盖
+    max_segments_per_request = 1
+    max_request_bytes = 0
+    
+    def _plan_requests(self, texts: List[str], owners: Optional[List[int]] = None) -> List[List[int]]:
+        """按分段数和字节数上限把文本分组，每组对应一次 HTTP 请求
+        
+        单次请求只支持一段文本的服务（max_segments_per_request 为 1）按 owners 把
+        同一原文的句子分为一组，由 _translate_many_impl 用换行连接后一次发送，
+        连接后不超过 chunk_limit 个字符；服务也能看到句子的上下文。
+        """
+        single = self.max_segments_per_request == 1 and owners is not None
+        groups = []
+        current = []
+        current_bytes = 0
+        current_chars = 0
+        for index, text in enumerate(texts):
+            size = len(text.encode('utf-8'))
+            if single:
+                full = bool(current) and (
+                    owners[index] != owners[current[0]] or current_chars + 1 + len(text) > self.chunk_limit
+                )
+            else:
+                full = len(current) >= self.max_segments_per_request or (
+                    self.max_request_bytes and current_bytes + size > self.max_request_bytes
+                )
+            if current and full:
+                groups.append(current)
+                current = []
+                current_bytes = 0
+                current_chars = 0
+            current.append(index)
+            current_bytes += size
+            current_chars += len(text) + 1
+        if current:
+            groups.append(current)
+        return groups
+    
+    async def _request_with_retry(self, texts: List[str]) -> List[str]:
+        """发送一次翻译请求，带超时、重试和熔断，每次尝试记录耗时、排队时间和收发字节数"""
+        attempts = max(0, self.config.max_retries) + 1
+        labels = self._metric_labels
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"{self.config.service} 翻译服务已熔断")
+            try:
+                queued_at = time.perf_counter()
+                async with self.request_semaphore or contextlib.nullcontext():
+                    await self.rate_limiter.acquire(sum(len(text) for text in texts))
+                    started_at = time.perf_counter()
+                    METRICS.observe("translation_queue_wait_seconds", started_at - queued_at, labels)
+                    METRICS.inc("translation_bytes_out_total", labels, sum(len(text.encode('utf-8')) for text in texts))
+                    try:
+                        translated = await asyncio.wait_for(
+                            self._translate_many_impl(texts), self.config.request_timeout or None
+                        )
+                    finally:
+                        METRICS.observe("translation_provider_request_seconds", time.perf_counter() - started_at, labels)
+                if len(translated) != len(texts):
+                    raise ValueError(f"返回 {len(translated)} 条译文，期望 {len(texts)} 条")
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    status = "timeout"
+                elif isinstance(e, TranslationHTTPError):
+                    status = f"http_{e.status}"
+                else:
+                    status = "error"
+                METRICS.inc("translation_provider_requests_total", labels + (("status", status),))
+                logger.warning("翻译请求失败", extra={
+                    "provider": self.config.service, "status": status, "attempt": attempt + 1,
+                    "count": len(texts), "error": str(e) or type(e).__name__
+                })
+                self.breaker.record_failure()
+                if isinstance(e, TranslationHTTPError) and e.status == 429:
+                    # 同一服务商的其他请求一起暂停，避免连续触发限流
+                    self.rate_limiter.pause(e.retry_after if e.retry_after is not None else self.config.retry_backoff_base)
+                delay = self._retry_delay(e, attempt)
+                if attempt + 1 >= attempts or delay is None:
+                    raise
+                await asyncio.sleep(delay)
+            except BaseException:
+                # 取消等不计入熔断统计，但要释放半开状态下的探测名额
+                self.breaker.record_abort()
+                raise
+            else:
+                METRICS.inc("translation_provider_requests_total", labels + (("status", "ok"),))
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("翻译请求完成", extra={
+                        "provider": self.config.service, "status": "ok", "count": len(texts),
+                        "latency": round(time.perf_counter() - started_at, 4), "sample": True
+                    })
+                METRICS.inc("translation_bytes_in_total", labels, sum(len(text.encode('utf-8')) for text in translated))
+                self.breaker.record_success()
+                return translated
+    
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """计算重试前的等待秒数，不应重试时返回 None
+        
+        超时、连接错误、429 和 5xx 可重试；等待时间为带全抖动的指数退避，
+        Retry-After 超过退避上限时不再等待，交给备用服务。
+        """
+        if isinstance(error, TranslationHTTPError):
+            if not error.retryable:
+                return None
+        elif not isinstance(error, (asyncio.TimeoutError, aiohttp.ClientError)):
+            return None
+        
+        cap = self.config.retry_backoff_max
+        delay = random.uniform(0, min(cap, self.config.retry_backoff_base * (2 ** attempt)))
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is not None:
+            if retry_after > cap:
+                return None
+            delay = max(delay, retry_after)
+        return delay
+    
+    @staticmethod
+    def _raise_for_status(service: str, response: "aiohttp.ClientResponse"):
+        """非 200 响应转换为 TranslationHTTPError"""
+        if response.status != 200:
+            try:
+                retry_after = float(response.headers.get("Retry-After"))
+            except (TypeError, ValueError):
+                retry_after = None
+            raise TranslationHTTPError(service, response.status, retry_after)
+    
+    async def _translate_many_impl(self, texts: List[str]) -> List[str]:
+        """一次请求翻译多段文本
+        
+        默认把各段用换行连接后调用一次 _translate_impl，再按行拆回；
+        只有一段、段内有换行或返回的行数对不上时逐段请求。
+        """
+        if len(texts) > 1 and not any("\n" in text for text in texts):
+            lines = (await self._translate_impl("\n".join(texts))).split("\n")
+            if len(lines) == len(texts):
+                return [line.strip() for line in lines]
+        return [await self._translate_impl(text) for text in texts]
     
     async def _translate_impl(self, text: str) -> str:
         """具体的翻译实现，由子类重写"""
@@ -117,9 +1458,17 @@ class TranslationService:
 class GoogleTranslator(TranslationService):
     """Google 翻译服务"""
     
+    # 免费 gtx 接口没有公开配额，过快时返回 429
+    rate_limit_defaults = (5, 0, 10)
+    # 文本放在 GET 查询串中，URL 编码后过长会被拒绝
+    max_chunk_chars = 1800
+    # 多句用换行连接后一次请求（见 _translate_many_impl），接口保留换行，再按行拆回
+    max_segments_per_request = 20
+    max_request_bytes = 1800
+    
     async def _translate_impl(self, text: str) -> str:
         # 使用免费的 Google Translate API
-        url = "https://translate.googleapis.com/translate_a/single"
+        url = self.config.endpoint or "https://translate.googleapis.com/translate_a/single"
         params = {
             'client': 'gtx',
             'sl': 'en',
@@ -129,20 +1478,24 @@ class GoogleTranslator(TranslationService):
         }
         
         async with self.session.get(url, params=params) as response:
-            if response.status == 200:
-                result = await response.json()
-                if result and result[0]:
-                    return ''.join([item[0] for item in result[0] if item[0]])
+            self._raise_for_status("Google", response)
+            result = await response.json()
+            if result and result[0]:
+                return ''.join([item[0] for item in result[0] if item[0]])
         
         raise Exception("Google 翻译请求失败")
 
 class TranslateLibTranslator(TranslationService):
     """使用 translate 库的翻译服务"""
     
+    # translate 库默认使用 MyMemory，单次查询不超过 500 个字符
+    max_chunk_chars = 500
+    
     def __init__(self, config: TranslationConfig):
         super().__init__(config)
         if not TRANSLATE_AVAILABLE:
             raise ImportError("translate 库未安装，请运行: pip install translate")
+        from translate import Translator
         self.translator = Translator(to_lang="zh-CN", from_lang="en")
     
     async def _translate_impl(self, text: str) -> str:
@@ -158,47 +1511,69 @@ class TranslateLibTranslator(TranslationService):
 class DeepLTranslator(TranslationService):
     """DeepL 翻译服务"""
     
+    # DeepL 单次请求最多 50 段文本，请求体不超过 128 KiB
+    max_segments_per_request = 50
+    max_request_bytes = 120 * 1024
+    
     async def _translate_impl(self, text: str) -> str:
+        return (await self._translate_many_impl([text]))[0]
+    
+    async def _translate_many_impl(self, texts: List[str]) -> List[str]:
         if not self.config.api_key:
             raise Exception("DeepL API 密钥未配置")
         
-        url = "https://api-free.deepl.com/v2/translate"
+        url = self.config.endpoint or "https://api-free.deepl.com/v2/translate"
         headers = {
             'Authorization': f'DeepL-Auth-Key {self.config.api_key}',
             'Content-Type': 'application/json'
         }
         data = {
-            'text': [text],
+            'text': texts,
             'source_lang': 'EN',
             'target_lang': 'ZH'
         }
         
         async with self.session.post(url, headers=headers, json=data) as response:
-            if response.status == 200:
-                result = await response.json()
-                if result.get('translations'):
-                    return result['translations'][0]['text']
+            self._raise_for_status("DeepL", response)
+            result = await response.json()
+            if result.get('translations'):
+                return [item['text'] for item in result['translations']]
         
         raise Exception("DeepL 翻译请求失败")
 
 class BaiduTranslator(TranslationService):
     """百度翻译服务"""
     
+    # 百度接口按换行拆分 q 并逐行返回结果，q 建议不超过 6000 字节
+    max_segments_per_request = 50
+    max_request_bytes = 6000
+    # 高级版 QPS 为 10（标准版为 1，需在配置中调低）
+    rate_limit_defaults = (10, 0, 10)
+    max_chunk_chars = 2000
+    
     def _generate_sign(self, query: str, salt: str) -> str:
         """生成百度翻译签名"""
         sign_str = self.config.api_key + query + salt + self.config.secret_key
         return hashlib.md5(sign_str.encode('utf-8')).hexdigest()
     
     async def _translate_impl(self, text: str) -> str:
+        return (await self._translate_many_impl([text]))[0]
+    
+    async def _translate_many_impl(self, texts: List[str]) -> List[str]:
         if not self.config.api_key or not self.config.secret_key:
             raise Exception("百度翻译 API 密钥未配置")
         
-        url = "https://fanyi-api.baidu.com/api/trans/vip/translate"
+        # 每段文本按行展开，空行不发送，返回后再按行数拼回各段
+        segments = [text.split('\n') for text in texts]
+        query_lines = [line for lines in segments for line in lines if line.strip()]
+        
+        url = self.config.endpoint or "https://fanyi-api.baidu.com/api/trans/vip/translate"
+        query = '\n'.join(query_lines)
         salt = str(int(time.time()))
-        sign = self._generate_sign(text, salt)
+        sign = self._generate_sign(query, salt)
         
         params = {
-            'q': text,
+            'q': query,
             'from': 'en',
             'to': 'zh',
             'appid': self.config.api_key,
@@ -206,92 +1581,1037 @@ class BaiduTranslator(TranslationService):
             'sign': sign
         }
         
-        async with self.session.get(url, params=params) as response:
-            if response.status == 200:
-                result = await response.json()
-                if result.get('trans_result'):
-                    return result['trans_result'][0]['dst']
+        # 多行查询使用 POST 表单，避免 URL 过长
+        async with self.session.post(url, data=params) as response:
+            self._raise_for_status("百度", response)
+            result = await response.json()
+            if result.get('trans_result'):
+                translated_lines = iter([item['dst'] for item in result['trans_result']])
+                if len(result['trans_result']) != len(query_lines):
+                    raise Exception("百度翻译返回的行数与请求不一致")
+                return [
+                    '\n'.join(next(translated_lines) if line.strip() else line for line in lines)
+                    for lines in segments
+                ]
         
         raise Exception("百度翻译请求失败")
 
 class OpenAITranslator(TranslationService):
     """OpenAI GPT 翻译服务"""
     
-    async def _translate_impl(self, text: str) -> str:
+    # 多段文本合并为一次对话请求，控制输入规模以免超出输出 token 上限
+    max_segments_per_request = 20
+    max_request_bytes = 6000
+    max_chunk_chars = 2000
+    
+    async def _chat(self, prompt: str, max_tokens: int) -> str:
+        """发送一次 chat completion 请求，返回回复内容"""
         if not self.config.api_key:
             raise Exception("OpenAI API 密钥未配置")
         
-        url = "https://api.openai.com/v1/chat/completions"
+        url = self.config.endpoint or "https://api.openai.com/v1/chat/completions"
         headers = {
             'Authorization': f'Bearer {self.config.api_key}',
             'Content-Type': 'application/json'
         }
         
-        prompt = f"请将以下英文内容翻译成中文，保持原文的格式和语气：\n\n{text}"
+        data = {
+            'model': self.config.model or 'gpt-3.5-turbo',
+            'messages': [
+                {'role': 'user', 'content': prompt}
+            ],
+            'max_tokens': max_tokens,
+            'temperature': 0.3
+        }
+        
+        async with self.session.post(url, headers=headers, json=data) as response:
+            self._raise_for_status("OpenAI", response)
+            result = await response.json()
+            if result.get('choices'):
+                return result['choices'][0]['message']['content'].strip()
+        
+        raise Exception("OpenAI 翻译请求失败")
+    
+    async def _translate_impl(self, text: str) -> str:
+        prompt = f"请将以下英文内容翻译成中文，保持原文的格式和语气：\n\n{text}"
+        return await self._chat(prompt, 2000)
+    
+    async def _translate_many_impl(self, texts: List[str]) -> List[str]:
+        if len(texts) == 1:
+            return [await self._translate_impl(texts[0])]
+        
+        prompt = (
+            "请将下面 JSON 数组中的每一段英文内容翻译成中文，保持原文的格式和语气；"
+            "相邻的几段可能是同一段文字中连续的句子，请结合上下文翻译。"
+            "只返回一个长度相同、顺序一致的 JSON 字符串数组，不要添加任何说明：\n\n"
+            + json.dumps(texts, ensure_ascii=False)
+        )
+        content = await self._chat(prompt, 4000)
+        
+        # 兼容模型用 ```json 代码块包裹结果的情况
+        content = re.sub(r'^```(?:json)?\s*|\s*```$', '', content.strip())
+        translated = json.loads(content)
+        if not isinstance(translated, list) or len(translated) != len(texts):
+            raise Exception("OpenAI 返回的译文数量与请求不一致")
+        return [str(item) for item in translated]
+
+class TranslationManager:
+    """翻译管理器"""
+    
+    def __init__(self, config: TranslationConfig):
+        self.config = config
+        self.translator = self._create_translator()
+        # 故障转移链：主服务在前，备用服务按配置顺序依次接替
+        self.chain = [self.translator] + self._create_fallbacks()
+        for service, fallback in zip(self.chain, self.chain[1:]):
+            service.fallback = fallback
+        self.session = None
+        self._session_lock = None
+        self._warm_task = None
+        self.store = None
+        if config.cache_enabled and config.persistent_cache_enabled:
+            self.store = PersistentTranslationCache(config.persistent_cache_path)
+            for service in self.chain:
+                service.store = self.store
+        self._batch_stats = {"texts": 0, "unique": 0}
+        # 限制同时在途的请求数，避免大批量翻译时触发服务商限流；
+        # 只在真正发送请求时占用，等待在途结果或命中缓存的调用不占名额
+        self._semaphore = asyncio.Semaphore(max(1, config.concurrent_requests))
+        for service in self.chain:
+            service.request_semaphore = self._semaphore
+        METRICS.add_collector(self._collect_metrics)
+    
+    def _collect_metrics(self) -> List[tuple]:
+        """导出各服务内存缓存的命中、未命中、淘汰次数和占用"""
+        samples = []
+        for service in self.chain:
+            cache = service.cache
+            labels = service._metric_labels
+            samples += [
+                ("translation_cache_hits_total", labels, cache.hits),
+                ("translation_cache_misses_total", labels, cache.misses),
+                ("translation_cache_evictions_total", labels, cache.evictions),
+                ("translation_cache_entries", labels, len(cache)),
+                ("translation_cache_bytes", labels, cache.stats()["bytes"]),
+            ]
+        return samples
+    
+    async def __aenter__(self):
+        await self._ensure_session()
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+    
+    async def _ensure_session(self) -> "aiohttp.ClientSession":
+        """获取进程级共享的 HTTP 会话，首次调用时创建连接池"""
+        if self.session is not None and not self.session.closed:
+            return self.session
+        
+        if self._session_lock is None:
+            self._session_lock = asyncio.Lock()
+        
+        async with self._session_lock:
+            # 并发调用者在锁内二次检查，保证只创建一个连接池
+            if self.session is None or self.session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.config.pool_limit,
+                    limit_per_host=self.config.pool_limit_per_host,
+                    keepalive_timeout=self.config.keepalive_timeout,
+                    ttl_dns_cache=self.config.dns_cache_ttl,
+                    use_dns_cache=True
+                )
+                self.session = aiohttp.ClientSession(connector=connector)
+                for service in self.chain:
+                    service.session = self.session
+                    service._owns_session = False
+                
+                # 后台预热持久化缓存，热门帖子重启后无需再次请求翻译接口
+                if self.store is not None and self._warm_task is None:
+                    self._warm_task = asyncio.create_task(self._warm_cache())
+        
+        return self.session
+    
+    async def get_session(self) -> "aiohttp.ClientSession":
+        """获取共享连接池，供 Reddit 数据源等其他 HTTP 调用复用"""
+        return await self._ensure_session()
+    
+    async def _warm_cache(self):
+        """把最近的持久化缓存加载到内存"""
+        try:
+            cache = self.translator.cache
+            limit = self.config.cache_warm_entries
+            if cache.max_entries:
+                limit = min(limit, cache.max_entries)
+            entries = await self.store.warm(self.translator.cache_namespace, limit)
+            # 结果按写入时间倒序，反向插入使最新条目处于 LRU 的最近使用端
+            for key, value in reversed(list(entries.items())):
+                if key not in cache:
+                    cache[key] = value
+        except Exception as e:
+            logger.warning("预热持久化缓存失败", extra={"error": str(e)})
+    
+    async def close(self):
+        """关闭共享连接池并提交持久化缓存"""
+        if self._warm_task is not None and not self._warm_task.done():
+            self._warm_task.cancel()
+        self._warm_task = None
+        if self.store is not None:
+            try:
+                await self.store.close()
+            except Exception as e:
+                logger.warning("关闭持久化缓存失败", extra={"error": str(e)})
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        for service in self.chain:
+            service.session = None
+    
+    def _create_translator(self, config: TranslationConfig = None) -> TranslationService:
+        """创建翻译服务实例"""
+        config = config or self.config
+        if config.service == "google":
+            try:
+                return GoogleTranslator(config)
+            except Exception:
+                # 如果 Google 翻译失败，尝试使用 translate 库作为备选
+                if TRANSLATE_AVAILABLE:
+                    return TranslateLibTranslator(config)
+                raise
+        elif config.service == "translate":
+            return TranslateLibTranslator(config)
+        elif config.service == "deepl":
+            return DeepLTranslator(config)
+        elif config.service == "baidu":
+            return BaiduTranslator(config)
+        elif config.service == "openai":
+            return OpenAITranslator(config)
+        else:
+            raise ValueError(f"不支持的翻译服务: {config.service}")
+    
+    def _create_fallbacks(self) -> List[TranslationService]:
+        """按 fallback_services 创建备用服务，无法创建的跳过
+        
+        备用服务沿用主配置的超时、重试、缓存等设置，
+        但密钥、端点、模型和限流只取自各自的配置项。
+        """
+        fallbacks = []
+        seen = {self.config.service}
+        for entry in self.config.fallback_services or []:
+            overrides = dict(entry) if isinstance(entry, dict) else {"service": entry}
+            if overrides.get("service") in seen:
+                continue
+            seen.add(overrides.get("service"))
+            config = replace(
+                self.config, api_key=None, secret_key=None, endpoint=None, model=None, fallback_services=[],
+                rate_limit_requests_per_second=None, rate_limit_chars_per_second=None, rate_limit_burst=None
+            )
+            for key, value in overrides.items():
+                if hasattr(config, key):
+                    setattr(config, key, value)
+            try:
+                fallbacks.append(self._create_translator(config))
+            except Exception as e:
+                logger.warning("备用翻译服务不可用", extra={"provider": overrides.get("service"), "error": str(e)})
+        return fallbacks
+    
+    async def translate_text(self, text: str, subreddit: Optional[str] = None) -> str:
+        """翻译单个文本，subreddit 用于按版块统计翻译记忆命中率"""
+        await self._ensure_session()
+        return await self.translator.translate(text, subreddit)
+    
+    async def translate_batch(self, texts: List[str], subreddit: Optional[str] = None) -> List[str]:
+        """批量翻译文本
+        
+        先按原文去重，再按 batch_size 分组并发执行，由信号量限制同时在途的请求数，
+        结果保持输入顺序；单条失败时保留原文，不影响整批。
+        """
+        if not texts:
+            return []
+        
+        await self._ensure_session()
+        # 相同的文本（如 "[deleted]"）只翻译一次，分批前先去重
+        unique = list(dict.fromkeys(texts))
+        self._batch_stats["texts"] += len(texts)
+        self._batch_stats["unique"] += len(unique)
+        translated_by_text = {}
+        # 不支持多段请求的服务每条文本单独成批，由信号量控制并发
+        batch_size = max(1, min(self.config.batch_size, self.translator.max_segments_per_request))
+        
+        async def run_batch(start: int):
+            batch = unique[start:start + batch_size]
+            try:
+                translated = await self.translator.translate_many(batch, subreddit)
+            except Exception as e:
+                logger.error("批量翻译失败", extra={"provider": self.config.service, "count": len(batch), "error": str(e)})
+                return
+            translated_by_text.update(zip(batch, translated))
+        
+        await asyncio.gather(*[run_batch(start) for start in range(0, len(unique), batch_size)])
+        return [translated_by_text.get(text, text) for text in texts]
+    
+    def dedup_stats(self) -> Dict[str, Any]:
+        """重复翻译合并统计
+        
+        batch_* 为 translate_batch 分批前按原文去重的数量，其余见
+        TranslationService.dedup_stats（按缓存键合并批内重复和在途请求）。
+        """
+        stats = self.translator.dedup_stats()
+        stats["batch_texts"] = self._batch_stats["texts"]
+        stats["batch_unique"] = self._batch_stats["unique"]
+        stats["batch_dedup_ratio"] = (
+            1 - self._batch_stats["unique"] / self._batch_stats["texts"] if self._batch_stats["texts"] else 0.0
+        )
+        return stats
+    
+    def char_stats(self) -> Dict[str, Any]:
+        """发送给主翻译服务的字符数与原文字符数对比，见 TranslationService.char_stats"""
+        return self.translator.char_stats()
+    
+    def memory_stats(self) -> Dict[str, Dict[str, Any]]:
+        """主翻译服务按版块统计的翻译记忆命中率，见 TranslationService.memory_stats"""
+        return self.translator.memory_stats()
+
+@dataclass
+class RedditConfig:
+    """Reddit 数据源配置"""
+    source: str = "demo"  # demo（内置演示数据）, reddit（Reddit JSON 接口）
+    base_url: str = "https://www.reddit.com"
+    user_agent: str = "python:mcp-reddit-translator:1.0"
+    # 令牌桶限流：每分钟请求数与突发容量，服务端限流响应头会进一步收紧
+    requests_per_minute: float = 60
+    burst: int = 5
+    # 列表缓存：TTL 内直接复用，过期后用 ETag / Last-Modified 条件请求重新验证
+    listing_ttl: float = 30.0
+    listing_cache_entries: int = 256
+    max_retries: int = 3
+    # 读取评论树时请求的评论数（Reddit 上限 500），与分页大小无关；其余评论按需用 /api/morechildren 展开
+    comment_limit: int = 500
+    # 读取过的帖子（及评论树、搜索索引）最多保留的条数，超出时淘汰最久未使用的帖子，0 表示不限制
+    post_store_entries: int = 1000
+
+def normalize_reddit_post(data: Dict[str, Any]) -> Dict[str, Any]:
+    """把 Reddit 接口的 t3 数据转换为内部帖子结构"""
+    permalink = data.get("permalink")
+    return {
+        "id": data["id"],
+        "title": data.get("title", ""),
+        "author": data.get("author") or "[deleted]",
+        "score": data.get("score", 0),
+        "num_comments": data.get("num_comments", 0),
+        "created_utc": int(data.get("created_utc") or 0),
+        "url": data.get("url") or (f"https://reddit.com{permalink}" if permalink else ""),
+        "selftext": data.get("selftext", ""),
+        "subreddit": data.get("subreddit", ""),
+        "post_hint": "self" if data.get("is_self") else "link"
+    }
+
+def normalize_reddit_thing(thing: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """把一个 t1（评论）或 more 节点转换为内部结构，回复列表为空；其他类型返回 None
+    
+    “more” 节点转换为 {"kind": "more", "count": n, "children": [评论ID]} 占位。
+    """
+    kind = thing.get("kind")
+    data = thing.get("data", {})
+    if kind == "more":
+        children = list(data.get("children", []))
+        # “继续此讨论串”节点 count 为 0，按子节点 ID 数计数
+        return {"kind": "more", "count": max(data.get("count", 0), len(children)), "children": children}
+    if kind == "t1":
+        return {
+            "id": data["id"],
+            "author": data.get("author") or "[deleted]",
+            "body": data.get("body", ""),
+            "score": data.get("score", 0),
+            "created_utc": int(data.get("created_utc") or 0),
+            "replies": []
+        }
+    return None
+
+def normalize_reddit_comments(listing: Any) -> List[Dict[str, Any]]:
+    """把 Reddit 评论 Listing 转换为内部评论树
+    
+    使用显式栈逐层展开 replies，任意深度均不会递归溢出。
+    """
+    root = []
+    stack = [(listing, root)]
+    while stack:
+        node, out = stack.pop()
+        if not isinstance(node, dict):
+            continue  # 没有回复时 Reddit 返回空字符串
+        for child in node.get("data", {}).get("children", []):
+            comment = normalize_reddit_thing(child)
+            if comment is None:
+                continue
+            out.append(comment)
+            if comment.get("kind") != "more":
+                stack.append((child["data"].get("replies"), comment["replies"]))
+    return root
+
+def normalize_more_children(things: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """把 /api/morechildren 返回的扁平列表转换为评论树
+    
+    列表按深度优先顺序排列，节点通过 parent_id 挂到已出现的父评论下，
+    父评论不在列表中的节点为顶层（即被展开的占位节点所在的层）。
+    """
+    root = []
+    replies = {}  # 评论 fullname -> 回复列表
+    for thing in things:
+        comment = normalize_reddit_thing(thing)
+        if comment is None:
+            continue
+        replies.get(thing["data"].get("parent_id"), root).append(comment)
+        if comment.get("kind") != "more":
+            replies[f"t1_{comment['id']}"] = comment["replies"]
+    return root
+
+class RedditDataSource:
+    """Reddit 数据源接口
+    
+    EnhancedRedditMCP 通过数据源读取帖子和评论，None 表示使用内置演示数据。
+    """
+    
+    async def hot_threads(self, subreddit: str, limit: int, after: Optional[str] = None) -> List[Dict[str, Any]]:
+        """返回 subreddit 的热门帖子，after 为上一页最后一个帖子的 fullname（t3_ID）"""
+        raise NotImplementedError
+    
+    async def post_details(self, post_id: str, max_depth: Optional[int] = None) -> Optional[tuple]:
+        """返回 (帖子, 评论树)，帖子不存在时返回 None
+        
+        读取的评论数与分页大小无关，未返回的评论在树中为“more”占位节点。
+        内容未变化时可以返回与上次相同的对象，调用方据此复用已展开的评论树。
+        """
+        raise NotImplementedError
+    
+    async def more_comments(self, post_id: str, children: List[str],
+                            max_depth: Optional[int] = None) -> List[Dict[str, Any]]:
+        """展开“more”占位节点：返回 children 中的评论（含回复）组成的评论树，
+        max_depth 为相对这些评论的回复层数；不支持或读取失败时返回空列表
+        """
+        return []
+    
+    async def search(self, query: str, subreddit: Optional[str] = None, limit: int = 25,
+                     after: Optional[str] = None) -> List[Dict[str, Any]]:
+        """按关键词搜索帖子，结果按相关度排序，after 含义同 hot_threads"""
+        raise NotImplementedError
+    
+    async def close(self):
+        """释放资源"""
+        pass
+
+class RedditJSONSource(RedditDataSource):
+    """读取 Reddit 公开 JSON 接口（*.json）的数据源
+    
+    HTTP 请求复用 session_provider 提供的共享连接池；每个请求先从令牌桶取令牌，
+    并根据 X-Ratelimit-Remaining / X-Ratelimit-Reset 响应头调整发放速度。
+    列表在 listing_ttl 内直接从缓存返回，过期后携带 If-None-Match /
+    If-Modified-Since 重新验证，304 时沿用缓存内容。
+    """
+    
+    def __init__(self, config: RedditConfig = None, session_provider=None):
+        self.config = config or RedditConfig()
+        self.base_url = self.config.base_url.rstrip("/")
+        self.session_provider = session_provider
+        self.session = None
+        self.limiter = TokenBucket(self.config.requests_per_minute / 60.0, self.config.burst)
+        self._listings = OrderedDict()  # URL -> {"data", "etag", "last_modified", "fetched_at"}
+        self._details = OrderedDict()   # (帖子ID, depth) -> (列表数据, (帖子, 评论树))
+        self.stats = {"requests": 0, "not_modified": 0, "cache_hits": 0, "rate_limited": 0}
+    
+    async def _get_session(self) -> "aiohttp.ClientSession":
+        if self.session_provider is not None:
+            return await self.session_provider()
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession()
+        return self.session
+    
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+    
+    def _apply_rate_limit_headers(self, headers):
+        """按 Reddit 限流响应头调整令牌桶：额度耗尽时暂停到窗口重置"""
+        try:
+            remaining = float(headers["X-Ratelimit-Remaining"])
+            reset = float(headers["X-Ratelimit-Reset"])
+        except (KeyError, ValueError):
+            return
+        if remaining < 1:
+            self.limiter.pause(reset)
+        elif reset > 0:
+            # 剩余额度在窗口内均匀使用，不超过配置的速度
+            self.limiter.rate = min(self.config.requests_per_minute / 60.0, remaining / reset)
+    
+    async def _get_json(self, path: str, params: Dict[str, Any]) -> Any:
+        """GET 一个 JSON 接口，带限流、短 TTL 缓存和条件请求"""
+        params = {**params, "raw_json": 1}
+        url = f"{self.base_url}{path}"
+        key = url + "?" + "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+        entry = self._listings.get(key)
+        if entry is not None:
+            self._listings.move_to_end(key)
+            if time.monotonic() - entry["fetched_at"] < self.config.listing_ttl:
+                self.stats["cache_hits"] += 1
+                return entry["data"]
+        
+        headers = {"User-Agent": self.config.user_agent, "Accept": "application/json"}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        
+        session = await self._get_session()
+        for _ in range(max(1, self.config.max_retries)):
+            await self.limiter.acquire()
+            self.stats["requests"] += 1
+            started_at = time.perf_counter()
+            async with session.get(url, params=params, headers=headers) as response:
+                METRICS.inc("reddit_api_requests_total", (("status", str(response.status)),))
+                self._apply_rate_limit_headers(response.headers)
+                if response.status == 304 and entry is not None:
+                    self.stats["not_modified"] += 1
+                    entry["fetched_at"] = time.monotonic()
+                    return entry["data"]
+                if response.status == 429:
+                    self.stats["rate_limited"] += 1
+                    try:
+                        retry_after = float(response.headers.get("Retry-After", "1"))
+                    except ValueError:
+                        retry_after = 1.0
+                    self.limiter.pause(retry_after)
+                    continue
+                if response.status == 404:
+                    return None
+                if response.status != 200:
+                    raise Exception(f"Reddit 请求失败: HTTP {response.status}")
+                body = await response.read()
+                METRICS.inc("reddit_api_bytes_in_total", value=len(body))
+                METRICS.observe("reddit_api_request_seconds", time.perf_counter() - started_at)
+                data = json.loads(body)
+                self._listings[key] = {
+                    "data": data,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "fetched_at": time.monotonic()
+                }
+                self._listings.move_to_end(key)
+                while len(self._listings) > self.config.listing_cache_entries:
+                    self._listings.popitem(last=False)
+                return data
+        raise Exception("Reddit 请求被限流，请稍后再试")
+    
+    @staticmethod
+    def _listing_posts(listing: Any) -> List[Dict[str, Any]]:
+        if not isinstance(listing, dict):
+            return []
+        return [normalize_reddit_post(child["data"]) for child in listing.get("data", {}).get("children", [])
+                if child.get("kind") == "t3"]
+    
+    async def hot_threads(self, subreddit: str, limit: int, after: Optional[str] = None) -> List[Dict[str, Any]]:
+        params = {"limit": limit}
+        if after:
+            params["after"] = after
+        listing = await self._get_json(f"/r/{quote(subreddit)}/hot.json", params)
+        return self._listing_posts(listing)[:limit]
+    
+    async def post_details(self, post_id: str, max_depth: Optional[int] = None) -> Optional[tuple]:
+        # 每页使用相同的请求参数，翻页时命中列表缓存或条件请求
+        params = {"limit": self.config.comment_limit}
+        if max_depth is not None:
+            params["depth"] = max_depth + 1
+        data = await self._get_json(f"/comments/{quote(post_id)}.json", params)
+        # 列表在 TTL 内或 304（ETag 未变）时为同一对象，返回上次转换的结果，调用方展开过的占位节点得以保留
+        key = (post_id, max_depth)
+        cached = self._details.get(key)
+        if cached is not None and cached[0] is data:
+            self._details.move_to_end(key)
+            return cached[1]
+        if not isinstance(data, list) or not data:
+            return None
+        posts = self._listing_posts(data[0])
+        if not posts:
+            return None
+        comments = normalize_reddit_comments(data[1]) if len(data) > 1 else []
+        self._details[key] = (data, (posts[0], comments))
+        self._details.move_to_end(key)
+        while len(self._details) > self.config.listing_cache_entries:
+            self._details.popitem(last=False)
+        return posts[0], comments
+    
+    async def more_comments(self, post_id: str, children: List[str],
+                            max_depth: Optional[int] = None) -> List[Dict[str, Any]]:
+        params = {"api_type": "json", "link_id": f"t3_{post_id}", "children": ",".join(children),
+                  "limit_children": "false"}
+        if max_depth is not None:
+            params["depth"] = max_depth + 1
+        try:
+            data = await self._get_json("/api/morechildren.json", params)
+            things = data["json"]["data"]["things"]
+        except Exception as e:
+            logger.warning("展开评论失败", extra={"post_id": post_id, "count": len(children), "error": str(e) or type(e).__name__})
+            return []
+        return normalize_more_children(things)
+    
+    async def search(self, query: str, subreddit: Optional[str] = None, limit: int = 25,
+                     after: Optional[str] = None) -> List[Dict[str, Any]]:
+        params = {"q": query, "limit": limit, "sort": "relevance"}
+        if after:
+            params["after"] = after
+        if subreddit:
+            path = f"/r/{quote(subreddit)}/search.json"
+            params["restrict_sr"] = 1
+        else:
+            path = "/search.json"
+        return self._listing_posts(await self._get_json(path, params))[:limit]
+
+def create_data_source(config: RedditConfig, session_provider=None) -> Optional[RedditDataSource]:
+    """按配置创建数据源，demo 返回 None（使用内置演示数据）"""
+    if config.source == "demo":
+        return None
+    if config.source == "reddit":
+        return RedditJSONSource(config, session_provider)
+    raise ValueError(f"不支持的数据源: {config.source}")
+
+_CJK_RANGES = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af"
+_TOKEN_RE = re.compile(f"[{_CJK_RANGES}]+|[^\\W_{_CJK_RANGES}]+")
+_CJK_RUN_RE = re.compile(f"[{_CJK_RANGES}]")
+
+def tokenize(text: str) -> List[str]:
+    """分词：拉丁文字按单词切分并转小写，中日韩文字按相邻二元组（bigram）切分"""
+    tokens = []
+    for run in _TOKEN_RE.findall(text.lower()):
+        if _CJK_RUN_RE.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+class _FieldIndex:
+    """单个字段集合的倒排索引：词 -> {帖子ID: 词频}"""
+    
+    def __init__(self):
+        self.postings = {}
+        self.doc_lengths = {}
+        self.doc_terms = {}
+        self.total_length = 0
+    
+    def add(self, doc_id: str, tokens: List[str]):
+        self.remove(doc_id)
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            self.postings.setdefault(token, {})[doc_id] = tf
+        self.doc_terms[doc_id] = list(counts)
+        self.doc_lengths[doc_id] = len(tokens)
+        self.total_length += len(tokens)
+    
+    def remove(self, doc_id: str):
+        length = self.doc_lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for token in self.doc_terms.pop(doc_id):
+            docs = self.postings[token]
+            del docs[doc_id]
+            if not docs:
+                del self.postings[token]
+
+class PostSearchIndex:
+    """帖子搜索的倒排索引
+    
+    原文（标题 + 正文）和译文（*_zh）分别建索引，帖子加入或译文更新时
+    增量维护；查询支持 AND / OR 匹配，按 BM25 打分排序。
+    """
+    
+    K1 = 1.5
+    B = 0.75
+    
+    def __init__(self):
+        self.posts = {}  # 帖子ID -> 帖子
+        self.original = _FieldIndex()
+        self.translated = _FieldIndex()
+    
+    def __len__(self) -> int:
+        return len(self.posts)
+    
+    def add(self, post: Dict[str, Any]):
+        """加入或更新一个帖子（原文）"""
+        self.posts[post["id"]] = post
+        self.original.add(post["id"], tokenize(f"{post.get('title', '')} {post.get('selftext', '')}"))
+    
+    def add_translation(self, post_id: str, title_zh: Optional[str], selftext_zh: Optional[str] = None):
+        """更新帖子的译文索引"""
+        if post_id in self.posts:
+            self.translated.add(post_id, tokenize(f"{title_zh or ''} {selftext_zh or ''}"))
+    
+    def remove(self, post_id: str):
+        self.posts.pop(post_id, None)
+        self.original.remove(post_id)
+        self.translated.remove(post_id)
+    
+    def _bm25(self, index: _FieldIndex, terms: List[str], scores: Dict[str, float],
+              candidates: Optional[set] = None):
+        doc_count = len(index.doc_lengths)
+        if not doc_count:
+            return
+        avg_length = index.total_length / doc_count or 1
+        for term in terms:
+            docs = index.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            if candidates is not None:
+                docs = {doc_id: docs[doc_id] for doc_id in candidates if doc_id in docs}
+            for doc_id, tf in docs.items():
+                norm = tf * (self.K1 + 1) / (
+                    tf + self.K1 * (1 - self.B + self.B * index.doc_lengths[doc_id] / avg_length)
+                )
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * norm
+    
+    def _all_terms_candidates(self, terms: List[str], include_translations: bool) -> set:
+        """AND 查询的候选集合：从最稀有的词开始求交集，只对候选打分"""
+        indexes = [self.original, self.translated] if include_translations else [self.original]
+        doc_sets = []
+        for term in terms:
+            docs = set()
+            for index in indexes:
+                docs.update(index.postings.get(term, ()))
+            if not docs:
+                return set()
+            doc_sets.append(docs)
+        doc_sets.sort(key=len)
+        candidates = doc_sets[0]
+        for docs in doc_sets[1:]:
+            candidates = candidates & docs
+            if not candidates:
+                break
+        return candidates
+    
+    def search(self, query: str, match_all: bool = False, subreddit: Optional[str] = None,
+               include_translations: bool = False, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """搜索帖子，按相关度从高到低返回"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        
+        candidates = None
+        if match_all:
+            candidates = self._all_terms_candidates(terms, include_translations)
+            if not candidates:
+                return []
         
-        data = {
-            'model': self.config.model or 'gpt-3.5-turbo',
-            'messages': [
-                {'role': 'user', 'content': prompt}
-            ],
-            'max_tokens': 2000,
-            'temperature': 0.3
-        }
+        scores = {}
+        self._bm25(self.original, terms, scores, candidates)
+        if include_translations:
+            self._bm25(self.translated, terms, scores, candidates)
         
-        async with self.session.post(url, headers=headers, json=data) as response:
-            if response.status == 200:
-                result = await response.json()
-                if result.get('choices'):
-                    return result['choices'][0]['message']['content'].strip()
+        if subreddit:
+            scores = {
+                doc_id: score for doc_id, score in scores.items()
+                if self.posts[doc_id].get("subreddit") == subreddit
+            }
         
-        raise Exception("OpenAI 翻译请求失败")
+        ranked = ((score, doc_id) for doc_id, score in scores.items())
+        key = lambda item: (-item[0], item[1])
+        if limit is not None:
+            ranked = heapq.nsmallest(limit, ranked, key=key)
+        else:
+            ranked = sorted(ranked, key=key)
+        return [self.posts[doc_id] for _, doc_id in ranked]
 
-class TranslationManager:
-    """翻译管理器"""
+def _pending_comments(comments, start: Optional[List[int]] = None) -> List[tuple]:
+    """遍历评论树的初始栈 [(兄弟列表, 下标, 深度)]，栈顶在末尾
     
-    def __init__(self, config: TranslationConfig):
-        self.config = config
-        self.translator = self._create_translator()
+    start 为某条评论的路径（从顶层开始每层的下标）时，栈中为按深度优先顺序
+    从该评论（含）开始尚未访问的节点，只需处理路径上各层的兄弟节点。
+    """
+    siblings = comments or ()
+    if not start:
+        return [(siblings, i, 0) for i in range(len(siblings) - 1, -1, -1)]
+    stack = []
+    last = len(start) - 1
+    for depth, index in enumerate(start):
+        if not isinstance(index, int) or not 0 <= index < len(siblings):
+            raise ValueError("评论位置无效")
+        first = index if depth == last else index + 1
+        stack.extend((siblings, i, depth) for i in range(len(siblings) - 1, first - 1, -1))
+        siblings = siblings[index].get("replies") or ()
+    return stack
+
+def iter_comment_tree(comments: List[Dict[str, Any]], max_depth: Optional[int] = None,
+                      max_nodes: Optional[int] = None, start: Optional[List[int]] = None):
+    """深度优先遍历评论树（显式栈，不递归），依次产出 (评论, 深度)
     
-    def _create_translator(self) -> TranslationService:
-        """创建翻译服务实例"""
-        if self.config.service == "google":
-            try:
-                return GoogleTranslator(self.config)
-            except Exception:
-                # 如果 Google 翻译失败，尝试使用 translate 库作为备选
-                if TRANSLATE_AVAILABLE:
-                    return TranslateLibTranslator(self.config)
-                raise
-        elif self.config.service == "translate":
-            return TranslateLibTranslator(self.config)
-        elif self.config.service == "deepl":
-            return DeepLTranslator(self.config)
-        elif self.config.service == "baidu":
-            return BaiduTranslator(self.config)
-        elif self.config.service == "openai":
-            return OpenAITranslator(self.config)
+    顶层评论深度为 0。超过 max_depth 的回复和超过 max_nodes 之后的评论
+    不再展开，而是产出 {"kind": "more", "count": n} 占位节点，n 为未展开的评论
+    总数（含全部下级回复）。
+    start 为评论路径时从该评论开始遍历（用于分页，见 next_comment_path）。
+    """
+    stack = [(siblings[i], depth) for siblings, i, depth in _pending_comments(comments, start)]
+    visited = 0
+    while stack:
+        comment, depth = stack.pop()
+        if comment.get("kind") == "more":
+            yield comment, depth
+            continue
+        
+        if max_nodes is not None and visited >= max_nodes:
+            # 剩余未访问的评论（含其回复）合并成一个占位节点
+            rest = [comment] + [pending for pending, _ in stack]
+            yield {"kind": "more", "count": count_comments(rest)}, depth
+            return
+        
+        visited += 1
+        yield comment, depth
+        
+        replies = comment.get("replies") or []
+        if not replies:
+            continue
+        if max_depth is not None and depth + 1 > max_depth:
+            yield {"kind": "more", "count": count_comments(replies)}, depth + 1
         else:
-            raise ValueError(f"不支持的翻译服务: {self.config.service}")
+            stack.extend((reply, depth + 1) for reply in reversed(replies))
+
+def next_comment_path(comments: List[Dict[str, Any]], max_depth: Optional[int] = None,
+                      max_nodes: Optional[int] = None, start: Optional[List[int]] = None) -> Optional[List[int]]:
+    """与 iter_comment_tree 相同的遍历范围，返回因 max_nodes 截断时下一条评论的路径
+    
+    范围内的评论已全部展开时返回 None。返回的路径作为 start 传入即可从截断处继续，
+    恢复时只需处理路径上各层的兄弟节点，不必重新遍历之前的评论。
+    """
+    if max_nodes is None:
+        return None
+    stack = [(siblings[i], depth, i) for siblings, i, depth in _pending_comments(comments, start)]
+    # 深度优先顺序下，弹出深度为 d 的节点时 path[:d] 恰好是其祖先的路径
+    path = list(start[:-1]) if start else []
+    visited = 0
+    while stack:
+        comment, depth, index = stack.pop()
+        del path[depth:]
+        path.append(index)
+        if comment.get("kind") == "more":
+            continue
+        if visited >= max_nodes:
+            return path
+        visited += 1
+        replies = comment.get("replies") or []
+        if replies and (max_depth is None or depth + 1 <= max_depth):
+            stack.extend((replies[i], depth + 1, i) for i in range(len(replies) - 1, -1, -1))
+    return None
+
+def comment_at_path(comments: List[Dict[str, Any]], path: List[int]) -> Optional[Dict[str, Any]]:
+    """返回路径处的评论，路径无效时返回 None"""
+    node = None
+    siblings = comments or ()
+    for index in path:
+        if not isinstance(index, int) or not 0 <= index < len(siblings):
+            return None
+        node = siblings[index]
+        siblings = node.get("replies") or ()
+    return node
+
+def freeze_comment_tree(comments: List[Dict[str, Any]]) -> tuple:
+    """把评论树转换为只读结构：评论为 MappingProxyType，回复列表为 tuple"""
+    root = list(comments or [])
+    stack = [(root, i) for i in range(len(root))]
+    frozen_lists = []
+    while stack:
+        siblings, i = stack.pop()
+        node = dict(siblings[i])
+        replies = node.get("replies")
+        if replies:
+            children = list(replies)
+            stack.extend((children, j) for j in range(len(children)))
+            frozen_lists.append((node, children))
+        siblings[i] = node
+    # 子节点全部处理完后再由深到浅冻结
+    for node, children in reversed(frozen_lists):
+        node["replies"] = tuple(MappingProxyType(child) if isinstance(child, dict) else child for child in children)
+    return tuple(MappingProxyType(node) for node in root)
+
+def comment_tree_view(comments, max_depth: Optional[int] = None, max_nodes: Optional[int] = None,
+                      start: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    """创建评论树的可写视图
     
-    async def translate_text(self, text: str) -> str:
-        """翻译单个文本"""
-        async with self.translator as translator:
-            return await translator.translate(text)
+    与 iter_comment_tree 的遍历范围一致：范围内的评论复制为新字典
+    （回复列表也复制），范围外的子树仍引用原始只读节点，不做额外复制。
+    指定 start 时 start 路径上的祖先评论同样复制，使范围内的副本可从根访问。
+    """
+    root = list(comments or [])
+    siblings = root
+    for index in (start or ())[:-1]:
+        if not isinstance(index, int) or not 0 <= index < len(siblings):
+            break
+        ancestor = dict(siblings[index])
+        ancestor["replies"] = list(ancestor.get("replies") or ())
+        siblings[index] = ancestor
+        siblings = ancestor["replies"]
+    stack = _pending_comments(root, start)
+    visited = 0
+    while stack:
+        siblings, i, depth = stack.pop()
+        node = siblings[i]
+        if node.get("kind") == "more":
+            continue
+        if max_nodes is not None and visited >= max_nodes:
+            break
+        visited += 1
+        
+        view = dict(node)
+        siblings[i] = view
+        replies = node.get("replies")
+        if replies and (max_depth is None or depth + 1 <= max_depth):
+            view["replies"] = list(replies)
+            stack.extend((view["replies"], j, depth + 1) for j in reversed(range(len(replies))))
+    return root
+
+def group_comment_tree(comments: List[Dict[str, Any]], max_depth: Optional[int] = None,
+                       max_nodes: Optional[int] = None, start: Optional[List[int]] = None):
+    """按顶层评论分组遍历评论树，每组为一条顶层评论及其回复的 (评论, 深度) 列表
     
-    async def translate_batch(self, texts: List[str]) -> List[str]:
-        """批量翻译文本"""
-        async with self.translator as translator:
-            tasks = [translator.translate(text) for text in texts]
-            return await asyncio.gather(*tasks)
+    从 start 开始遍历时，第一组为 start 所在顶层评论的剩余部分。
+    """
+    group = None
+    for comment, depth in iter_comment_tree(comments, max_depth, max_nodes, start):
+        if depth == 0 or group is None:
+            if group:
+                yield group
+            group = []
+        group.append((comment, depth))
+    if group:
+        yield group
+
+def count_comments(comments: List[Dict[str, Any]]) -> int:
+    """统计评论树中的评论总数（含占位节点代表的数量）"""
+    total = 0
+    stack = list(comments or ())
+    while stack:
+        comment = stack.pop()
+        if comment.get("kind") == "more":
+            total += comment.get("count", 0)
+            continue
+        total += 1
+        stack.extend(comment.get("replies") or ())
+    return total
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    """把分页位置编码为不透明的游标（URL 安全的 base64 JSON），服务端不保存任何状态"""
+    raw = json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(token: str, kind: str, **expected) -> Dict[str, Any]:
+    """解析游标；格式错误、类型不符或与本次请求的参数（expected）不一致时抛出 ValueError"""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("无效的分页游标 after")
+    if not isinstance(state, dict) or state.get("k") != kind:
+        raise ValueError("无效的分页游标 after")
+    for name, value in expected.items():
+        if state.get(name) != value:
+            raise ValueError("分页游标 after 与请求参数不一致")
+    return state
+
+def truncate_text(text: str, limit: int) -> str:
+    """超过 limit 个字符时截断并加省略号"""
+    return text[:limit] + "..." if len(text) > limit else text
+
+# 工具的 output_format 取值；json* 为紧凑 JSON，值为其中包含的语言
+JSON_OUTPUT_LANGUAGES = {
+    "json": "both",
+    "json_original": "original",
+    "json_translation": "translation",
+}
+OUTPUT_FORMATS = ("text",) + tuple(JSON_OUTPUT_LANGUAGES)
+
+def render_json(data: Any) -> str:
+    """一次序列化为紧凑 JSON：不转义中文，不加空白"""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
 
 class EnhancedRedditMCP:
     """增强版 Reddit MCP，带翻译功能"""
     
-    def __init__(self, translation_config: TranslationConfig = None):
+    # 评论格式化时的最大缩进层数
+    MAX_INDENT_LEVEL = 8
+    
+    # 帖子正文预览的最大字符数
+    POST_PREVIEW_CHARS = 200
+    
+    # 每次 /api/morechildren 请求展开的评论 ID 数上限
+    MORE_CHILDREN_BATCH = 100
+    
+    def __init__(self, translation_config: TranslationConfig = None, data_source: Optional[RedditDataSource] = None,
+                 reddit_config: RedditConfig = None):
         self.translation_config = translation_config or TranslationConfig()
         self.translation_manager = TranslationManager(self.translation_config)
-        self.demo_data = self._load_demo_data()
+        # 数据源为 None 时使用内置演示数据；真实数据源读取的帖子同样加入下面的索引
+        if data_source is None and reddit_config is not None:
+            # Reddit 请求与翻译请求共用同一个连接池
+            data_source = create_data_source(reddit_config, self.translation_manager.get_session)
+        self.data_source = data_source
+        # 存储的帖子和评论均为只读记录，每次请求在副本上写入译文，互不干扰。
+        # 真实数据源读取的帖子按 LRU 淘汰，演示数据全部常驻
+        self.max_stored_posts = (reddit_config or RedditConfig()).post_store_entries if data_source is not None else 0
+        self.posts_by_id = OrderedDict()  # 帖子ID -> 帖子（按最近使用排序）
+        self.subreddit_posts = {}    # subreddit -> {帖子ID: 帖子}（保持加入顺序）
+        self.comments_by_post = {}   # 帖子ID -> 评论树
+        self.comment_counts = {}     # 帖子ID -> 评论总数（评论树加入时统计一次）
+        self.loaded_trees = {}       # 帖子ID -> 数据源返回并已按需展开的评论树（可写，分页时复用）
+        self.search_index = PostSearchIndex()
+        
+        if data_source is None:
+            demo_data = self._load_demo_data()
+            for threads in demo_data["hot_threads"].values():
+                for thread in threads:
+                    self.add_post(thread, demo_data["comments"].get(thread["id"]))
+    
+    def add_post(self, post: Dict[str, Any], comments: Optional[List[Dict[str, Any]]] = None):
+        """加入或替换一个帖子（及其评论），同时更新 ID 索引和搜索索引"""
+        previous = self.posts_by_id.get(post["id"])
+        if comments is not None:
+            self.comments_by_post[post["id"]] = freeze_comment_tree(comments)
+            self.comment_counts[post["id"]] = count_comments(comments)
+        if previous is not None and previous == post:
+            self.posts_by_id.move_to_end(post["id"])
+            return  # 内容未变（如命中列表缓存），无需重建索引
+        
+        record = MappingProxyType(dict(post))
+        if previous is not None and previous["subreddit"] != record["subreddit"]:
+            self._unlink_subreddit(previous)
+        
+        self.posts_by_id[record["id"]] = record
+        self.posts_by_id.move_to_end(record["id"])
+        self.subreddit_posts.setdefault(record["subreddit"], {})[record["id"]] = record
+        self.search_index.add(record)
+        self._evict_posts()
+    
+    def _unlink_subreddit(self, post: Dict[str, Any]):
+        posts = self.subreddit_posts[post["subreddit"]]
+        del posts[post["id"]]
+        if not posts:
+            del self.subreddit_posts[post["subreddit"]]
+    
+    def _evict_posts(self):
+        """帖子数超过上限时淘汰最久未使用的帖子，同时移出评论树和搜索索引"""
+        while self.max_stored_posts and len(self.posts_by_id) > self.max_stored_posts:
+            post_id, post = self.posts_by_id.popitem(last=False)
+            self._unlink_subreddit(post)
+            self.comments_by_post.pop(post_id, None)
+            self.comment_counts.pop(post_id, None)
+            self.loaded_trees.pop(post_id, None)
+            self.search_index.remove(post_id)
+    
+    async def close(self):
+        """释放数据源和翻译连接池等资源"""
+        if self.data_source is not None:
+            await self.data_source.close()
+        await self.translation_manager.close()
     
     def _load_demo_data(self) -> Dict[str, Any]:
         """加载演示数据（英文版）"""
@@ -368,83 +2688,386 @@ class EnhancedRedditMCP:
             }
         }
     
+    async def _translate_fields(self, jobs: List[tuple], subreddit: Optional[str] = None):
+        """批量翻译 (字典, 字段名) 列表，结果写回对应的 字段名_zh
+        
+        一次请求内的所有字段交给 translate_batch 统一调度，
+        总耗时取决于最慢的批次，而不是所有请求之和。按所属版块（字典自身的
+        subreddit 字段，评论等没有该字段的取参数 subreddit）分组，用于统计翻译记忆命中率。
+        """
+        if not jobs:
+            return
+        groups = {}
+        for index, (item, _) in enumerate(jobs):
+            groups.setdefault(item.get("subreddit") or subreddit, []).append(index)
+        translated = [None] * len(jobs)
+        
+        async def run_group(scope: Optional[str], indices: List[int]):
+            texts = [jobs[index][0][jobs[index][1]] for index in indices]
+            for index, value in zip(indices, await self.translation_manager.translate_batch(texts, scope)):
+                translated[index] = value
+        
+        await asyncio.gather(*[run_group(scope, indices) for scope, indices in groups.items()])
+        posts = {}
+        for (item, field_name), value in zip(jobs, translated):
+            item[f"{field_name}_zh"] = value
+            if field_name == "title":
+                posts[item["id"]] = item
+        
+        # 帖子译文加入搜索索引，支持用中文搜索
+        for post_id, post in posts.items():
+            self.search_index.add_translation(post_id, post.get("title_zh"), post.get("selftext_zh"))
+    
+    def _post_fields(self, post: Dict[str, Any]) -> List[tuple]:
+        """帖子中需要翻译的字段"""
+        jobs = [(post, "title")]
+        if post.get("selftext"):
+            jobs.append((post, "selftext"))
+        return jobs
+    
+    def get_hot_threads(self, subreddit: str, limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+        """读取热门帖子（不翻译），返回可写副本"""
+        posts = self.subreddit_posts.get(subreddit, {})
+        return [dict(post) for post in islice(posts.values(), offset, offset + limit)]
+    
+    def find_post(self, post_id: str, max_depth: Optional[int] = 10, max_comments: Optional[int] = 500,
+                  start: Optional[List[int]] = None) -> Optional[Dict[str, Any]]:
+        """按 ID 查找帖子并附上评论（不翻译），未找到时返回 None
+        
+        返回帖子的可写副本；评论树中会被展开的部分同样复制，
+        译文只写入本次请求的副本，不修改存储的记录。start 为分页时本页第一条评论的路径。
+        comment_count 为整个评论树的评论数（含占位节点代表的数量）。
+        """
+        post = self.posts_by_id.get(post_id)
+        if post is None:
+            return None
+        self.posts_by_id.move_to_end(post_id)
+        view = dict(post)
+        view["comments"] = comment_tree_view(self.comments_by_post.get(post_id, ()), max_depth, max_comments, start)
+        view["comment_count"] = self.comment_counts.get(post_id, 0)
+        return view
+    
+    def match_posts(self, query: str, subreddit: str = None, match_all: bool = False,
+                    search_translations: bool = False, limit: Optional[int] = None,
+                    offset: int = 0) -> List[Dict[str, Any]]:
+        """按关键词匹配帖子（不翻译），结果按相关度排序
+        
+        match_all 为 True 时要求包含全部关键词；search_translations 为 True 时
+        同时匹配已翻译的中文标题和正文。只复制第 offset 到 offset + limit 个结果。
+        """
+        top = None if limit is None else offset + limit
+        results = self.search_index.search(query, match_all, subreddit, search_translations, top)
+        return [thread.copy() for thread in results[offset:]]
+    
+    async def load_hot_threads(self, subreddit: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """从数据源读取热门帖子（不翻译），按数据源的顺序返回可写副本"""
+        return (await self.load_hot_threads_page(subreddit, limit))[0]
+    
+    async def load_hot_threads_page(self, subreddit: str, limit: int = 10,
+                                    after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """从数据源读取一页热门帖子（不翻译），返回 (可写副本, 下一页游标)，没有下一页时游标为 None
+        
+        游标记录已返回的帖子数（演示数据）或最后一个帖子的 fullname（Reddit 的 after 参数），
+        翻页时不需要重新读取之前的页。
+        """
+        state = decode_cursor(after, "hot", s=subreddit) if after else {}
+        offset = state.get("o", 0)
+        if self.data_source is None:
+            # 多取一个帖子判断是否还有下一页
+            posts = self.get_hot_threads(subreddit, limit + 1, offset)
+            more = len(posts) > limit
+            posts = posts[:limit]
+        else:
+            posts = await self.data_source.hot_threads(subreddit, limit, state.get("a"))
+            for post in posts:
+                self.add_post(post)
+            posts = [dict(post) for post in posts]
+            more = len(posts) == limit
+        if not (more and posts):
+            return posts, None
+        return posts, encode_cursor({"k": "hot", "s": subreddit, "o": offset + len(posts), "a": f"t3_{posts[-1]['id']}"})
+    
+    async def load_post(self, post_id: str, max_depth: Optional[int] = 10, max_comments: Optional[int] = 500,
+                        start: Optional[List[int]] = None, start_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """从数据源读取帖子和评论（不翻译），未找到时返回 None
+        
+        每一页都向数据源读取评论树（列表缓存在 TTL 内直接复用，过期后条件请求），
+        本页范围内的“more”占位节点按需展开。数据源返回的仍是上一页展开过的同一棵树时，
+        从 start 处继续展开，不再从头遍历；本页没有展开新的占位节点时也不重新冻结和统计评论树。
+        评论树有变化或服务重启后从头遍历，结果与逐页展开一致，不依赖之前保存的状态。
+        start_id 为 start 处评论的 ID，评论树中该位置不是这条评论（评论已变化）时抛出 ValueError。
+        """
+        if self.data_source is not None:
+            details = await self.data_source.post_details(post_id, max_depth)
+            if details is None:
+                return None
+            post, comments = details
+            post_id = post["id"]
+            resume = self.loaded_trees.get(post_id) is comments and post_id in self.comments_by_post
+            expanded = await self._expand_more_comments(post_id, comments, max_depth, max_comments, start, resume)
+            if resume and not expanded:
+                self.add_post(post)
+            else:
+                self.add_post(post, comments)
+                self.loaded_trees[post_id] = comments
+        if start and (comment_at_path(self.comments_by_post.get(post_id, ()), start) or {}).get("id") != start_id:
+            raise ValueError("评论已变化，分页游标 after 已失效，请从第一页重新获取")
+        return self.find_post(post_id, max_depth, max_comments, start)
+    
+    async def _expand_more_comments(self, post_id: str, comments: List[Dict[str, Any]], max_depth: Optional[int],
+                                    max_comments: Optional[int], start: Optional[List[int]],
+                                    resume: bool = False) -> bool:
+        """按需展开“more”占位节点（原地修改评论树），返回是否展开了占位节点
+        
+        按 iter_comment_tree 的深度优先顺序遍历 max_depth 以内的评论，遇到占位节点时向数据源
+        读取其中的评论并替换该节点，直到读到本页的 max_comments 条评论和下一页的第一条评论。
+        展开顺序是确定的，每页重新读取时 start 之前展开的占位节点相同，评论路径保持一致。
+        resume 为 True 表示评论树是之前各页展开过的同一棵树，直接从 start 处开始。
+        """
+        needed = None if max_comments is None else max_comments + 1
+        frames = [[comments, 0]]  # [兄弟列表, 当前下标]，深度为 len(frames) - 1
+        if resume and start:
+            if comment_at_path(comments, start) is None:
+                return False  # 游标失效，由 load_post 报错
+            frames = []
+            siblings = comments
+            for index in start:
+                frames.append([siblings, index])
+                siblings = siblings[index].get("replies") or ()
+        attempted = set()
+        started = resume or not start
+        counted = 0
+        changed = False
+        while frames and (needed is None or counted < needed):
+            frame = frames[-1]
+            siblings, index = frame
+            if index >= len(siblings):
+                frames.pop()
+                if frames:
+                    frames[-1][1] += 1
+                continue
+            node = siblings[index]
+            depth = len(frames) - 1
+            if node.get("kind") == "more":
+                children = tuple(node.get("children") or ())[:self.MORE_CHILDREN_BATCH]
+                expanded = []
+                if children and children not in attempted:
+                    attempted.add(children)
+                    expanded = await self.data_source.more_comments(
+                        post_id, list(children), None if max_depth is None else max_depth - depth
+                    )
+                    if index >= len(siblings) or siblings[index] is not node:
+                        continue  # 等待期间并发的请求已展开了这个节点
+                if not expanded:
+                    frame[1] += 1
+                    continue
+                rest = node["children"][len(children):]
+                if rest:
+                    # 超出单次请求上限的 ID 留在新的占位节点中，遍历到时继续展开
+                    count = max(node.get("count", 0) - count_comments(expanded), len(rest))
+                    expanded.append({"kind": "more", "count": count, "children": rest})
+                siblings[index:index + 1] = expanded
+                changed = True
+                continue
+            
+            if not started:
+                path = [index for _, index in frames]
+                if path > start:
+                    return changed  # start 处已没有评论，游标失效，由 load_post 报错
+                started = path == start
+            if started:
+                counted += 1
+            replies = node.get("replies")
+            if replies and (max_depth is None or depth + 1 <= max_depth):
+                frames.append([replies, 0])
+            else:
+                frame[1] += 1
+        return changed
+    
+    async def load_search_results(self, query: str, subreddit: str = None, match_all: bool = False,
+                                  search_translations: bool = False) -> List[Dict[str, Any]]:
+        """从数据源搜索帖子（不翻译）
+        
+        真实数据源使用 Reddit 的搜索结果和排序，结果同时加入本地索引；
+        match_all / search_translations 只作用于本地索引。
+        """
+        return (await self.load_search_page(query, subreddit, match_all, search_translations))[0]
+    
+    async def load_search_page(self, query: str, subreddit: str = None, match_all: bool = False,
+                               search_translations: bool = False, limit: Optional[int] = None,
+                               after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """从数据源读取一页搜索结果（不翻译），返回 (可写副本, 下一页游标)
+        
+        limit 为 None 时演示数据返回全部结果，真实数据源返回一页（25 个）。
+        """
+        state = decode_cursor(after, "search", q=query, s=subreddit) if after else {}
+        offset = state.get("o", 0)
+        if self.data_source is None:
+            posts = self.match_posts(query, subreddit, match_all, search_translations,
+                                     None if limit is None else limit + 1, offset)
+            more = limit is not None and len(posts) > limit
+            posts = posts[:limit]
+        else:
+            page_size = limit or 25
+            posts = await self.data_source.search(query, subreddit, page_size, state.get("a"))
+            for post in posts:
+                self.add_post(post)
+            posts = [dict(post) for post in posts]
+            more = len(posts) == page_size
+        if not (more and posts):
+            return posts, None
+        return posts, encode_cursor({
+            "k": "search", "q": query, "s": subreddit, "o": offset + len(posts), "a": f"t3_{posts[-1]['id']}"
+        })
+    
     async def fetch_hot_threads(self, subreddit: str, limit: int = 10, translate: bool = True) -> List[Dict[str, Any]]:
         """获取热门帖子（带翻译）"""
-        print(f"🔥 正在获取 r/{subreddit} 的热门帖子...")
+        return (await self.fetch_hot_threads_page(subreddit, limit, translate))[0]
+    
+    async def fetch_hot_threads_page(self, subreddit: str, limit: int = 10, translate: bool = True,
+                                     after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """获取一页热门帖子（带翻译），返回 (帖子, 下一页游标)，只翻译本页的帖子"""
+        logger.info("获取热门帖子", extra={"subreddit": subreddit, "count": limit})
         
-        threads = self.demo_data["hot_threads"].get(subreddit, [])
-        limited_threads = threads[:limit]
+        limited_threads, next_after = await self.load_hot_threads_page(subreddit, limit, after)
         
         if translate and self.translation_config.enabled:
-            print("🌐 正在翻译内容...")
-            for thread in limited_threads:
-                # 翻译标题
-                thread["title_zh"] = await self.translation_manager.translate_text(thread["title"])
-                # 翻译内容
-                if thread.get("selftext"):
-                    thread["selftext_zh"] = await self.translation_manager.translate_text(thread["selftext"])
-        
-        return limited_threads
-    
-    async def fetch_post_details(self, post_id: str, translate: bool = True) -> Dict[str, Any]:
-        """获取帖子详情（带翻译）"""
-        print(f"📄 正在获取帖子 {post_id} 的详细信息...")
-        
-        # 查找帖子
-        for subreddit_threads in self.demo_data["hot_threads"].values():
-            for thread in subreddit_threads:
-                if thread["id"] == post_id:
-                    # 添加评论信息
-                    thread["comments"] = self.demo_data["comments"].get(post_id, [])
-                    
-                    if translate and self.translation_config.enabled:
-                        print("🌐 正在翻译帖子和评论...")
-                        
-                        # 翻译帖子
-                        thread["title_zh"] = await self.translation_manager.translate_text(thread["title"])
-                        if thread.get("selftext"):
-                            thread["selftext_zh"] = await self.translation_manager.translate_text(thread["selftext"])
-                        
-                        # 翻译评论
-                        for comment in thread["comments"]:
-                            comment["body_zh"] = await self.translation_manager.translate_text(comment["body"])
-                            
-                            # 翻译回复
-                            for reply in comment.get("replies", []):
-                                reply["body_zh"] = await self.translation_manager.translate_text(reply["body"])
-                    
-                    return thread
-        
-        return {"error": "帖子未找到"}
-    
-    async def search_posts(self, query: str, subreddit: str = None, translate: bool = True) -> List[Dict[str, Any]]:
-        """搜索帖子（带翻译）"""
-        search_target = f"r/{subreddit}" if subreddit else "全站"
-        print(f"🔍 正在{search_target}搜索: {query}")
+            logger.debug("翻译热门帖子", extra={"subreddit": subreddit, "count": len(limited_threads)})
+            await self._translate_fields(
+                [job for thread in limited_threads for job in self._post_fields(thread)], subreddit
+            )
+        
+        return limited_threads, next_after
+    
+    async def fetch_post_details(self, post_id: str, translate: bool = True,
+                                 max_depth: Optional[int] = 10, max_comments: Optional[int] = 500,
+                                 after: Optional[str] = None) -> Dict[str, Any]:
+        """获取帖子详情（带翻译）
         
-        results = []
-        search_terms = query.lower().split()
+        评论树任意深度均可处理，max_depth / max_comments 限制需要翻译的范围，
+        超出部分在格式化时显示为“还有 N 条回复”。评论超过 max_comments 条时
+        返回的 after 为下一页游标；传入 after 时从该处继续，只读取和翻译这一页的评论，不再翻译帖子本身。
+        结果中的 comments_start 为本页第一条评论的路径（第一页为 None），格式化时使用。
+        """
+        logger.info("获取帖子详情", extra={"post_id": post_id})
         
-        # 搜索逻辑
-        for subreddit_name, threads in self.demo_data["hot_threads"].items():
-            if subreddit and subreddit_name != subreddit:
-                continue
-                
-            for thread in threads:
-                title_lower = thread["title"].lower()
-                content_lower = thread["selftext"].lower()
-                
-                if any(term in title_lower or term in content_lower for term in search_terms):
-                    results.append(thread.copy())
+        state = decode_cursor(after, "comments", id=post_id) if after else {}
+        start = state.get("p")
+        thread = await self.load_post(post_id, max_depth, max_comments, start, state.get("c"))
+        if thread is None:
+            return {"error": "帖子未找到"}
+        
+        if translate and self.translation_config.enabled:
+            logger.debug("翻译帖子和评论", extra={"post_id": post_id})
+            
+            # 帖子和本页评论一起批量翻译
+            jobs = [] if start else self._post_fields(thread)
+            for comment, _ in iter_comment_tree(thread["comments"], max_depth, max_comments, start):
+                if comment.get("kind") != "more" and comment.get("body"):
+                    jobs.append((comment, "body"))
+            await self._translate_fields(jobs, thread.get("subreddit"))
+        
+        thread["comments_start"] = start
+        thread["after"] = self.comment_cursor(post_id, thread["comments"], max_depth, max_comments, start)
+        return thread
+    
+    @staticmethod
+    def comment_cursor(post_id: str, comments: List[Dict[str, Any]], max_depth: Optional[int],
+                       max_comments: Optional[int], start: Optional[List[int]]) -> Optional[str]:
+        """评论下一页的游标，没有下一页时返回 None
+        
+        游标记录下一页第一条评论的路径和 ID，翻页时用 ID 确认评论树没有变化。
+        """
+        path = next_comment_path(comments, max_depth, max_comments, start)
+        if path is None:
+            return None
+        return encode_cursor({"k": "comments", "id": post_id, "p": path, "c": comment_at_path(comments, path)["id"]})
+    
+    async def search_posts(self, query: str, subreddit: str = None, translate: bool = True,
+                           match_all: bool = False, search_translations: bool = False) -> List[Dict[str, Any]]:
+        """搜索帖子（带翻译）"""
+        return (await self.search_posts_page(query, subreddit, translate, match_all, search_translations))[0]
+    
+    async def search_posts_page(self, query: str, subreddit: str = None, translate: bool = True,
+                                match_all: bool = False, search_translations: bool = False,
+                                limit: Optional[int] = None,
+                                after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """搜索一页帖子（带翻译），返回 (帖子, 下一页游标)，只翻译本页的结果"""
+        logger.info("搜索帖子", extra={"subreddit": subreddit, "query": query})
+        
+        results, next_after = await self.load_search_page(
+            query, subreddit, match_all, search_translations, limit, after
+        )
         
         if translate and self.translation_config.enabled and results:
-            print("🌐 正在翻译搜索结果...")
-            for result in results:
-                result["title_zh"] = await self.translation_manager.translate_text(result["title"])
-                if result.get("selftext"):
-                    result["selftext_zh"] = await self.translation_manager.translate_text(result["selftext"])
+            logger.debug("翻译搜索结果", extra={"query": query, "count": len(results)})
+            await self._translate_fields([job for result in results for job in self._post_fields(result)])
         
-        return results
+        return results, next_after
+    
+    async def _stream_translated(self, items: List[Any], jobs_for, subreddit: Optional[str] = None):
+        """同时启动每一项的翻译，按原顺序逐项产出已完成的结果
+        
+        第一项只需等待自身的翻译完成即可产出，不必等待全部结束。
+        """
+        tasks = [asyncio.ensure_future(self._translate_fields(jobs_for(item), subreddit)) for item in items]
+        try:
+            for item, task in zip(items, tasks):
+                await task
+                yield item
+        finally:
+            # 调用方提前结束迭代时取消剩余的翻译
+            for task in tasks:
+                task.cancel()
+    
+    async def stream_posts(self, posts: List[Dict[str, Any]], translate: bool = True):
+        """逐个产出翻译完成的帖子"""
+        if not (translate and self.translation_config.enabled):
+            for post in posts:
+                yield post
+            return
+        async for post in self._stream_translated(posts, self._post_fields):
+            yield post
+    
+    async def stream_comment_groups(self, comments: List[Dict[str, Any]], translate: bool = True,
+                                    max_depth: Optional[int] = 10, max_comments: Optional[int] = 500,
+                                    subreddit: Optional[str] = None, start: Optional[List[int]] = None):
+        """逐个产出翻译完成的顶层评论子树，每项为该子树的 (评论, 深度) 列表"""
+        groups = list(group_comment_tree(comments, max_depth, max_comments, start))
+        if not (translate and self.translation_config.enabled):
+            for group in groups:
+                yield group
+            return
+        async for group in self._stream_translated(groups, self._comment_fields, subreddit):
+            yield group
+    
+    async def stream_post_details(self, post: Dict[str, Any], translate: bool = True,
+                                  max_depth: Optional[int] = 10, max_comments: Optional[int] = 500,
+                                  start: Optional[List[int]] = None):
+        """逐块产出帖子详情：第一页（start 为 None）先产出帖子本身，再逐个产出本页的顶层评论子树
+        
+        帖子和评论的翻译同时开始，帖子翻译完成即可产出，不必等待评论。
+        """
+        groups = list(group_comment_tree(post["comments"], max_depth, max_comments, start))
+        items = groups if start else [post] + groups
+        if not (translate and self.translation_config.enabled):
+            for item in items:
+                yield item
+            return
+        
+        def jobs_for(item):
+            return self._post_fields(post) if item is post else self._comment_fields(item)
+        
+        async for item in self._stream_translated(items, jobs_for, post.get("subreddit")):
+            yield item
+    
+    @staticmethod
+    def _comment_fields(group: List[tuple]) -> List[tuple]:
+        """评论子树（(评论, 深度) 列表）中需要翻译的字段"""
+        return [
+            (comment, "body") for comment, _ in group
+            if comment.get("kind") != "more" and comment.get("body")
+        ]
     
     def format_post(self, post: Dict[str, Any], show_translation: bool = True) -> str:
         """格式化帖子显示（支持中英文对照）"""
@@ -452,62 +3075,118 @@ class EnhancedRedditMCP:
         post_type = "🔗 链接" if post["post_hint"] == "link" else "📝 文本"
         
         # 标题部分
-        title_section = f"📌 **{post['title']}**"
+        parts = [f"\n📌 **{post['title']}**"]
         if show_translation and post.get("title_zh"):
-            title_section += f"\n🌐 **{post['title_zh']}**"
-        
-        formatted = f"""
-{title_section}
-👤 作者: u/{post['author']} | ⏰ {created_time}
-📊 {post['score']} 点赞 | 💬 {post['num_comments']} 评论 | {post_type}
-🏷️ r/{post['subreddit']}
-"""
+            parts.append(f"\n🌐 **{post['title_zh']}**")
+        parts.append(
+            f"\n👤 作者: u/{post['author']} | ⏰ {created_time}"
+            f"\n📊 {post['score']} 点赞 | 💬 {post['num_comments']} 评论 | {post_type}"
+            f"\n🏷️ r/{post['subreddit']}\n"
+        )
         
         # 内容部分
         if post.get("selftext"):
-            content = post["selftext"][:200] + "..." if len(post["selftext"]) > 200 else post["selftext"]
-            formatted += f"\n📄 原文: {content}"
-            
+            parts.append(f"\n📄 原文: {truncate_text(post['selftext'], self.POST_PREVIEW_CHARS)}")
             if show_translation and post.get("selftext_zh"):
-                content_zh = post["selftext_zh"][:200] + "..." if len(post["selftext_zh"]) > 200 else post["selftext_zh"]
-                formatted += f"\n🌐 中文: {content_zh}"
+                parts.append(f"\n🌐 中文: {truncate_text(post['selftext_zh'], self.POST_PREVIEW_CHARS)}")
         
         if post["post_hint"] == "link":
-            formatted += f"\n🔗 链接: {post['url']}"
+            parts.append(f"\n🔗 链接: {post['url']}")
         
-        return formatted
+        return "".join(parts)
     
-    def format_comments(self, comments: List[Dict[str, Any]], show_translation: bool = True) -> str:
-        """格式化评论显示（支持中英文对照）"""
+    def format_comments(self, comments: List[Dict[str, Any]], show_translation: bool = True,
+                        max_depth: Optional[int] = None, max_nodes: Optional[int] = None,
+                        start: Optional[List[int]] = None) -> str:
+        """格式化评论显示（支持中英文对照和任意层级回复），start 为分页时本页第一条评论的路径"""
         if not comments:
             return "暂无评论"
         
-        formatted_comments = []
-        for comment in comments:
-            created_time = datetime.fromtimestamp(comment["created_utc"]).strftime("%H:%M")
-            
-            comment_text = f"""
-💬 **u/{comment['author']}** ({comment['score']} 点赞, {created_time})
-   原文: {comment['body']}
-"""
-            
-            if show_translation and comment.get("body_zh"):
-                comment_text += f"   🌐 中文: {comment['body_zh']}\n"
+        return "\n".join(
+            self.format_comment_group(group, show_translation)
+            for group in group_comment_tree(comments, max_depth, max_nodes, start)
+        )
+    
+    def format_comment_group(self, group: List[tuple], show_translation: bool = True) -> str:
+        """格式化一条顶层评论及其回复，group 为 (评论, 深度) 列表"""
+        parts = []
+        for comment, depth in group:
+            # 缩进最多 MAX_INDENT_LEVEL 层，更深的回复标注层数，输出大小保持线性
+            indent = "   " * min(depth, self.MAX_INDENT_LEVEL)
+            marker = f"↳ [{depth}]" if depth > self.MAX_INDENT_LEVEL else "↳"
             
-            # 添加回复
-            if comment.get("replies"):
-                for reply in comment["replies"]:
-                    reply_time = datetime.fromtimestamp(reply["created_utc"]).strftime("%H:%M")
-                    comment_text += f"""
-   ↳ **u/{reply['author']}** ({reply['score']} 点赞, {reply_time})
-     原文: {reply['body']}
-"""
-                    if show_translation and reply.get("body_zh"):
-                        comment_text += f"     🌐 中文: {reply['body_zh']}\n"
+            if comment.get("kind") == "more":
+                parts.append(f"\n{indent}⋯ 还有 {comment.get('count', 0)} 条回复未展开\n")
+                continue
             
-            formatted_comments.append(comment_text)
+            created_time = datetime.fromtimestamp(comment["created_utc"]).strftime("%H:%M")
+            if depth == 0:
+                parts.append(
+                    f"\n💬 **u/{comment['author']}** ({comment['score']} 点赞, {created_time})\n"
+                    f"   原文: {comment['body']}\n"
+                )
+                if show_translation and comment.get("body_zh"):
+                    parts.append(f"   🌐 中文: {comment['body_zh']}\n")
+            else:
+                parts.append(
+                    f"\n{indent}{marker} **u/{comment['author']}** ({comment['score']} 点赞, {created_time})\n"
+                    f"{indent}  原文: {comment['body']}\n"
+                )
+                if show_translation and comment.get("body_zh"):
+                    parts.append(f"{indent}  🌐 中文: {comment['body_zh']}\n")
         
-        return "\n".join(formatted_comments)
+        return "".join(parts)
+    
+    @staticmethod
+    def _put_text(data: Dict[str, Any], item: Dict[str, Any], field_name: str, languages: str, limit: Optional[int] = None):
+        """按 languages 写入原文和/或译文字段；只要译文时没有译文的字段回退为原文"""
+        original = item.get(field_name)
+        translation = item.get(f"{field_name}_zh")
+        if limit is not None:
+            original = truncate_text(original, limit) if original else original
+            translation = truncate_text(translation, limit) if translation else translation
+        if languages == "translation":
+            data[field_name] = translation or original
+            return
+        data[field_name] = original
+        if languages == "both" and translation:
+            data[f"{field_name}_zh"] = translation
+    
+    def post_to_json(self, post: Dict[str, Any], languages: str = "both") -> Dict[str, Any]:
+        """帖子的紧凑 JSON 表示，正文预览长度与文本格式相同"""
+        data = {
+            "id": post["id"],
+            "subreddit": post["subreddit"],
+            "author": post["author"],
+            "score": post["score"],
+            "num_comments": post["num_comments"],
+            "created_utc": int(post["created_utc"]),
+        }
+        self._put_text(data, post, "title", languages)
+        if post.get("selftext"):
+            self._put_text(data, post, "selftext", languages, self.POST_PREVIEW_CHARS)
+        if post["post_hint"] == "link":
+            data["url"] = post["url"]
+        return data
+    
+    def comments_to_json(self, comments: List[Dict[str, Any]], languages: str = "both",
+                         max_depth: Optional[int] = None, max_nodes: Optional[int] = None,
+                         start: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """评论树按深度优先顺序展开为扁平列表，depth 为层数，未展开的回复为 {"more": n}"""
+        result = []
+        for comment, depth in iter_comment_tree(comments, max_depth, max_nodes, start):
+            if comment.get("kind") == "more":
+                result.append({"depth": depth, "more": comment.get("count", 0)})
+                continue
+            data = {
+                "depth": depth,
+                "author": comment["author"],
+                "score": comment["score"],
+                "created_utc": int(comment["created_utc"]),
+            }
+            self._put_text(data, comment, "body", languages)
+            result.append(data)
+        return result
     
     async def demo_workflow(self):
         """演示完整的翻译工作流程"""
@@ -552,50 +3231,129 @@ class EnhancedRedditMCP:
         print("\n💡 所有英文内容已自动翻译成中文，方便阅读理解。")
         print("📚 详细配置请参考 INSTALLATION.md 文件。")
 
-def load_translation_config() -> TranslationConfig:
-    """从环境变量或配置文件加载翻译配置"""
-    config = TranslationConfig()
+def _env_bool(value: str) -> bool:
+    return value.lower() == "true"
+
+def _env_list(value: str) -> List[str]:
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+# 翻译配置的环境变量 -> (配置项, 解析函数)
+TRANSLATION_ENV_VARS = {
+    "TRANSLATION_SERVICE": ("service", str),
+    "TRANSLATION_API_KEY": ("api_key", str),
+    "TRANSLATION_SECRET_KEY": ("secret_key", str),
+    "TRANSLATION_ENDPOINT": ("endpoint", str),
+    "TRANSLATION_MODEL": ("model", str),
+    "TRANSLATION_ENABLED": ("enabled", _env_bool),
+    "TRANSLATION_CACHE_ENABLED": ("cache_enabled", _env_bool),
+    "TRANSLATION_MAX_LENGTH": ("max_length", int),
+    "TRANSLATION_PRESERVE_MARKDOWN": ("preserve_markdown", _env_bool),
+    "TRANSLATION_BATCH_SIZE": ("batch_size", int),
+    "TRANSLATION_CONCURRENT_REQUESTS": ("concurrent_requests", int),
+    "TRANSLATION_POOL_LIMIT": ("pool_limit", int),
+    "TRANSLATION_POOL_LIMIT_PER_HOST": ("pool_limit_per_host", int),
+    "TRANSLATION_KEEPALIVE_TIMEOUT": ("keepalive_timeout", float),
+    "TRANSLATION_DNS_CACHE_TTL": ("dns_cache_ttl", int),
+    "TRANSLATION_CACHE_MAX_ENTRIES": ("cache_max_entries", int),
+    "TRANSLATION_CACHE_MAX_BYTES": ("cache_max_bytes", int),
+    "TRANSLATION_CACHE_TTL": ("cache_ttl", float),
+    "TRANSLATION_PERSISTENT_CACHE": ("persistent_cache_enabled", _env_bool),
+    "TRANSLATION_CACHE_PATH": ("persistent_cache_path", str),
+    "TRANSLATION_CACHE_WARM_ENTRIES": ("cache_warm_entries", int),
+    "TRANSLATION_REQUEST_TIMEOUT": ("request_timeout", float),
+    "TRANSLATION_MAX_RETRIES": ("max_retries", int),
+    "TRANSLATION_RETRY_BACKOFF_BASE": ("retry_backoff_base", float),
+    "TRANSLATION_RETRY_BACKOFF_MAX": ("retry_backoff_max", float),
+    "TRANSLATION_CIRCUIT_FAILURE_THRESHOLD": ("circuit_failure_threshold", int),
+    "TRANSLATION_CIRCUIT_RESET_TIMEOUT": ("circuit_reset_timeout", float),
+    "TRANSLATION_FALLBACK_SERVICES": ("fallback_services", _env_list),
+    "TRANSLATION_RATE_LIMIT_RPS": ("rate_limit_requests_per_second", float),
+    "TRANSLATION_RATE_LIMIT_CPS": ("rate_limit_chars_per_second", float),
+    "TRANSLATION_RATE_LIMIT_BURST": ("rate_limit_burst", int),
+}
+
+def load_translation_config(path: str = "translation_config.json") -> TranslationConfig:
+    """加载翻译配置，优先级：环境变量 > 配置文件 > 代码默认值
     
-    # 从环境变量读取配置
-    config.service = os.getenv("TRANSLATION_SERVICE", "google")
-    config.api_key = os.getenv("TRANSLATION_API_KEY")
-    config.secret_key = os.getenv("TRANSLATION_SECRET_KEY")
-    config.endpoint = os.getenv("TRANSLATION_ENDPOINT")
-    config.model = os.getenv("TRANSLATION_MODEL")
-    config.enabled = os.getenv("TRANSLATION_ENABLED", "true").lower() == "true"
-    config.cache_enabled = os.getenv("TRANSLATION_CACHE_ENABLED", "true").lower() == "true"
-    config.max_length = int(os.getenv("TRANSLATION_MAX_LENGTH", "5000"))
-    config.batch_size = int(os.getenv("TRANSLATION_BATCH_SIZE", "10"))
+    配置文件中值为 null 的项和未设置（或为空）的环境变量都视为未配置，沿用更低一级的值。
+    """
+    config = TranslationConfig()
     
     # 尝试从配置文件读取
     try:
-        with open("translation_config.json", "r", encoding="utf-8") as f:
+        with open(path, "r", encoding="utf-8") as f:
             file_config = json.load(f)
-            for key, value in file_config.items():
-                if hasattr(config, key):
-                    setattr(config, key, value)
     except FileNotFoundError:
-        pass
+        file_config = {}
+    for key, value in file_config.items():
+        if value is not None and hasattr(config, key):
+            setattr(config, key, value)
     
+    # 环境变量覆盖配置文件
+    for name, (key, parse) in TRANSLATION_ENV_VARS.items():
+        value = os.getenv(name)
+        if value:
+            setattr(config, key, parse(value))
+    
+    return config
+
+def load_reddit_config() -> RedditConfig:
+    """从环境变量加载 Reddit 数据源配置"""
+    config = RedditConfig()
+    config.source = os.getenv("REDDIT_SOURCE", "demo")
+    config.base_url = os.getenv("REDDIT_BASE_URL", config.base_url)
+    config.user_agent = os.getenv("REDDIT_USER_AGENT", config.user_agent)
+    config.requests_per_minute = float(os.getenv("REDDIT_REQUESTS_PER_MINUTE", "60"))
+    config.burst = int(os.getenv("REDDIT_BURST", "5"))
+    config.listing_ttl = float(os.getenv("REDDIT_LISTING_TTL", "30"))
+    config.listing_cache_entries = int(os.getenv("REDDIT_LISTING_CACHE_ENTRIES", "256"))
+    config.max_retries = int(os.getenv("REDDIT_MAX_RETRIES", "3"))
+    config.comment_limit = int(os.getenv("REDDIT_COMMENT_LIMIT", "500"))
+    config.post_store_entries = int(os.getenv("REDDIT_POST_STORE_ENTRIES", "1000"))
     return config
 
-# MCP 协议实现
+# MCP 协议实现；mcp 服务端依赖较重，只在服务器模式下导入
 import sys
-from mcp.server import Server
-from mcp.server.stdio import stdio_server
-from mcp.types import Tool, TextContent
 
-# 创建 MCP 服务器实例
-app = Server("reddit-translator")
+mcp_types = _LazyModule("mcp.types")
+
+# MCP 服务器实例，由 get_app() 创建
+app = None
 
 # 全局变量存储 Reddit MCP 实例
 reddit_mcp = None
 
-@app.list_tools()
-async def list_tools() -> list[Tool]:
+def get_app():
+    """创建 MCP 服务器实例并注册处理函数（首次调用时导入 mcp.server）"""
+    global app
+    if app is None:
+        from mcp.server import Server
+        app = Server("reddit-translator")
+        app.list_tools()(list_tools)
+        app.call_tool()(call_tool)
+    return app
+
+def ensure_backend():
+    """创建 Reddit MCP 实例（如果还没有），返回该实例"""
+    global reddit_mcp
+    if reddit_mcp is None:
+        reddit_mcp = EnhancedRedditMCP(load_translation_config(), reddit_config=load_reddit_config())
+    return reddit_mcp
+
+async def prewarm_backend():
+    """预热翻译连接池和持久化缓存
+    
+    服务器模式下与 MCP 握手并发运行；aiohttp 在线程中导入，不阻塞事件循环。
+    工具调用不等待本任务，需要连接池时由 TranslationManager 的会话锁保证只创建一次。
+    """
+    manager = ensure_backend().translation_manager
+    await asyncio.to_thread(aiohttp.load)
+    await manager.get_session()
+
+async def list_tools() -> "list[Tool]":
     """列出可用的工具"""
     return [
-        Tool(
+        mcp_types.Tool(
             name="fetch_hot_threads",
             description="获取指定 subreddit 的热门帖子，支持自动翻译",
             inputSchema={
@@ -612,16 +3370,32 @@ async def list_tools() -> list[Tool]:
                         "minimum": 1,
                         "maximum": 50
                     },
+                    "after": {
+                        "type": "string",
+                        "description": "分页游标：传入上一次结果返回的 after 获取下一页，只翻译这一页的帖子"
+                    },
                     "translate": {
                         "type": "boolean",
                         "description": "是否启用自动翻译，默认 true",
                         "default": True
+                    },
+                    "stream": {
+                        "type": "boolean",
+                        "description": "是否流式返回：每翻译完一个帖子或评论子树即发送进度通知，结果按块返回，默认 false",
+                        "default": False
+                    },
+                    "output_format": {
+                        "type": "string",
+                        "enum": list(OUTPUT_FORMATS),
+                        "description": "输出格式：text 为中英对照文本（默认）；json 为紧凑 JSON，含原文和译文（*_zh 字段）；"
+                                       "json_original 只含原文（不翻译）；json_translation 只含译文。JSON 输出不支持 stream",
+                        "default": "text"
                     }
                 },
                 "required": ["subreddit"]
             }
         ),
-        Tool(
+        mcp_types.Tool(
             name="fetch_post_details",
             description="获取指定帖子的详细信息和评论，支持自动翻译",
             inputSchema={
@@ -635,12 +3409,40 @@ async def list_tools() -> list[Tool]:
                         "type": "boolean",
                         "description": "是否启用自动翻译，默认 true",
                         "default": True
+                    },
+                    "stream": {
+                        "type": "boolean",
+                        "description": "是否流式返回：每翻译完一个帖子或评论子树即发送进度通知，结果按块返回，默认 false",
+                        "default": False
+                    },
+                    "output_format": {
+                        "type": "string",
+                        "enum": list(OUTPUT_FORMATS),
+                        "description": "输出格式：text 为中英对照文本（默认）；json 为紧凑 JSON，含原文和译文（*_zh 字段）；"
+                                       "json_original 只含原文（不翻译）；json_translation 只含译文。JSON 输出不支持 stream",
+                        "default": "text"
+                    },
+                    "max_depth": {
+                        "type": "integer",
+                        "description": "展开的最大回复层数（顶层评论为第 0 层），默认 10",
+                        "default": 10,
+                        "minimum": 0
+                    },
+                    "max_comments": {
+                        "type": "integer",
+                        "description": "每页最多展开并翻译的评论数，默认 500",
+                        "default": 500,
+                        "minimum": 1
+                    },
+                    "after": {
+                        "type": "string",
+                        "description": "分页游标：传入上一次结果返回的 after 获取下一页，只翻译这一页的评论，不再返回帖子本身"
                     }
                 },
                 "required": ["post_id"]
             }
         ),
-        Tool(
+        mcp_types.Tool(
             name="search_posts",
             description="在 Reddit 中搜索帖子，支持自动翻译",
             inputSchema={
@@ -654,82 +3456,334 @@ async def list_tools() -> list[Tool]:
                         "type": "string",
                         "description": "限制搜索的 subreddit（可选）"
                     },
+                    "match_all": {
+                        "type": "boolean",
+                        "description": "是否要求包含全部关键词（AND），默认 false 即任一关键词（OR）",
+                        "default": False
+                    },
+                    "search_translations": {
+                        "type": "boolean",
+                        "description": "是否同时搜索已翻译的中文标题和正文，默认 false",
+                        "default": False
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "每页返回的帖子数量，默认 25",
+                        "default": 25,
+                        "minimum": 1,
+                        "maximum": 100
+                    },
+                    "after": {
+                        "type": "string",
+                        "description": "分页游标：传入上一次结果返回的 after 获取下一页，只翻译这一页的搜索结果"
+                    },
                     "translate": {
                         "type": "boolean",
                         "description": "是否启用自动翻译，默认 true",
                         "default": True
+                    },
+                    "stream": {
+                        "type": "boolean",
+                        "description": "是否流式返回：每翻译完一个帖子或评论子树即发送进度通知，结果按块返回，默认 false",
+                        "default": False
+                    },
+                    "output_format": {
+                        "type": "string",
+                        "enum": list(OUTPUT_FORMATS),
+                        "description": "输出格式：text 为中英对照文本（默认）；json 为紧凑 JSON，含原文和译文（*_zh 字段）；"
+                                       "json_original 只含原文（不翻译）；json_translation 只含译文。JSON 输出不支持 stream",
+                        "default": "text"
                     }
                 },
                 "required": ["query"]
             }
+        ),
+        mcp_types.Tool(
+            name="get_stats",
+            description="获取服务运行指标：工具调用和翻译请求的次数与延迟分布、缓存命中、排队等待、收发字节数等",
+            inputSchema={
+                "type": "object",
+                "properties": {}
+            }
         )
     ]
 
-@app.call_tool()
-async def call_tool(name: str, arguments: dict) -> list[TextContent]:
-    """处理工具调用"""
-    global reddit_mcp
+TOOL_NAMES = ("fetch_hot_threads", "fetch_post_details", "search_posts", "get_stats")
+
+def collect_stats() -> Dict[str, Any]:
+    """汇总指标注册表和当前实例的翻译统计，供 get_stats 工具返回"""
+    stats = {"metrics": METRICS.snapshot(), "rate_limits": get_rate_limit_stats()}
+    if reddit_mcp is not None:
+        manager = reddit_mcp.translation_manager
+        stats["translation"] = {
+            "dedup": manager.dedup_stats(),
+            "chars": manager.char_stats(),
+            "memory": manager.memory_stats()
+        }
+        data_source = reddit_mcp.data_source
+        if data_source is not None and hasattr(data_source, "stats"):
+            stats["reddit"] = dict(data_source.stats)
+    return stats
+
+async def call_tool(name: str, arguments: dict) -> "list[TextContent]":
+    """处理工具调用，记录每个工具的调用次数、耗时、失败次数和返回字节数"""
+    # 初始化 Reddit MCP 实例（服务器模式下已在握手前创建）
+    ensure_backend()
     
-    # 初始化 Reddit MCP 实例（如果还没有）
-    if reddit_mcp is None:
-        translation_config = load_translation_config()
-        reddit_mcp = EnhancedRedditMCP(translation_config)
+    labels = (("tool", name if name in TOOL_NAMES else "unknown"),)
+    started_at = time.perf_counter()
+    status = "ok"
+    try:
+        contents = await run_tool(name, arguments)
+    except Exception as e:
+        status = "error"
+        METRICS.inc("reddit_tool_errors_total", labels)
+        logger.exception("工具调用失败", extra={"tool": name, "post_id": arguments.get("post_id"), "error": str(e)})
+        error_msg = f"❌ 执行工具 {name} 时发生错误: {str(e)}"
+        contents = [mcp_types.TextContent(type="text", text=error_msg)]
+    latency = time.perf_counter() - started_at
+    logger.info("工具调用完成", extra={
+        "tool": name, "post_id": arguments.get("post_id"), "subreddit": arguments.get("subreddit"),
+        "status": status, "latency": round(latency, 4)
+    })
+    METRICS.observe("reddit_tool_duration_seconds", latency, labels)
+    METRICS.inc("reddit_tool_calls_total", labels)
+    METRICS.inc("reddit_tool_response_bytes_total", labels, sum(len(item.text.encode('utf-8')) for item in contents))
+    return contents
+
+def format_next_page(after: Optional[str]) -> str:
+    """文本输出末尾的下一页提示，没有下一页时为空"""
+    return f"➡️ 还有更多，获取下一页请传入 after=\"{after}\"\n" if after else ""
+
+def format_post_list(header: str, posts: List[Dict[str, Any]], show_translation: bool = True) -> str:
+    """帖子列表的文本输出：标题行加编号的帖子，一次拼接"""
+    return header + "".join(
+        f"{i}. {reddit_mcp.format_post(post, show_translation)}\n\n" for i, post in enumerate(posts, 1)
+    )
+
+async def run_tool(name: str, arguments: dict) -> "list[TextContent]":
+    """执行工具调用，异常由 call_tool 统一处理"""
+    output_format = arguments.get("output_format", "text")
+    if output_format not in OUTPUT_FORMATS:
+        return [mcp_types.TextContent(
+            type="text", text=f"❌ 不支持的输出格式: {output_format}（可选: {', '.join(OUTPUT_FORMATS)}）"
+        )]
+    # JSON 输出一次返回完整结果，不分块流式返回
+    languages = JSON_OUTPUT_LANGUAGES.get(output_format)
+    if arguments.get("stream") and languages is None:
+        return await call_tool_streaming(name, arguments)
+    
+    # 只要原文时不需要翻译
+    translate = arguments.get("translate", True) and languages != "original"
+    
+    if name == "fetch_hot_threads":
+        subreddit = arguments["subreddit"]
+        limit = arguments.get("limit", 10)
+        
+        posts, after = await reddit_mcp.fetch_hot_threads_page(subreddit, limit, translate, arguments.get("after"))
+        
+        # 格式化输出
+        if languages is not None:
+            result = render_json({
+                "subreddit": subreddit,
+                "posts": [reddit_mcp.post_to_json(post, languages) for post in posts],
+                "after": after
+            })
+        else:
+            result = format_post_list(
+                f"📍 r/{subreddit} 热门帖子 (共 {len(posts)} 个):\n\n", posts, translate
+            ) + format_next_page(after)
+        
+        return [mcp_types.TextContent(type="text", text=result)]
+    
+    elif name == "fetch_post_details":
+        post_id = arguments["post_id"]
+        max_depth = arguments.get("max_depth", 10)
+        max_comments = arguments.get("max_comments", 500)
+        
+        post_details = await reddit_mcp.fetch_post_details(
+            post_id, translate, max_depth, max_comments, arguments.get("after")
+        )
+        if "error" in post_details:
+            return [mcp_types.TextContent(type="text", text=f"❌ {post_details['error']}")]
+        comments = post_details["comments"]
+        start = post_details["comments_start"]
+        after = post_details["after"]
+        
+        # 格式化输出；翻页时只输出本页评论，不再输出帖子本身
+        if languages is not None:
+            page = {"post": reddit_mcp.post_to_json(post_details, languages)} if start is None else {"post_id": post_id}
+            page["comment_count"] = post_details["comment_count"]
+            page["comments"] = reddit_mcp.comments_to_json(comments, languages, max_depth, max_comments, start)
+            page["after"] = after
+            result = render_json(page)
+        else:
+            parts = []
+            if start is None:
+                parts.append(f"📖 帖子详情:\n\n{reddit_mcp.format_post(post_details, translate)}\n\n")
+                if comments:
+                    parts.append(f"💬 评论区 (共 {post_details['comment_count']} 条):\n\n")
+            else:
+                parts.append(f"💬 评论区续页 (共 {post_details['comment_count']} 条):\n\n")
+            if comments:
+                parts.append(reddit_mcp.format_comments(comments, translate, max_depth, max_comments, start))
+            if after:
+                parts.append("\n" + format_next_page(after))
+            result = "".join(parts)
+        
+        return [mcp_types.TextContent(type="text", text=result)]
+    
+    elif name == "search_posts":
+        query = arguments["query"]
+        subreddit = arguments.get("subreddit")
+        match_all = arguments.get("match_all", False)
+        search_translations = arguments.get("search_translations", False)
+        
+        posts, after = await reddit_mcp.search_posts_page(
+            query, subreddit, translate, match_all, search_translations,
+            arguments.get("limit", 25), arguments.get("after")
+        )
+        
+        # 格式化输出
+        if languages is not None:
+            result = render_json({
+                "query": query,
+                "subreddit": subreddit,
+                "posts": [reddit_mcp.post_to_json(post, languages) for post in posts],
+                "after": after
+            })
+        else:
+            search_scope = f"r/{subreddit}" if subreddit else "全站"
+            result = format_post_list(
+                f"🔍 搜索结果: \"{query}\" 在 {search_scope} (共 {len(posts)} 个):\n\n", posts, translate
+            ) + format_next_page(after)
+        
+        return [mcp_types.TextContent(type="text", text=result)]
+    
+    elif name == "get_stats":
+        return [mcp_types.TextContent(type="text", text=json.dumps(collect_stats(), ensure_ascii=False, indent=2))]
     
+    else:
+        return [mcp_types.TextContent(type="text", text=f"❌ 未知工具: {name}")]
+
+async def report_progress(progress: float, total: Optional[float], message: str):
+    """向客户端发送 MCP 进度通知（客户端未提供 progressToken 时忽略）"""
+    if app is None:
+        return
     try:
+        ctx = app.request_context
+    except LookupError:
+        return
+    token = ctx.meta.progressToken if ctx.meta else None
+    if token is None:
+        return
+    try:
+        await ctx.session.send_progress_notification(token, progress, total, message=message)
+    except TypeError:
+        # 旧版 mcp 的进度通知不支持 message 参数
+        await ctx.session.send_progress_notification(token, progress, total)
+
+async def stream_tool_chunks(name: str, arguments: dict):
+    """按块生成工具输出，每个帖子或顶层评论子树翻译完成后立即产出
+    
+    所有块按顺序拼接后与非流式模式的输出相同。
+    """
+    translate = arguments.get("translate", True)
+    
+    if name in ("fetch_hot_threads", "search_posts"):
         if name == "fetch_hot_threads":
             subreddit = arguments["subreddit"]
-            limit = arguments.get("limit", 10)
-            translate = arguments.get("translate", True)
-            
-            posts = await reddit_mcp.fetch_hot_threads(subreddit, limit, translate)
-            
-            # 格式化输出
-            result = f"📍 r/{subreddit} 热门帖子 (共 {len(posts)} 个):\n\n"
-            for i, post in enumerate(posts, 1):
-                result += f"{i}. {reddit_mcp.format_post(post, translate)}\n\n"
-            
-            return [TextContent(type="text", text=result)]
-        
-        elif name == "fetch_post_details":
-            post_id = arguments["post_id"]
-            translate = arguments.get("translate", True)
-            
-            post_details = await reddit_mcp.fetch_post_details(post_id, translate)
-            
-            # 格式化输出
-            result = f"📖 帖子详情:\n\n{reddit_mcp.format_post(post_details, translate)}\n\n"
-            
-            if "comments" in post_details and post_details["comments"]:
-                result += f"💬 评论区 (共 {len(post_details['comments'])} 条):\n\n"
-                result += reddit_mcp.format_comments(post_details["comments"], translate)
-            
-            return [TextContent(type="text", text=result)]
-        
-        elif name == "search_posts":
+            posts, after = await reddit_mcp.load_hot_threads_page(
+                subreddit, arguments.get("limit", 10), arguments.get("after")
+            )
+            yield f"📍 r/{subreddit} 热门帖子 (共 {len(posts)} 个):\n\n"
+        else:
             query = arguments["query"]
             subreddit = arguments.get("subreddit")
-            translate = arguments.get("translate", True)
-            
-            posts = await reddit_mcp.search_posts(query, subreddit, translate)
-            
-            # 格式化输出
+            posts, after = await reddit_mcp.load_search_page(
+                query, subreddit, arguments.get("match_all", False), arguments.get("search_translations", False),
+                arguments.get("limit", 25), arguments.get("after")
+            )
             search_scope = f"r/{subreddit}" if subreddit else "全站"
-            result = f"🔍 搜索结果: \"{query}\" 在 {search_scope} (共 {len(posts)} 个):\n\n"
-            
-            for i, post in enumerate(posts, 1):
-                result += f"{i}. {reddit_mcp.format_post(post, translate)}\n\n"
-            
-            return [TextContent(type="text", text=result)]
+            yield f"🔍 搜索结果: \"{query}\" 在 {search_scope} (共 {len(posts)} 个):\n\n"
         
-        else:
-            return [TextContent(type="text", text=f"❌ 未知工具: {name}")]
+        i = 0
+        async for post in reddit_mcp.stream_posts(posts, translate):
+            i += 1
+            yield f"{i}. {reddit_mcp.format_post(post, translate)}\n\n"
+        if after:
+            yield format_next_page(after)
     
-    except Exception as e:
-        error_msg = f"❌ 执行工具 {name} 时发生错误: {str(e)}"
-        return [TextContent(type="text", text=error_msg)]
+    elif name == "fetch_post_details":
+        post_id = arguments["post_id"]
+        max_depth = arguments.get("max_depth", 10)
+        max_comments = arguments.get("max_comments", 500)
+        state = decode_cursor(arguments["after"], "comments", id=post_id) if arguments.get("after") else {}
+        start = state.get("p")
+        post = await reddit_mcp.load_post(post_id, max_depth, max_comments, start, state.get("c"))
+        if post is None:
+            yield "❌ 帖子未找到"
+            return
+        comment_count = post["comment_count"]
+        
+        if start is not None:
+            yield f"💬 评论区续页 (共 {comment_count} 条):\n\n"
+        
+        # 帖子和评论同时翻译，帖子先产出，各评论子树按顺序在翻译完成后产出
+        first = True
+        async for item in reddit_mcp.stream_post_details(post, translate, max_depth, max_comments, start):
+            if item is post:
+                chunk = f"📖 帖子详情:\n\n{reddit_mcp.format_post(post, translate)}\n\n"
+                if post["comments"]:
+                    chunk += f"💬 评论区 (共 {comment_count} 条):\n\n"
+                yield chunk
+                continue
+            yield ("" if first else "\n") + reddit_mcp.format_comment_group(item, translate)
+            first = False
+        
+        after = reddit_mcp.comment_cursor(post_id, post["comments"], max_depth, max_comments, start)
+        if after:
+            yield "\n" + format_next_page(after)
+    
+    else:
+        yield f"❌ 未知工具: {name}"
+
+async def call_tool_streaming(name: str, arguments: dict) -> "list[TextContent]":
+    """流式模式：每产出一块就发送进度通知，最终按块返回 TextContent"""
+    contents = []
+    async for chunk in stream_tool_chunks(name, arguments):
+        contents.append(mcp_types.TextContent(type="text", text=chunk))
+        await report_progress(len(contents), None, chunk)
+    return contents
+
+async def start_metrics_server(host: str, port: int):
+    """启动 Prometheus 文本格式的指标接口（GET /metrics），返回 AppRunner 用于关闭"""
+    from aiohttp import web
+    
+    async def metrics(request):
+        return web.Response(text=METRICS.render_prometheus(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+    
+    metrics_app = web.Application()
+    metrics_app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(metrics_app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
 
 async def main():
     """主函数 - 启动 MCP 服务器"""
+    # 日志写到 stderr 或 LOG_FILE，不占用 stdout
+    log_listener = setup_logging(load_logging_config())
+    try:
+        await run_server()
+    finally:
+        shutdown_logging(log_listener)
+
+async def run_server():
+    """运行演示或 MCP 服务器"""
+    global reddit_mcp
+    
     # 检查是否为演示模式
     if len(sys.argv) > 1 and sys.argv[1] == "--demo":
         # 演示模式
@@ -742,10 +3796,34 @@ async def main():
             print("\n\n⏹️ 演示被用户中断")
         except Exception as e:
             print(f"\n\n💥 演示过程中发生错误: {str(e)}")
+        finally:
+            await reddit_mcp.close()
     else:
-        # MCP 服务器模式
-        async with stdio_server() as (read_stream, write_stream):
-            await app.run(read_stream, write_stream, app.create_initialization_options())
+        # MCP 服务器模式；设置 METRICS_PORT 时同时开启指标接口
+        metrics_runner = None
+        if os.getenv("METRICS_PORT"):
+            metrics_runner = await start_metrics_server(
+                os.getenv("METRICS_HOST", "127.0.0.1"), int(os.getenv("METRICS_PORT"))
+            )
+        # 预热任务与 MCP 握手并发进行
+        server = get_app()
+        prewarm_task = asyncio.ensure_future(prewarm_backend())
+        from mcp.server.stdio import stdio_server
+        try:
+            async with stdio_server() as (read_stream, write_stream):
+                # stdout 是 MCP 传输通道，协议帧以外写入 stdout 的内容一律丢弃
+                with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+                    await server.run(read_stream, write_stream, server.create_initialization_options())
+        finally:
+            # 服务器退出时关闭共享连接池
+            if not prewarm_task.done():
+                prewarm_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await prewarm_task
+            if reddit_mcp is not None:
+                await reddit_mcp.close()
+            if metrics_runner is not None:
+                await metrics_runner.cleanup()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
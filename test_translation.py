@@ -7,18 +7,260 @@
 """
 
 import asyncio
+import contextlib
+import io
 import json
 import os
+import re
+import sqlite3
+import subprocess
 import sys
+import tempfile
+import time
+import reddit_translator
 from datetime import datetime
+import aiohttp
+from aiohttp import web
 from reddit_translator import (
     TranslationConfig, 
     TranslationManager, 
     GoogleTranslator,
+    TranslationCache,
     load_translation_config,
-    EnhancedRedditMCP
+    EnhancedRedditMCP,
+    iter_comment_tree,
+    count_comments,
+    PostSearchIndex,
+    RedditConfig,
+    RedditJSONSource,
+    split_text,
+    segment_markdown,
+    classify_script,
+    should_translate_text,
+    should_translate_many,
+    get_provider_limiter,
+    CACHE_KEY_VERSION,
+    get_rate_limit_stats,
+    METRICS,
+    LoggingConfig,
+    setup_logging,
+    shutdown_logging
 )
 
+# 测试不读写用户真实的持久化缓存（~/.cache/mcp-reddit-translator），
+# load_translation_config() 和测试启动的 MCP 子进程都使用临时目录下的缓存文件
+TEST_CACHE_DIR = tempfile.TemporaryDirectory(prefix="reddit-translator-test-")
+os.environ["TRANSLATION_CACHE_PATH"] = os.path.join(TEST_CACHE_DIR.name, "translations.db")
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "reddit")
+
+# 启动耗时预算（秒），与 benchmarks/bench_startup.py 的默认预算一致
+STARTUP_IMPORT_BUDGET = 0.5
+STARTUP_HANDSHAKE_BUDGET = 3.0
+# 导入 reddit_translator 时不应加载的重依赖
+LAZY_MODULES = ("aiohttp", "mcp", "translate")
+
+
+def mock_sentences(text):
+    """模拟接口按句翻译后的预期译文：每句前加 译文:，句间空白不变"""
+    return re.sub(r'(?:^|(?<=[.!?])\s+)(?=\S)', lambda m: m.group() + "译文:", text)
+
+async def start_mock_translation_server():
+    """启动本地模拟的翻译接口（Google gtx / DeepL / 百度 / OpenAI）
+    
+    另有 /dead（总是 503）和 /slow/translate_a/single（1 秒后响应）用于故障测试。
+    返回 (runner, base_url, 统计信息)，不需要联网。
+    """
+    stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0, "dead": 0}
+    rate_limited = set()
+    
+    def mock_translate(text):
+        if "FAIL" in text:
+            raise web.HTTPInternalServerError()
+        return f"译文:{text}"
+    
+    async def track(handler, request):
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(0.01)
+            return await handler(request)
+        finally:
+            stats["in_flight"] -= 1
+    
+    async def google(request):
+        text = request.query.get("q", "")
+        # 含 RATE 的文本第一次请求返回 429
+        if "RATE" in text and text not in rate_limited:
+            rate_limited.add(text)
+            return web.Response(status=429, headers={"Retry-After": "0"})
+        # 与真实接口一样保留换行，多句合并的请求逐行翻译
+        translated = "\n".join(mock_translate(line) for line in text.split("\n"))
+        return web.json_response([[[translated, text, None, None, 1]], None, "en"])
+    
+    async def deepl(request):
+        data = await request.json()
+        return web.json_response({"translations": [{"text": mock_translate(t)} for t in data["text"]]})
+    
+    async def baidu(request):
+        form = await request.post()
+        lines = form["q"].split("\n")
+        return web.json_response({"trans_result": [{"src": l, "dst": mock_translate(l)} for l in lines]})
+    
+    async def openai(request):
+        data = await request.json()
+        prompt = data["messages"][0]["content"]
+        body = prompt.rsplit("\n\n", 1)[1]
+        if body.startswith("["):
+            content = json.dumps([mock_translate(t) for t in json.loads(body)], ensure_ascii=False)
+        else:
+            content = mock_translate(body)
+        return web.json_response({"choices": [{"message": {"content": content}}]})
+    
+    app = web.Application()
+    app.router.add_get("/translate_a/single", lambda r: track(google, r))
+    app.router.add_post("/v2/translate", lambda r: track(deepl, r))
+    app.router.add_post("/api/trans/vip/translate", lambda r: track(baidu, r))
+    app.router.add_post("/v1/chat/completions", lambda r: track(openai, r))
+    
+    async def dead(request):
+        stats["dead"] += 1
+        return web.Response(status=503)
+    
+    async def slow(request):
+        await asyncio.sleep(1)
+        return await google(request)
+    
+    app.router.add_get("/dead", dead)
+    app.router.add_get("/slow/translate_a/single", slow)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", stats
+
+async def start_mock_reddit_server(rate_limit_reset: float = 0):
+    """启动本地 Reddit 替身服务，回放 fixtures/reddit 下录制的 JSON 列表
+    
+    支持 ETag / If-None-Match 条件请求；rate_limit_reset > 0 时
+    响应头声明额度已耗尽（X-Ratelimit-Remaining: 0）。/api/morechildren 只录制了
+    rt1001 中 c1r1 下“more”节点的展开结果，其他占位节点返回空列表。
+    返回 (runner, base_url, 统计信息)。
+    """
+    stats = {"requests": 0, "not_modified": 0, "times": [], "queries": []}
+    
+    def replay(name):
+        async def handler(request):
+            stats["requests"] += 1
+            stats["times"].append(time.monotonic())
+            stats["queries"].append(dict(request.query))
+            with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+                body = f.read()
+            etag = f'"{hash(body) & 0xffffffff:x}"'
+            headers = {
+                "ETag": etag,
+                "X-Ratelimit-Used": str(stats["requests"]),
+                "X-Ratelimit-Remaining": "0" if rate_limit_reset else "99",
+                "X-Ratelimit-Reset": str(rate_limit_reset or 60)
+            }
+            if request.headers.get("If-None-Match") == etag:
+                stats["not_modified"] += 1
+                return web.Response(status=304, headers=headers)
+            return web.Response(body=body, content_type="application/json", headers=headers)
+        return handler
+    
+    replay_more = replay("morechildren_c1r1m.json")
+    replay_empty = replay("morechildren_empty.json")
+    
+    async def more_children(request):
+        if request.query.get("children") == "c1r1a,c1r1b,c1r1c":
+            return await replay_more(request)
+        return await replay_empty(request)
+    
+    app = web.Application()
+    app.router.add_get("/r/programming/hot.json", replay("hot_programming.json"))
+    app.router.add_get("/api/morechildren.json", more_children)
+    app.router.add_get("/comments/rt1001.json", replay("comments_rt1001.json"))
+    app.router.add_get("/r/programming/search.json", replay("search_incremental.json"))
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", stats
+
+def isolated_env(home: str) -> dict:
+    """启动子进程用的环境变量：HOME 指向临时目录，能导入 reddit_translator，使用演示数据"""
+    paths = [os.path.dirname(os.path.abspath(__file__)), os.environ.get("PYTHONPATH")]
+    return dict(os.environ, HOME=home, REDDIT_SOURCE="demo", PYTHONPATH=os.pathsep.join(p for p in paths if p))
+
+def measure_import() -> dict:
+    """在临时目录中启动子进程导入 reddit_translator，返回耗时（-X importtime 累计值）和提前加载的重依赖"""
+    probe = f"import sys, reddit_translator\nprint(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    with tempfile.TemporaryDirectory() as home:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", probe],
+            cwd=home, env=isolated_env(home), capture_output=True, text=True, check=True
+        )
+    cumulative = next(
+        int(line.split("|")[1]) for line in result.stderr.splitlines()
+        if line.startswith("import time:") and line.split("|")[-1].strip() == "reddit_translator"
+    )
+    return {"seconds": cumulative / 1e6, "eager_modules": [m for m in result.stdout.strip().split(",") if m]}
+
+def measure_handshake() -> dict:
+    """在临时目录中启动 MCP 服务器，测量 initialize 响应和第一次工具调用的耗时
+    
+    工作目录和 HOME 都是空的临时目录，不读取仓库或用户目录下的配置文件。
+    """
+    def send(message):
+        process.stdin.write(json.dumps(message) + "\n")
+        process.stdin.flush()
+    
+    def receive(request_id):
+        while True:
+            line = process.stdout.readline()
+            if not line:
+                raise RuntimeError("MCP 服务器提前退出")
+            message = json.loads(line)
+            if message.get("id") == request_id:
+                return message
+    
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reddit_translator.py")
+    with tempfile.TemporaryDirectory() as home:
+        started_at = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, script], cwd=home, env=isolated_env(home), text=True,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        try:
+            send({"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {
+                "protocolVersion": "2024-11-05", "capabilities": {},
+                "clientInfo": {"name": "test_translation", "version": "1.0"}
+            }})
+            receive(1)
+            handshake = time.perf_counter() - started_at
+            
+            send({"jsonrpc": "2.0", "method": "notifications/initialized"})
+            call_started_at = time.perf_counter()
+            send({"jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {
+                "name": "fetch_hot_threads", "arguments": {"subreddit": "python", "limit": 3, "translate": False}
+            }})
+            response = receive(2)
+            if response.get("error") or response["result"].get("isError"):
+                raise RuntimeError(f"工具调用失败: {response}")
+            first_call = time.perf_counter() - call_started_at
+        finally:
+            process.stdin.close()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+    return {"handshake": handshake, "first_call": first_call}
+
 class TranslationTester:
     """翻译功能测试器"""
     
@@ -59,10 +301,42 @@ class TranslationTester:
             self.log_test("配置加载", False, f"配置加载失败: {str(e)}")
             return None
     
+    async def test_config_precedence(self):
+        """测试配置优先级：环境变量 > 配置文件 > 默认值，配置文件中的 null 视为未设置"""
+        saved = {name: os.environ.get(name) for name in ("TRANSLATION_CONCURRENT_REQUESTS", "TRANSLATION_RATE_LIMIT_RPS")}
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                path = os.path.join(tmpdir, "translation_config.json")
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump({"concurrent_requests": 3, "batch_size": 7, "persistent_cache_path": None,
+                               "rate_limit_requests_per_second": None}, f)
+                os.environ["TRANSLATION_CONCURRENT_REQUESTS"] = "1"
+                os.environ["TRANSLATION_RATE_LIMIT_RPS"] = "2.5"
+                config = load_translation_config(path)
+            precedence_ok = (
+                config.concurrent_requests == 1 and config.batch_size == 7
+                and config.rate_limit_requests_per_second == 2.5
+                and config.persistent_cache_path == os.environ["TRANSLATION_CACHE_PATH"]
+            )
+            # 仓库自带的配置文件同样不会覆盖环境变量
+            shipped_ok = load_translation_config().persistent_cache_path == os.environ["TRANSLATION_CACHE_PATH"]
+            success = precedence_ok and shipped_ok
+            self.log_test("配置优先级", success, f"环境变量覆盖配置文件: {precedence_ok}，自带配置文件: {shipped_ok}")
+            return success
+        except Exception as e:
+            self.log_test("配置优先级", False, f"配置优先级测试失败: {str(e)}")
+            return False
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+    
     async def test_google_translation(self):
         """测试Google翻译"""
         try:
-            config = TranslationConfig(service="google", enabled=True)
+            config = TranslationConfig(service="google", enabled=True, persistent_cache_enabled=False)
             manager = TranslationManager(config)
             
             test_text = "Hello World"
@@ -82,7 +356,7 @@ class TranslationTester:
     async def test_translation_cache(self):
         """测试翻译缓存"""
         try:
-            config = TranslationConfig(service="google", enabled=True, cache_enabled=True)
+            config = TranslationConfig(service="google", enabled=True, cache_enabled=True, persistent_cache_enabled=False)
             manager = TranslationManager(config)
             
             test_text = "Cache test message"
@@ -107,7 +381,7 @@ class TranslationTester:
     async def test_batch_translation(self):
         """测试批量翻译"""
         try:
-            config = TranslationConfig(service="google", enabled=True)
+            config = TranslationConfig(service="google", enabled=True, persistent_cache_enabled=False)
             manager = TranslationManager(config)
             
             results = await manager.translate_batch(self.test_texts[:3])
@@ -126,7 +400,7 @@ class TranslationTester:
     async def test_language_detection(self):
         """测试语言检测"""
         try:
-            config = TranslationConfig(service="google", enabled=True)
+            config = TranslationConfig(service="google", enabled=True, persistent_cache_enabled=False)
             translator = GoogleTranslator(config)
             
             # 测试英文文本
@@ -155,7 +429,7 @@ class TranslationTester:
     async def test_reddit_integration(self):
         """测试Reddit集成"""
         try:
-            config = TranslationConfig(service="google", enabled=True)
+            config = TranslationConfig(service="google", enabled=True, persistent_cache_enabled=False)
             reddit_mcp = EnhancedRedditMCP(config)
             
             # 测试获取热门帖子
@@ -176,7 +450,7 @@ class TranslationTester:
         """测试错误处理"""
         try:
             # 测试无效配置
-            config = TranslationConfig(service="invalid_service", enabled=True)
+            config = TranslationConfig(service="invalid_service", enabled=True, persistent_cache_enabled=False)
             
             try:
                 manager = TranslationManager(config)
@@ -190,31 +464,1267 @@ class TranslationTester:
             return False
     
     async def test_performance(self):
-        """测试性能"""
+        """测试性能（本地模拟接口，不依赖网络；完整基准见 benchmarks/bench_suite.py）"""
+        runner, base_url, stats = await start_mock_translation_server()
         try:
-            config = TranslationConfig(service="google", enabled=True)
-            manager = TranslationManager(config)
-            
-            import time
-            start_time = time.time()
-            
-            # 翻译多个文本
-            tasks = [manager.translate_text(text) for text in self.test_texts]
-            results = await asyncio.gather(*tasks)
-            
-            end_time = time.time()
-            duration = end_time - start_time
+            config = TranslationConfig(
+                service="google", endpoint=f"{base_url}/translate_a/single",
+                persistent_cache_enabled=False, rate_limit_requests_per_second=0
+            )
+            async with TranslationManager(config) as manager:
+                start_time = time.perf_counter()
+                
+                # 翻译多个文本
+                tasks = [manager.translate_text(text) for text in self.test_texts]
+                results = await asyncio.gather(*tasks)
+                
+                duration = time.perf_counter() - start_time
             
-            success = len(results) == len(self.test_texts) and duration < 30  # 30秒内完成
+            translated = all(result == mock_sentences(text) for text, result in zip(self.test_texts, results))
+            success = len(results) == len(self.test_texts) and translated and duration < 5
             self.log_test(
                 "性能测试", 
                 success, 
-                f"翻译 {len(self.test_texts)} 个文本耗时 {duration:.2f} 秒"
+                f"翻译 {len(self.test_texts)} 个文本耗时 {duration:.2f} 秒，上游请求 {stats['requests']} 次"
             )
             return success
         except Exception as e:
             self.log_test("性能测试", False, f"性能测试失败: {str(e)}")
             return False
+        finally:
+            await runner.cleanup()
+    
+    async def test_shared_session(self):
+        """测试并发翻译共享同一个连接池"""
+        runner, base_url, _ = await start_mock_translation_server()
+        try:
+            config = TranslationConfig(
+                service="google", endpoint=f"{base_url}/translate_a/single", cache_enabled=False
+            )
+            async with TranslationManager(config) as manager:
+                results = await asyncio.gather(*[manager.translate_text(text) for text in self.test_texts])
+                session = manager.session
+                second = await manager.translate_text(self.test_texts[0])
+                
+                success = (
+                    all(r.startswith("译文:") for r in results)
+                    and second.startswith("译文:")
+                    and manager.session is session
+                    and not session.closed
+                )
+            success = success and session.closed
+            self.log_test("共享连接池", success, f"并发翻译 {len(results)} 个文本，会话已在退出时关闭")
+            return success
+        except Exception as e:
+            self.log_test("共享连接池", False, f"连接池测试失败: {str(e)}")
+            return False
+        finally:
+            await runner.cleanup()
+    
+    async def test_bounded_batch(self):
+        """测试批量翻译的并发上限、顺序和单条失败回退"""
+        runner, base_url, stats = await start_mock_translation_server()
+        try:
+            config = TranslationConfig(
+                service="google", endpoint=f"{base_url}/translate_a/single", cache_enabled=False,
+                batch_size=1, concurrent_requests=3
+            )
+            texts = [f"Comment number {i} in a large thread" for i in range(40)]
+            texts[7] = "This comment will FAIL upstream"
+            
+            async with TranslationManager(config) as manager:
+                results = await manager.translate_batch(texts)
+            
+            in_order = all(results[i] == f"译文:{texts[i]}" for i in range(40) if i != 7)
+            success = (
+                len(results) == 40
+                and in_order
+                and results[7] == texts[7]
+                and stats["max_in_flight"] <= 3
+            )
+            self.log_test(
+                "批量并发控制",
+                success,
+                f"最大在途请求 {stats['max_in_flight']}，失败条目保留原文"
+            )
+            return success
+        except Exception as e:
+            self.log_test("批量并发控制", False, f"批量并发测试失败: {str(e)}")
+            return False
+        finally:
+            await runner.cleanup()
+    
+    async def test_multi_segment_requests(self):
+        """测试 DeepL / 百度 / OpenAI 多段文本合并请求"""
+        runner, base_url, stats = await start_mock_translation_server()
+        try:
+            texts = [f"Comment number {i} in a large thread" for i in range(30)]
+            texts[3] = "First paragraph of a post.\n\nSecond paragraph of a post."
+            request_counts = {}
+            for service, path in [
+                ("deepl", "/v2/translate"),
+                ("baidu", "/api/trans/vip/translate"),
+                ("openai", "/v1/chat/completions"),
+            ]:
+                config = TranslationConfig(
+                    service=service, endpoint=base_url + path, api_key="test", secret_key="test",
+                    cache_enabled=False, batch_size=30
+                )
+                stats["requests"] = 0
+                async with TranslationManager(config) as manager:
+                    results = await manager.translate_batch(texts)
+                # 多句文本按句翻译后拼回
+                expected = [mock_sentences(t) for t in texts]
+                if results != expected:
+                    raise AssertionError(f"{service} 译文与输入顺序不一致")
+                request_counts[service] = stats["requests"]
+            
+            # DeepL 与百度一次请求完成；OpenAI 每批 20 条文本、每次请求最多 20 句，
+            # 第一批含两句的文本共 21 句，需要 2 次请求
+            counts_ok = request_counts == {"deepl": 1, "baidu": 1, "openai": 3}
+            
+            # 单次请求只支持一段文本的服务：每个文本中没见过的句子合并为一次请求
+            class SingleSegmentTranslator(GoogleTranslator):
+                max_segments_per_request = 1
+            
+            posts = [
+                "First sentence of a post. Second sentence follows. Third one ends it.",
+                "Another post opens here. It has two sentences."
+            ]
+            config = TranslationConfig(
+                service="google", endpoint=f"{base_url}/translate_a/single", persistent_cache_enabled=False
+            )
+            async with SingleSegmentTranslator(config) as translator:
+                stats["requests"] = 0
+                first = await translator.translate_many(posts)
+                first_requests = stats["requests"]
+                # 第二句已在翻译记忆中，只发送其余两句
+                stats["requests"] = 0
+                second = await translator.translate("Second sentence follows. A new remark. And another.")
+                second_requests = stats["requests"]
+            single_ok = (
+                first == [mock_sentences(t) for t in posts] and first_requests == 2
+                and second == mock_sentences("Second sentence follows. A new remark. And another.")
+                and second_requests == 1
+            )
+            
+            success = counts_ok and single_ok
+            self.log_test(
+                "多段合并请求",
+                success,
+                f"30 段文本的请求次数: {request_counts}, 单段服务按文本合并: {single_ok} "
+                f"({len(posts)} 个文本 {first_requests} 次请求)"
+            )
+            return success
+        except Exception as e:
+            self.log_test("多段合并请求", False, f"多段请求测试失败: {str(e)}")
+            return False
+        finally:
+            await runner.cleanup()
+    
+    async def test_persistent_cache(self):
+        """测试持久化缓存在重启后命中，不再请求翻译接口"""
+        runner, base_url, stats = await start_mock_translation_server()
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                config = TranslationConfig(
+                    service="google", endpoint=f"{base_url}/translate_a/single",
+                    persistent_cache_path=os.path.join(tmpdir, "cache.db")
+                )
+                async with TranslationManager(config) as manager:
+                    first = await manager.translate_batch(self.test_texts)
+                
+                # 模拟服务器重启：新的管理器只能依赖磁盘缓存
+                requests_before = stats["requests"]
+                async with TranslationManager(config) as manager:
+                    second = await manager.translate_batch(self.test_texts)
+                restart_requests = stats["requests"] - requests_before
+                
+                # 其他版本的缓存（如文本切分方式不同）在各自的表中：不被读取，也不被删除
+                old_table = f"translations_v{CACHE_KEY_VERSION - 1}"
+                with contextlib.closing(sqlite3.connect(config.persistent_cache_path)) as conn:
+                    conn.execute(f"ALTER TABLE translations_v{CACHE_KEY_VERSION} RENAME TO {old_table}")
+                    conn.commit()
+                async with TranslationManager(config) as manager:
+                    await manager.translate_batch(self.test_texts)
+                with contextlib.closing(sqlite3.connect(config.persistent_cache_path)) as conn:
+                    old_rows = conn.execute(f"SELECT COUNT(*) FROM {old_table}").fetchone()[0]
+                stale_ok = stats["requests"] > requests_before and old_rows == len(self.test_texts)
+                
+                success = first == second and restart_requests == 0 and stale_ok
+                self.log_test(
+                    "持久化缓存",
+                    success,
+                    f"重启后重复翻译 {len(second)} 个文本，新增请求 {restart_requests} 次，"
+                    f"其他版本的缓存不读取也不删除: {stale_ok}"
+                )
+                return success
+        except Exception as e:
+            self.log_test("持久化缓存", False, f"持久化缓存测试失败: {str(e)}")
+            return False
+        finally:
+            await runner.cleanup()
+    
+    async def test_cache_eviction(self):
+        """测试内存缓存的 LRU 淘汰、字节上限和 TTL"""
+        try:
+            cache = TranslationCache(max_entries=3)
+            for key in ["a", "b", "c"]:
+                cache[key] = f"value-{key}"
+            cache.get("a")  # a 变为最近使用
+            cache["d"] = "value-d"  # 淘汰最久未使用的 b
+            lru_ok = "b" not in cache and "a" in cache and len(cache) == 3
+            
+            sized = TranslationCache(max_bytes=100)
+            for i in range(10):
+                sized[f"k{i}"] = "x" * 30
+            bytes_ok = sized.stats()["bytes"] <= 100 and "k9" in sized
+            
+            expiring = TranslationCache(ttl=0.05)
+            expiring["k"] = "v"
+            await asyncio.sleep(0.1)
+            ttl_ok = expiring.get("k") is None and expiring.stats()["expirations"] == 1
+            
+            stats = cache.stats()
+            success = lru_ok and bytes_ok and ttl_ok and stats["evictions"] == 1 and stats["hits"] == 1
+            self.log_test("缓存淘汰", success, f"统计: {stats}")
+            return success
+        except Exception as e:
+            self.log_test("缓存淘汰", False, f"缓存淘汰测试失败: {str(e)}")
+            return False
+    
+    async def test_cache_key_schema(self):
+        """测试缓存键区分服务、模型和语言，且按切分后的片段计算"""
+        try:
+            google = GoogleTranslator(TranslationConfig(service="google"))
+            deepl = GoogleTranslator(TranslationConfig(service="deepl"))
+            gpt35 = GoogleTranslator(TranslationConfig(service="openai", model="gpt-3.5-turbo"))
+            gpt4 = GoogleTranslator(TranslationConfig(service="openai", model="gpt-4"))
+            text = "Cache key schema test"
+            
+            keys = {t._get_cache_key(text) for t in (google, deepl, gpt35, gpt4)}
+            distinct_ok = len(keys) == 4
+            
+            # 长文本按片段缓存，相同的句子只翻译一次
+            runner, base_url, stats = await start_mock_translation_server()
+            try:
+                config = TranslationConfig(
+                    service="google", endpoint=f"{base_url}/translate_a/single",
+                    persistent_cache_enabled=False, max_length=50
+                )
+                prefix = "A long post body that is longer than the limit. " * 2
+                async with TranslationManager(config) as manager:
+                    await manager.translate_text(prefix + "First ending")
+                    await manager.translate_text(prefix + "Second ending")
+                # 按句缓存：第一次重复的前缀句子只发送一次（与结尾合并为 1 次请求），
+                # 第二次前缀命中缓存，只发送新的结尾
+                chunk_ok = stats["requests"] == 2
+            finally:
+                await runner.cleanup()
+            
+            success = distinct_ok and chunk_ok
+            self.log_test("缓存键格式", success, f"示例键: {google._get_cache_key(text)}")
+            return success
+        except Exception as e:
+            self.log_test("缓存键格式", False, f"缓存键测试失败: {str(e)}")
+            return False
+    
+    async def test_post_details_batch(self):
+        """测试帖子详情的所有字段一次性批量翻译"""
+        runner, base_url, stats = await start_mock_translation_server()
+        try:
+            config = TranslationConfig(
+                service="google", endpoint=f"{base_url}/translate_a/single",
+                cache_enabled=False, persistent_cache_enabled=False
+            )
+            reddit_mcp = EnhancedRedditMCP(config)
+            post = await reddit_mcp.fetch_post_details("abc123", translate=True)
+            await reddit_mcp.close()
+            
+            bodies = []
+            for comment in post["comments"]:
+                bodies.append(comment)
+                bodies.extend(comment.get("replies", []))
+            fields = [post["title"], post["selftext"]] + [item["body"] for item in bodies]
+            sentences = sum(len(re.findall(r'[.!?](?:\s|$)', text)) or 1 for text in fields)
+            success = (
+                post["title_zh"] == mock_sentences(post["title"])
+                and post["selftext_zh"] == mock_sentences(post["selftext"])
+                and all(item["body_zh"] == mock_sentences(item["body"]) for item in bodies)
+                and stats["requests"] < sentences
+            )
+            self.log_test(
+                "帖子批量翻译", success,
+                f"翻译 {len(bodies) + 2} 个字段共 {sentences} 句，请求 {stats['requests']} 次"
+            )
+            return success
+        except Exception as e:
+            self.log_test("帖子批量翻译", False, f"帖子批量翻译测试失败: {str(e)}")
+            return False
+        finally:
+            await runner.cleanup()
+    
+    async def test_deep_comment_tree(self):
+        """测试任意深度评论树的遍历、计数和格式化"""
+        try:
+            def make_comment(i):
+                return {"id": f"c{i}", "author": f"user{i}", "body": f"Comment {i}",
+                        "score": 1, "created_utc": 1703124000, "replies": []}
+            
+            # 5000 层的单链评论树，递归实现会超出 Python 递归深度
+            root = make_comment(0)
+            node = root
+            for i in range(1, 5000):
+                child = make_comment(i)
+                node["replies"].append(child)
+                node = child
+            comments = [root, make_comment("top2")]
+            
+            depths = [depth for _, depth in iter_comment_tree(comments)]
+            total_ok = count_comments(comments) == 5001 and max(depths) == 4999
+            
+            reddit_mcp = EnhancedRedditMCP(TranslationConfig(enabled=False, persistent_cache_enabled=False))
+            limited = reddit_mcp.format_comments(comments, max_depth=2)
+            depth_ok = "Comment 2" in limited and "Comment 3" not in limited and "还有 4997 条回复未展开" in limited
+            
+            capped = [c for c, _ in iter_comment_tree(comments, max_nodes=10)]
+            nodes_ok = len(capped) == 11 and capped[-1] == {"kind": "more", "count": 4991}
+            
+            success = total_ok and depth_ok and nodes_ok
+            self.log_test("深层评论树", success, f"遍历 {len(depths)} 条评论，最大深度 {max(depths)}")
+            return success
+        except Exception as e:
+            self.log_test("深层评论树", False, f"深层评论树测试失败: {str(e)}")
+            return False
+    
+    async def test_streaming_results(self):
+        """测试流式工具结果：首块尽早产出，拼接后与普通模式一致"""
+        runner, base_url, _ = await start_mock_translation_server()
+        try:
+            config = TranslationConfig(
+                service="google", endpoint=f"{base_url}/translate_a/single",
+                cache_enabled=False, persistent_cache_enabled=False
+            )
+            reddit_translator.reddit_mcp = EnhancedRedditMCP(config)
+            arguments = {"post_id": "abc123", "translate": True}
+            
+            start = time.perf_counter()
+            first_chunk_at = None
+            chunks = []
+            async for chunk in reddit_translator.stream_tool_chunks("fetch_post_details", arguments):
+                if first_chunk_at is None:
+                    first_chunk_at = time.perf_counter() - start
+                chunks.append(chunk)
+            
+            full = await reddit_translator.call_tool("fetch_post_details", arguments)
+            streamed = await reddit_translator.call_tool("fetch_post_details", dict(arguments, stream=True))
+            await reddit_translator.reddit_mcp.close()
+            
+            # 帖子和评论同时翻译（不限流）：每个请求耗时 1 秒，总耗时约为一个请求而不是两个
+            reddit_translator.reddit_mcp = EnhancedRedditMCP(TranslationConfig(
+                service="google", endpoint=f"{base_url}/slow/translate_a/single",
+                cache_enabled=False, persistent_cache_enabled=False, request_timeout=5,
+                rate_limit_requests_per_second=0
+            ))
+            start = time.perf_counter()
+            slow_chunks = [chunk async for chunk in reddit_translator.stream_tool_chunks("fetch_post_details", arguments)]
+            slow_elapsed = time.perf_counter() - start
+            await reddit_translator.reddit_mcp.close()
+            concurrent_ok = slow_elapsed < 1.5 and len(slow_chunks) == 3
+            
+            success = (
+                "".join(chunks) == full[0].text
+                and [c.text for c in streamed] == chunks
+                and len(chunks) == 3
+                and concurrent_ok
+            )
+            self.log_test(
+                "流式结果",
+                success,
+                f"{len(chunks)} 个分块，首块耗时 {first_chunk_at * 1000:.0f} ms，"
+                f"慢接口下帖子与评论同时翻译耗时 {slow_elapsed:.2f}s"
+            )
+            return success
+        except Exception as e:
+            self.log_test("流式结果", False, f"流式结果测试失败: {str(e)}")
+            return False
+        finally:
+            reddit_translator.reddit_mcp = None
+            await runner.cleanup()
+    
+    async def test_search_index(self):
+        """测试倒排索引搜索：AND/OR、排序、增量更新和中文译文搜索"""
+        try:
+            index = PostSearchIndex()
+            index.add({"id": "p1", "title": "Rust async runtime", "selftext": "Tokio internals", "subreddit": "rust"})
+            index.add({"id": "p2", "title": "Python async", "selftext": "asyncio tips and async tricks", "subreddit": "python"})
+            index.add({"id": "p3", "title": "Python packaging", "selftext": "pip and wheels", "subreddit": "python"})
+            
+            ids = lambda posts: [p["id"] for p in posts]
+            or_ok = set(ids(index.search("python async"))) == {"p1", "p2", "p3"}
+            and_ok = ids(index.search("python async", match_all=True)) == ["p2"]
+            rank_ok = ids(index.search("async"))[0] == "p2"
+            filter_ok = ids(index.search("async", subreddit="rust")) == ["p1"]
+            
+            # 增量更新：重新加入帖子后旧词条失效
+            index.add({"id": "p3", "title": "Go generics", "selftext": "", "subreddit": "golang"})
+            update_ok = "p3" not in ids(index.search("python")) and ids(index.search("generics")) == ["p3"]
+            
+            index.add_translation("p1", "Rust 异步运行时", "Tokio 内部实现")
+            zh_ok = ids(index.search("异步运行", include_translations=True)) == ["p1"] and not index.search("异步运行")
+            
+            success = or_ok and and_ok and rank_ok and filter_ok and update_ok and zh_ok
+            self.log_test(
+                "搜索索引",
+                success,
+                f"OR: {or_ok}, AND: {and_ok}, 排序: {rank_ok}, 过滤: {filter_ok}, 更新: {update_ok}, 中文: {zh_ok}"
+            )
+            return success
+        except Exception as e:
+            self.log_test("搜索索引", False, f"搜索索引测试失败: {str(e)}")
+            return False
+    
+    async def test_concurrent_post_views(self):
+        """测试并发请求各自持有副本，存储的帖子不被修改"""
+        runner, base_url, _ = await start_mock_translation_server()
+        try:
+            config = TranslationConfig(
+                service="google", endpoint=f"{base_url}/translate_a/single",
+                cache_enabled=False, persistent_cache_enabled=False
+            )
+            reddit_mcp = EnhancedRedditMCP(config)
+            translated, plain = await asyncio.gather(
+                reddit_mcp.fetch_post_details("abc123", translate=True),
+                reddit_mcp.fetch_post_details("abc123", translate=False)
+            )
+            await reddit_mcp.close()
+            
+            stored = reddit_mcp.posts_by_id["abc123"]
+            stored_comments = reddit_mcp.comments_by_post["abc123"]
+            success = (
+                "title_zh" in translated
+                and translated["comments"][0]["replies"][0].get("body_zh")
+                and "title_zh" not in plain
+                and "body_zh" not in plain["comments"][0]
+                and "title_zh" not in stored
+                and "comments" not in stored
+                and "body_zh" not in stored_comments[0]
+            )
+            self.log_test("并发请求隔离", bool(success), "翻译结果只写入各自请求的副本")
+            return bool(success)
+        except Exception as e:
+            self.log_test("并发请求隔离", False, f"并发隔离测试失败: {str(e)}")
+            return False
+        finally:
+            await runner.cleanup()
+    
+    async def test_reddit_data_source(self):
+        """测试 Reddit JSON 数据源：录制列表回放、列表缓存、条件请求和限流"""
+        runner, base_url, stats = await start_mock_reddit_server()
+        try:
+            config = TranslationConfig(enabled=False, persistent_cache_enabled=False)
+            reddit_config = RedditConfig(source="reddit", base_url=base_url, listing_ttl=0.2)
+            reddit_mcp = EnhancedRedditMCP(config, reddit_config=reddit_config)
+            try:
+                hot = await reddit_mcp.fetch_hot_threads("programming", 10, translate=False)
+                await reddit_mcp.fetch_hot_threads("programming", 10, translate=False)
+                cached_ok = stats["requests"] == 1
+                await asyncio.sleep(0.25)
+                await reddit_mcp.fetch_hot_threads("programming", 10, translate=False)
+                revalidate_ok = stats["requests"] == 2 and stats["not_modified"] == 1
+                hot_ok = (
+                    [post["id"] for post in hot] == ["rt1001", "rt2002"]
+                    and hot[0]["post_hint"] == "self" and hot[1]["post_hint"] == "link"
+                    and "&" in hot[0]["selftext"]
+                )
+                
+                # 评论树的请求参数与分页大小无关；“more”占位节点用 /api/morechildren 展开
+                details = await reddit_mcp.fetch_post_details("rt1001", translate=False)
+                comments = details["comments"]
+                expanded = comments[0]["replies"][0]["replies"]
+                more_queries = [query for query in stats["queries"] if "link_id" in query]
+                tree_ok = (
+                    details["score"] == 3121
+                    and [comment["id"] for comment in expanded] == ["c1r1a", "c1r1b", "c1r1c"]
+                    and expanded[0]["replies"][0]["id"] == "c1r1a1"
+                    and expanded[2]["replies"][-1] == {"kind": "more", "count": 1, "children": ["c1r1c3"]}
+                    and comments[1]["author"] == "[deleted]" and comments[1]["replies"] == []
+                    and count_comments(comments) == 10 and details["comment_count"] == 10
+                    and more_queries[0]["link_id"] == "t3_rt1001" and more_queries[0]["children"] == "c1r1a,c1r1b,c1r1c"
+                    and all(query.get("limit") == "500" for query in stats["queries"] if "depth" in query and "link_id" not in query)
+                )
+                
+                results = await reddit_mcp.search_posts("incremental", "programming", translate=False)
+                search_ok = [post["id"] for post in results] == ["rt1001"]
+                index_ok = [post["id"] for post in reddit_mcp.match_posts("rust")] == ["rt2002"]
+                
+                # 翻页时把最后一个帖子的 fullname 作为 Reddit 的 after 参数
+                _, after = await reddit_mcp.load_hot_threads_page("programming", 2)
+                await reddit_mcp.load_hot_threads_page("programming", 2, after)
+                hot_after_ok = stats["queries"][-1].get("after") == "t3_rt2002"
+                
+                # 评论每页 2 条，每一页都由新的服务实例（模拟重启）处理，游标不依赖内存中的评论树
+                paged, after = [], None
+                while True:
+                    page_mcp = EnhancedRedditMCP(config, reddit_config=reddit_config)
+                    try:
+                        page = await page_mcp.fetch_post_details("rt1001", translate=False, max_comments=2, after=after)
+                    finally:
+                        await page_mcp.close()
+                    paged.extend(
+                        comment["id"] for comment, _ in iter_comment_tree(page["comments"], 10, 2, page["comments_start"])
+                        if comment.get("kind") != "more"
+                    )
+                    after = page["after"]
+                    if not after:
+                        break
+                paging_ok = hot_after_ok and paged == [
+                    "c1", "c1r1", "c1r1a", "c1r1a1", "c1r1b", "c1r1c", "c1r1c1", "c1r1c2", "c2"
+                ]
+                
+                # 同一实例翻页时复用前面已展开的评论树：不再展开 c1r1 下的占位节点，也不重建存储的评论树
+                resumed, after, rebuilt = [], None, 0
+                queries_before = len(stats["queries"])
+                while True:
+                    stored = reddit_mcp.comments_by_post.get("rt1001")
+                    page = await reddit_mcp.fetch_post_details("rt1001", translate=False, max_comments=2, after=after)
+                    if reddit_mcp.comments_by_post["rt1001"] is not stored:
+                        rebuilt += 1
+                    resumed.extend(
+                        comment["id"] for comment, _ in iter_comment_tree(page["comments"], 10, 2, page["comments_start"])
+                        if comment.get("kind") != "more"
+                    )
+                    after = page["after"]
+                    if not after:
+                        break
+                expanded_again = any(
+                    query.get("children") == "c1r1a,c1r1b,c1r1c" for query in stats["queries"][queries_before:]
+                )
+                resume_ok = resumed == paged and rebuilt == 0 and not expanded_again
+                pool_ok = reddit_mcp.data_source.session is None and reddit_mcp.translation_manager.session is not None
+            finally:
+                await reddit_mcp.close()
+            
+            # 帖子存储有上限：淘汰最久未使用的帖子，评论树和搜索索引一并移除
+            bounded_mcp = EnhancedRedditMCP(config, reddit_config=RedditConfig(
+                source="reddit", base_url=base_url, post_store_entries=1
+            ))
+            try:
+                await bounded_mcp.fetch_post_details("rt1001", translate=False)
+                await bounded_mcp.fetch_hot_threads("programming", 10, translate=False)
+                evict_ok = (
+                    list(bounded_mcp.posts_by_id) == ["rt2002"]
+                    and not bounded_mcp.comments_by_post
+                    and len(bounded_mcp.search_index) == 1 and not bounded_mcp.match_posts("incremental")
+                    and list(bounded_mcp.subreddit_posts["programming"]) == ["rt2002"]
+                )
+            finally:
+                await bounded_mcp.close()
+        except Exception as e:
+            self.log_test("Reddit数据源", False, f"Reddit 数据源测试失败: {str(e)}")
+            return False
+        finally:
+            await runner.cleanup()
+        
+        # 服务端声明额度耗尽时，下一个请求等待到窗口重置
+        runner, base_url, stats = await start_mock_reddit_server(rate_limit_reset=0.3)
+        try:
+            source = RedditJSONSource(RedditConfig(source="reddit", base_url=base_url, listing_ttl=0))
+            try:
+                await source.hot_threads("programming", 5)
+                await source.post_details("rt1001")
+            finally:
+                await source.close()
+            gap = stats["times"][1] - stats["times"][0]
+            limit_ok = gap >= 0.25
+        except Exception as e:
+            self.log_test("Reddit数据源", False, f"Reddit 限流测试失败: {str(e)}")
+            return False
+        finally:
+            await runner.cleanup()
+        
+        success = all([cached_ok, revalidate_ok, hot_ok, tree_ok, search_ok, index_ok, paging_ok, resume_ok,
+                       pool_ok, evict_ok, limit_ok])
+        self.log_test(
+            "Reddit数据源",
+            success,
+            f"列表: {hot_ok}, 缓存: {cached_ok}, 条件请求: {revalidate_ok}, 评论树: {tree_ok}, "
+            f"搜索: {search_ok}, 索引: {index_ok}, 分页: {paging_ok}, 复用展开的评论树: {resume_ok}, 共享连接池: {pool_ok}, "
+            f"存储上限: {evict_ok}, 限流等待: {gap:.2f}s"
+        )
+        return success
+    
+    async def test_retry_and_failover(self):
+        """测试重试退避、请求超时、熔断和备用服务接替"""
+        runner, base_url, stats = await start_mock_translation_server()
+        try:
+            deepl = {"service": "deepl", "api_key": "test-key", "endpoint": f"{base_url}/v2/translate"}
+            
+            # 429 后按 Retry-After 退避重试，第二次成功
+            config = TranslationConfig(
+                service="google", endpoint=f"{base_url}/translate_a/single",
+                cache_enabled=False, persistent_cache_enabled=False, retry_backoff_base=0.01
+            )
+            async with TranslationManager(config) as manager:
+                retried = await manager.translate_text("RATE limited request")
+            retry_ok = retried == "译文:RATE limited request"
+            
+            # 主服务持续 503：熔断后不再请求主服务，由 DeepL 接替
+            config = TranslationConfig(
+                service="google", endpoint=f"{base_url}/dead", cache_enabled=False,
+                persistent_cache_enabled=False, max_retries=1, retry_backoff_base=0.01,
+                circuit_failure_threshold=2, fallback_services=[deepl]
+            )
+            async with TranslationManager(config) as manager:
+                texts = [f"Failover sentence number {i}" for i in range(5)]
+                results = [await manager.translate_text(text) for text in texts]
+                state = manager.translator.breaker.state
+            failover_ok = results == [f"译文:{text}" for text in texts]
+            breaker_ok = stats["dead"] == 2 and state == "open"
+            
+            # 主服务超时：等待时间受 request_timeout 限制
+            config = TranslationConfig(
+                service="google", endpoint=f"{base_url}/slow/translate_a/single", cache_enabled=False,
+                persistent_cache_enabled=False, request_timeout=0.1, max_retries=0, fallback_services=[deepl]
+            )
+            async with TranslationManager(config) as manager:
+                start = time.perf_counter()
+                timed = await manager.translate_text("Slow provider sentence")
+                elapsed = time.perf_counter() - start
+            timeout_ok = timed == "译文:Slow provider sentence" and elapsed < 0.5
+            
+            # 半开状态的探测请求被取消后，熔断器不应一直拒绝请求
+            config = TranslationConfig(
+                service="google", endpoint=f"{base_url}/slow/translate_a/single", cache_enabled=False,
+                persistent_cache_enabled=False, max_retries=0, circuit_failure_threshold=1, circuit_reset_timeout=0.05
+            )
+            async with TranslationManager(config) as manager:
+                breaker = manager.translator.breaker
+                breaker.record_failure()
+                await asyncio.sleep(0.06)
+                probe = asyncio.create_task(manager.translate_text("Cancelled probe sentence"))
+                await asyncio.sleep(0.05)
+                probing = breaker.state == "half_open" and not breaker.allow()
+                probe.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await probe
+                cancel_ok = probing and breaker.allow()
+            
+            success = retry_ok and failover_ok and breaker_ok and timeout_ok and cancel_ok
+            self.log_test(
+                "重试与故障转移",
+                success,
+                f"429重试: {retry_ok}, 接替: {failover_ok}, 熔断: {breaker_ok} "
+                f"(主服务请求 {stats['dead']} 次), 超时: {timeout_ok} ({elapsed:.2f}s), 取消探测: {cancel_ok}"
+            )
+            return success
+        except Exception as e:
+            self.log_test("重试与故障转移", False, f"重试与故障转移测试失败: {str(e)}")
+            return False
+        finally:
+            await runner.cleanup()
+    
+    async def test_provider_rate_limit(self):
+        """测试按服务商共享的令牌桶限流"""
+        runner, base_url, stats = await start_mock_translation_server()
+        try:
+            config = TranslationConfig(
+                service="deepl", api_key="test-key", endpoint=f"{base_url}/v2/translate",
+                cache_enabled=False, persistent_cache_enabled=False,
+                rate_limit_requests_per_second=20, rate_limit_burst=2
+            )
+            # 两个管理器（两个服务实例）共用同一个 DeepL 限流器
+            async with TranslationManager(config) as first, TranslationManager(config) as second:
+                shared_ok = first.translator.rate_limiter is second.translator.rate_limiter is get_provider_limiter("deepl")
+                before = dict(get_rate_limit_stats()["deepl"])
+                start = time.perf_counter()
+                await asyncio.gather(*[
+                    manager.translate_text(f"Rate limited sentence {i}")
+                    for i, manager in enumerate([first, second] * 5)
+                ])
+                elapsed = time.perf_counter() - start
+                after = get_rate_limit_stats()["deepl"]
+            
+            # 10 个请求，突发 2 个，其余按 20 次/秒发放，至少需要 0.4 秒
+            pace_ok = elapsed >= 0.35 and stats["requests"] == 10
+            metric_ok = after["requests"] - before["requests"] == 10 and after["wait_total"] > before["wait_total"]
+            
+            # 新建服务实例不会把已耗尽的令牌桶重新装满；设置改变时按新设置重置
+            limiter = get_provider_limiter("deepl")
+            TranslationManager(config)
+            same_ok = limiter.requests.tokens < 1
+            TranslationManager(TranslationConfig(
+                service="deepl", api_key="test-key", cache_enabled=False, persistent_cache_enabled=False,
+                rate_limit_requests_per_second=50, rate_limit_burst=3
+            ))
+            changed_ok = limiter.requests.rate == 50 and limiter.requests.tokens == 3
+            reconfigure_ok = same_ok and changed_ok
+            
+            # 共享的令牌桶在另一个事件循环中排队时不受先前事件循环的影响
+            async def contend():
+                await asyncio.gather(*[limiter.requests.acquire() for _ in range(5)])
+            
+            loop_ok = True
+            try:
+                await asyncio.to_thread(asyncio.run, contend())
+            except RuntimeError:
+                loop_ok = False
+            
+            success = shared_ok and pace_ok and metric_ok and reconfigure_ok and loop_ok
+            self.log_test(
+                "服务商限流",
+                success,
+                f"共享: {shared_ok}, 10 个请求耗时 {elapsed:.2f}s, 最大排队 {after['wait_max'] * 1000:.0f} ms, "
+                f"重复配置保留余额、改变设置重置: {reconfigure_ok}, 跨事件循环: {loop_ok}"
+            )
+            return success
+        except Exception as e:
+            self.log_test("服务商限流", False, f"限流测试失败: {str(e)}")
+            return False
+        finally:
+            await runner.cleanup()
+    
+    async def test_single_flight(self):
+        """测试相同文本的在途请求合并和批内去重"""
+        runner, base_url, stats = await start_mock_translation_server()
+        try:
+            config = TranslationConfig(
+                service="google", endpoint=f"{base_url}/translate_a/single",
+                cache_enabled=False, persistent_cache_enabled=False, rate_limit_requests_per_second=0
+            )
+            async with TranslationManager(config) as manager:
+                batch = ["[deleted]", "This.", "Same title everywhere", "[deleted]", "This.", "[deleted]"]
+                results = await asyncio.gather(
+                    manager.translate_batch(batch),
+                    manager.translate_text("Same title everywhere"),
+                    manager.translate_text("Same title everywhere"),
+                    manager.translate_text("[deleted]")
+                )
+                # 服务层批内重复（多段请求的服务直接调用 translate_many 时）
+                before = stats["requests"]
+                pair = await manager.translator.translate_many(["Repeated text here", "Repeated text here"])
+                pair_requests = stats["requests"] - before
+                dedup = manager.dedup_stats()
+            
+            batch_ok = results[0] == [f"译文:{text}" for text in batch]
+            single_ok = results[1] == results[2] == "译文:Same title everywhere" and results[3] == "译文:[deleted]"
+            pair_ok = pair == ["译文:Repeated text here"] * 2 and pair_requests == 1
+            # 3 个不同文本 + 1 个服务层重复文本，共 4 次上游请求
+            upstream_ok = stats["requests"] == 4
+            
+            success = batch_ok and single_ok and pair_ok and upstream_ok and dedup["dedup_ratio"] > 0
+            self.log_test(
+                "重复请求合并",
+                success,
+                f"上游请求 {stats['requests']} 次, 批内去重比例 {dedup['batch_dedup_ratio']:.0%}, "
+                f"在途合并 {dedup['coalesced']} 次, 去重比例 {dedup['dedup_ratio']:.0%}"
+            )
+            return success
+        except Exception as e:
+            self.log_test("重复请求合并", False, f"重复请求合并测试失败: {str(e)}")
+            return False
+        finally:
+            await runner.cleanup()
+    
+    async def test_long_text_chunking(self):
+        """测试长文本按段落和句子切分翻译，不再截断，修改一段后只重新翻译新句子"""
+        runner, base_url, stats = await start_mock_translation_server()
+        try:
+            config = TranslationConfig(
+                service="google", endpoint=f"{base_url}/translate_a/single",
+                persistent_cache_enabled=False, rate_limit_requests_per_second=0
+            )
+            paragraphs = [
+                " ".join(f"Paragraph {p} sentence {i} explains another detail of the design." for i in range(12))
+                for p in range(8)
+            ]
+            body = "\n\n".join(paragraphs)
+            async with TranslationManager(config) as manager:
+                limit = manager.translator.chunk_limit
+                pieces = split_text(body, limit)
+                translated = await manager.translate_text(body)
+                first_requests = stats["requests"]
+                concurrent = stats["max_in_flight"]
+                
+                # 修改其中一段后只重新翻译这一段
+                edited = "\n\n".join(paragraphs[:3] + ["This paragraph was edited after posting."] + paragraphs[4:])
+                edited_translation = await manager.translate_text(edited)
+                edit_requests = stats["requests"] - first_requests
+            
+            complete_ok = translated == mock_sentences(body) and "..." not in translated and len(body) > 5000
+            limit_ok = len(pieces) > 1 and all(len(piece) <= limit for piece in pieces)
+            edit_ok = edit_requests == 1 and edited_translation == mock_sentences(edited)
+            success = complete_ok and limit_ok and edit_ok and concurrent > 1
+            self.log_test(
+                "长文本分段",
+                success,
+                f"{len(body)} 字符切分为 {len(pieces)} 段（上限 {limit}），并发 {concurrent}，"
+                f"修改一段后新增请求 {edit_requests} 次"
+            )
+            return success
+        except Exception as e:
+            self.log_test("长文本分段", False, f"长文本分段测试失败: {str(e)}")
+            return False
+        finally:
+            await runner.cleanup()
+    
+    async def test_script_classifier(self):
+        """测试单遍文字分类：非拉丁文字跳过，混合文本和长文本按比例判断"""
+        try:
+            cases = [
+                ("This is a normal English comment.", True),
+                ("I ❤️ this “framework” 👍", True),
+                ("Naïve café benchmark", True),
+                ("This is 混合 text with a few Chinese words", True),
+                ("这是一条中文评论", False),
+                ("これはすごいですね", False),
+                ("東京で試してみました", False),
+                ("정말 유용한 정보네요", False),
+                ("Это комментарий на русском", False),
+                ("12345 67890", False),
+                ("ok", False),
+                ("", False),
+            ]
+            single = [should_translate_text(text) for text, _ in cases]
+            batch = should_translate_many([text for text, _ in cases])
+            ascii_batch = ["Plain ASCII comment number %d" % i for i in range(50)]
+            cases_ok = single == [expected for _, expected in cases]
+            batch_ok = batch == single and should_translate_many(ascii_batch) == [True] * 50
+            
+            # 只采样开头部分，长文本的判断不随长度增长
+            long_english = "An English sentence. " * 20000 + "中文" * 1000
+            long_chinese = "中文评论内容。" * 20000
+            long_ok = should_translate_text(long_english) and not should_translate_text(long_chinese)
+            scripts = [classify_script(text) for text in ("English", "中文", "かな漢字", "한국어", "Русский", "123")]
+            script_ok = scripts == ["latin", "han", "kana", "hangul", "other", "none"]
+            
+            success = cases_ok and batch_ok and long_ok and script_ok
+            self.log_test(
+                "文字分类",
+                success,
+                f"{sum(1 for result, (_, expected) in zip(single, cases) if result == expected)}/{len(cases)} 条判断正确，"
+                f"批量结果一致: {batch_ok}，文字类别: {scripts}"
+            )
+            return success
+        except Exception as e:
+            self.log_test("文字分类", False, f"文字分类测试失败: {str(e)}")
+            return False
+    
+    async def test_markdown_segmentation(self):
+        """测试 markdown 正文只翻译自然语言部分，代码、链接和引用原样保留"""
+        runner, base_url, stats = await start_mock_translation_server()
+        try:
+            config = TranslationConfig(
+                service="deepl", api_key="test-key:fx", endpoint=f"{base_url}/v2/translate",
+                persistent_cache_enabled=False, rate_limit_requests_per_second=0
+            )
+            body = (
+                "Use `asyncio.gather()` as shown in the [official docs](https://docs.python.org/3/library/asyncio.html).\n"
+                "Thanks u/gvanrossum, see r/Python for more!\n\n"
+                "&gt; Quoted text from the parent comment.\n\n"
+                "```python\nasync def main():\n    await asyncio.sleep(1)\n```\n\n"
+                "| Option | Meaning |\n|--------|---------|\n| timeout | seconds to wait |\n\n"
+                "- Benchmarks: https://example.com/bench?id=1.\n"
+            )
+            protected = [
+                "`asyncio.gather()`", "](https://docs.python.org/3/library/asyncio.html)", "u/gvanrossum", "r/Python",
+                "&gt; ", "```python\nasync def main():\n    await asyncio.sleep(1)\n```",
+                "|--------|---------|", "https://example.com/bench?id=1"
+            ]
+            spans = segment_markdown(body)
+            # 裸链接中成对的括号属于链接，句子外层的右括号和句末标点不属于链接
+            paren_spans = segment_markdown("See https://en.wikipedia.org/wiki/Foo_(bar) (or https://example.com/x).")
+            paren_ok = [span for span, translatable in paren_spans if not translatable] == [
+                "https://en.wikipedia.org/wiki/Foo_(bar)", "https://example.com/x"
+            ]
+            async with TranslationManager(config) as manager:
+                translated = await manager.translate_text(body)
+                chars = manager.char_stats()
+            
+            lossless = "".join(span for span, _ in spans) == body
+            preserved = all(part in translated for part in protected)
+            sent_ok = (
+                "译文:Use" in translated and "译文:Quoted text from the parent comment." in translated
+                and "译文:def" not in translated and "译文:asyncio.sleep" not in translated
+            )
+            # 所有自然语言片段在一次请求中发送
+            success = (
+                lossless and preserved and sent_ok and paren_ok
+                and stats["requests"] == 1 and chars["sent_chars"] < len(body) * 0.6
+            )
+            self.log_test(
+                "Markdown 分段",
+                success,
+                f"{len(spans)} 个片段，发送 {chars['sent_chars']}/{chars['original_chars']} 字符，"
+                f"请求 {stats['requests']} 次，保留内容完整: {preserved}，链接括号: {paren_ok}"
+            )
+            return success
+        except Exception as e:
+            self.log_test("Markdown 分段", False, f"Markdown 分段测试失败: {str(e)}")
+            return False
+        finally:
+            await runner.cleanup()
+    
+    async def test_translation_memory(self):
+        """测试句子级翻译记忆：引用回复和模板只发送没见过的句子，按版块统计命中率"""
+        runner, base_url, stats = await start_mock_translation_server()
+        try:
+            config = TranslationConfig(
+                service="deepl", api_key="test-key:fx", endpoint=f"{base_url}/v2/translate",
+                persistent_cache_enabled=False, rate_limit_requests_per_second=0
+            )
+            parents = [
+                f"Comment {i} makes a first point about async IO. It also argues that threads are simpler. "
+                f"Finally it links a benchmark from last year."
+                for i in range(20)
+            ]
+            # 回复引用父评论的两句，再加上自己的一句和机器人模板
+            replies = [
+                f"&gt; Comment {i} makes a first point about async IO. It also argues that threads are simpler.\n\n"
+                f"I disagree with reply {i}.\n\n"
+                "I am a bot, and this action was performed automatically. Please contact the moderators if you have questions."
+                for i in range(20)
+            ]
+            async with TranslationManager(config) as manager:
+                await manager.translate_batch(parents, "Python")
+                before = manager.char_stats()
+                translated = await manager.translate_batch(replies, "Python")
+                after = manager.char_stats()
+                await manager.translate_text("A comment in another community.", "golang")
+                # 缩写后的句点和分号不断句
+                abbreviated = await manager.translate_text(
+                    "Pick a runner, e.g. pytest or nose. Mr. Smith agrees; it works.", "golang"
+                )
+                memory = manager.memory_stats()
+            
+            reply_original = after["original_chars"] - before["original_chars"]
+            reply_sent = after["sent_chars"] - before["sent_chars"]
+            # 引用的句子命中记忆，每条回复只发送自己的一句，模板只发送一次
+            quotes_ok = all(
+                f"&gt; 译文:Comment {i} makes a first point about async IO. 译文:It also argues that threads are simpler." in text
+                for i, text in enumerate(translated)
+            )
+            # 父评论 60 句中后两句各重复 19 次；回复 100 句中引用 40 句命中，模板两句各重复 19 次
+            python = memory.get("Python", {})
+            stats_ok = python.get("segments") == 160 and python.get("hits") == 38 + 40 + 38 and "golang" in memory
+            abbreviation_ok = abbreviated == "译文:Pick a runner, e.g. pytest or nose. 译文:Mr. Smith agrees; it works."
+            success = quotes_ok and stats_ok and abbreviation_ok and reply_sent < reply_original * 0.3
+            self.log_test(
+                "句子级翻译记忆",
+                success,
+                f"引用回复发送 {reply_sent}/{reply_original} 字符，"
+                f"r/Python 命中率 {python.get('hit_rate', 0):.0%}（{python.get('hits')}/{python.get('segments')} 句），"
+                f"缩写不断句: {abbreviation_ok}"
+            )
+            return success
+        except Exception as e:
+            self.log_test("句子级翻译记忆", False, f"翻译记忆测试失败: {str(e)}")
+            return False
+        finally:
+            await runner.cleanup()
+    
+    async def test_metrics(self):
+        """测试指标注册表：工具调用、翻译请求和缓存指标，get_stats 工具和 Prometheus 接口"""
+        runner, base_url, stats = await start_mock_translation_server()
+        metrics_runner = None
+        try:
+            METRICS.reset()
+            config = TranslationConfig(
+                service="google", endpoint=f"{base_url}/translate_a/single",
+                persistent_cache_enabled=False, rate_limit_requests_per_second=0
+            )
+            reddit_translator.reddit_mcp = EnhancedRedditMCP(config)
+            arguments = {"post_id": "abc123", "translate": True}
+            await reddit_translator.call_tool("fetch_post_details", arguments)
+            await reddit_translator.call_tool("fetch_post_details", arguments)
+            result = await reddit_translator.call_tool("get_stats", {})
+            snapshot = json.loads(result[0].text)
+            
+            metrics = snapshot["metrics"]
+            counters = metrics["counters"]
+            histograms = metrics["histograms"]
+            tool_ok = (
+                counters["reddit_tool_calls_total"]["tool=fetch_post_details"] == 2
+                and histograms["reddit_tool_duration_seconds"]["tool=fetch_post_details"]["count"] == 2
+                and counters["reddit_tool_response_bytes_total"]["tool=fetch_post_details"] > 0
+            )
+            provider_ok = (
+                counters["translation_provider_requests_total"]["provider=google,status=ok"] == stats["requests"]
+                and histograms["translation_provider_request_seconds"]["provider=google"]["p50"] > 0
+                and counters["translation_bytes_out_total"]["provider=google"] > 0
+                and counters["translation_bytes_in_total"]["provider=google"] > 0
+                and "provider=google" in histograms["translation_queue_wait_seconds"]
+            )
+            # 第二次调用全部命中缓存
+            cache_ok = (
+                counters["translation_cache_hits_total"]["provider=google"] > 0
+                and counters["translation_cache_misses_total"]["provider=google"] > 0
+                and "provider=google" in counters["translation_cache_evictions_total"]
+                and snapshot["translation"]["chars"]["sent_chars"] > 0
+            )
+            
+            metrics_runner = await reddit_translator.start_metrics_server("127.0.0.1", 0)
+            port = metrics_runner.addresses[0][1]
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f"http://127.0.0.1:{port}/metrics") as response:
+                    text = await response.text()
+            prometheus_ok = (
+                "# TYPE reddit_tool_duration_seconds histogram" in text
+                and 'reddit_tool_duration_seconds_bucket{tool="fetch_post_details",le="+Inf"} 2' in text
+                and 'translation_cache_hits_total{provider="google"}' in text
+            )
+            
+            # 热路径开销：一次计数加一次直方图记录
+            labels = (("provider", "bench"),)
+            start = time.perf_counter()
+            for _ in range(100000):
+                METRICS.inc("translation_bytes_out_total", labels, 10)
+                METRICS.observe("translation_provider_request_seconds", 0.02, labels)
+            per_update = (time.perf_counter() - start) / 100000
+            
+            success = tool_ok and provider_ok and cache_ok and prometheus_ok and per_update < 20e-6
+            self.log_test(
+                "指标统计",
+                success,
+                f"工具 {tool_ok}，翻译请求 {provider_ok}，缓存 {cache_ok}，Prometheus {prometheus_ok}，"
+                f"每次记录 {per_update * 1e6:.2f} µs"
+            )
+            return success
+        except Exception as e:
+            self.log_test("指标统计", False, f"指标测试失败: {str(e)}")
+            return False
+        finally:
+            if reddit_translator.reddit_mcp is not None:
+                await reddit_translator.reddit_mcp.close()
+            reddit_translator.reddit_mcp = None
+            if metrics_runner is not None:
+                await metrics_runner.cleanup()
+            await runner.cleanup()
+            METRICS.reset()
+    
+    async def test_structured_logging(self):
+        """测试结构化日志：写入文件而不是 stdout，带字段，高频事件按比例采样"""
+        runner, base_url, stats = await start_mock_translation_server()
+        listener = None
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                path = os.path.join(tmpdir, "server.log")
+                listener = setup_logging(LoggingConfig(level="DEBUG", path=path, format="json", sample_rate=0.0))
+                config = TranslationConfig(
+                    service="google", endpoint=f"{base_url}/translate_a/single",
+                    persistent_cache_enabled=False, rate_limit_requests_per_second=0, max_retries=0
+                )
+                reddit_translator.reddit_mcp = EnhancedRedditMCP(config)
+                stdout = io.StringIO()
+                with contextlib.redirect_stdout(stdout):
+                    await reddit_translator.call_tool("fetch_post_details", {"post_id": "abc123"})
+                    await reddit_translator.call_tool("fetch_hot_threads", {"subreddit": "programming", "limit": 2})
+                    # 失败的请求总是记录，不参与采样
+                    await reddit_translator.reddit_mcp.translation_manager.translate_text("This will FAIL upstream.")
+                shutdown_logging(listener)
+                listener = None
+                with open(path, encoding="utf-8") as f:
+                    records = [json.loads(line) for line in f]
+            
+            tool_calls = [r for r in records if r["message"] == "工具调用完成"]
+            tool_ok = (
+                [r["tool"] for r in tool_calls] == ["fetch_post_details", "fetch_hot_threads"]
+                and tool_calls[0]["post_id"] == "abc123" and tool_calls[0]["latency"] >= 0
+                and tool_calls[1]["subreddit"] == "programming"
+            )
+            # 采样率为 0 时每次请求的 DEBUG 日志全部丢弃，失败仍然记录
+            sampled_ok = (
+                not any(r["message"] == "翻译请求完成" for r in records)
+                and any(r["message"] == "翻译请求失败" and r["provider"] == "google" and r["level"] == "WARNING"
+                        for r in records)
+            )
+            success = tool_ok and sampled_ok and stdout.getvalue() == ""
+            self.log_test(
+                "结构化日志",
+                success,
+                f"{len(records)} 条日志，工具调用字段 {tool_ok}，采样 {sampled_ok}，stdout 输出 {len(stdout.getvalue())} 字符"
+            )
+            return success
+        except Exception as e:
+            self.log_test("结构化日志", False, f"结构化日志测试失败: {str(e)}")
+            return False
+        finally:
+            if listener is not None:
+                shutdown_logging(listener)
+            if reddit_translator.reddit_mcp is not None:
+                await reddit_translator.reddit_mcp.close()
+            reddit_translator.reddit_mcp = None
+            await runner.cleanup()
+    
+    async def test_output_format(self):
+        """测试 output_format：紧凑 JSON 可解析，可只含原文或译文，只要原文时不请求翻译"""
+        runner, base_url, stats = await start_mock_translation_server()
+        try:
+            config = TranslationConfig(
+                service="google", endpoint=f"{base_url}/translate_a/single",
+                persistent_cache_enabled=False, rate_limit_requests_per_second=0
+            )
+            
+            async def call(name, arguments):
+                contents = await reddit_translator.call_tool(name, arguments)
+                return "".join(item.text for item in contents)
+            
+            # 只要原文：不翻译，没有 *_zh 字段
+            reddit_translator.reddit_mcp = EnhancedRedditMCP(config)
+            original = json.loads(await call("fetch_post_details", {"post_id": "abc123", "output_format": "json_original"}))
+            original_ok = (
+                stats["requests"] == 0
+                and original["post"]["id"] == "abc123"
+                and original["comment_count"] == len(original["comments"]) == 3
+                and [c["depth"] for c in original["comments"]] == [0, 1, 0]
+                and "_zh" not in json.dumps(original)
+            )
+            
+            both = json.loads(await call("fetch_post_details", {"post_id": "abc123", "output_format": "json"}))
+            comment = both["comments"][0]
+            both_ok = (
+                both["post"]["title_zh"] == mock_sentences(both["post"]["title"])
+                and comment["body_zh"] == mock_sentences(comment["body"])
+            )
+            
+            # 只要译文：字段名不带后缀，内容为译文
+            text = await call("fetch_hot_threads", {"subreddit": "programming", "limit": 2})
+            raw = await call("fetch_hot_threads", {"subreddit": "programming", "limit": 2, "output_format": "json_translation"})
+            translated = json.loads(raw)
+            translation_ok = (
+                len(translated["posts"]) == 2
+                and all(post["title"].startswith("译文:") and "title_zh" not in post for post in translated["posts"])
+                and len(raw) < len(text)
+            )
+            
+            search = json.loads(await call("search_posts", {"query": "JavaScript", "output_format": "json", "stream": True}))
+            search_ok = search["query"] == "JavaScript" and len(search["posts"]) >= 1
+            
+            invalid = await call("search_posts", {"query": "JavaScript", "output_format": "xml"})
+            invalid_ok = invalid.startswith("❌ 不支持的输出格式")
+            
+            success = original_ok and both_ok and translation_ok and search_ok and invalid_ok
+            self.log_test(
+                "输出格式",
+                success,
+                f"原文 {original_ok}，对照 {both_ok}，译文 {translation_ok}（JSON {len(raw)} 字符 / 文本 {len(text)} 字符），"
+                f"搜索 {search_ok}，无效格式 {invalid_ok}"
+            )
+            return success
+        except Exception as e:
+            self.log_test("输出格式", False, f"输出格式测试失败: {str(e)}")
+            return False
+        finally:
+            if reddit_translator.reddit_mcp is not None:
+                await reddit_translator.reddit_mcp.close()
+            reddit_translator.reddit_mcp = None
+            await runner.cleanup()
+    
+    async def test_cursor_pagination(self):
+        """测试分页游标：逐页取完不重不漏，翻页只翻译本页内容，无效游标报错"""
+        runner, base_url, stats = await start_mock_translation_server()
+        try:
+            config = TranslationConfig(
+                service="google", endpoint=f"{base_url}/translate_a/single",
+                persistent_cache_enabled=False, rate_limit_requests_per_second=0
+            )
+            reddit_translator.reddit_mcp = reddit_mcp = EnhancedRedditMCP(config)
+            
+            async def call(name, arguments):
+                contents = await reddit_translator.call_tool(name, arguments)
+                return "".join(item.text for item in contents)
+            
+            async def pages(name, arguments, key):
+                items, after = [], None
+                while True:
+                    page = json.loads(await call(name, {**arguments, "output_format": "json_original",
+                                                        **({"after": after} if after else {})}))
+                    items.extend(page[key])
+                    after = page["after"]
+                    if not after:
+                        return items
+            
+            # 热门帖子和搜索结果每页一个
+            hot = await pages("fetch_hot_threads", {"subreddit": "programming", "limit": 1}, "posts")
+            hot_ok = [p["id"] for p in hot] == [p["id"] for p in reddit_mcp.get_hot_threads("programming", 50)]
+            search = await pages("search_posts", {"query": "the", "limit": 1}, "posts")
+            search_ok = [p["id"] for p in search] == [p["id"] for p in reddit_mcp.match_posts("the")]
+            
+            # 60 条评论、多层回复的帖子，每页 7 条
+            def make_comment(i, replies=()):
+                return {"id": f"c{i}", "author": f"user{i}", "body": f"Comment {i} text.",
+                        "score": 1, "created_utc": 1703124000, "replies": list(replies)}
+            comments = [make_comment(i, [make_comment(f"{i}_{j}", [make_comment(f"{i}_{j}_0")]) for j in range(i % 3)])
+                        for i in range(20)]
+            total = count_comments(comments)
+            post = dict(reddit_mcp.posts_by_id["abc123"], id="big1")
+            reddit_mcp.add_post(post, comments)
+            expected = [c["body"] for c, _ in iter_comment_tree(comments)]
+            paged = await pages("fetch_post_details", {"post_id": "big1", "max_comments": 7}, "comments")
+            comments_ok = [c["body"] for c in paged if "body" in c] == expected
+            
+            # 第二页只翻译本页的 7 条评论，不翻译帖子
+            first = await reddit_mcp.fetch_post_details("big1", max_comments=7)
+            second = await reddit_mcp.fetch_post_details("big1", max_comments=7, after=first["after"])
+            translated = [c for c, _ in iter_comment_tree(second["comments"]) if c.get("body_zh")]
+            proportional_ok = (
+                len(translated) == 7 and "title_zh" not in second
+                and translated[0]["body"] == expected[7]
+                and translated[0]["body_zh"] == mock_sentences(expected[7])
+            )
+            
+            # 流式输出的续页与非流式相同
+            arguments = {"post_id": "big1", "max_comments": 7, "after": first["after"]}
+            stream_ok = await call("fetch_post_details", {**arguments, "stream": True}) == await call("fetch_post_details", arguments)
+            
+            invalid = await call("fetch_post_details", {"post_id": "abc123", "after": first["after"]})
+            garbage = await call("fetch_hot_threads", {"subreddit": "programming", "after": "not-a-cursor"})
+            # 评论顺序变化后旧游标指向的不再是同一条评论，报错而不是跳过或重复评论
+            reddit_mcp.add_post(post, comments[::-1])
+            stale = await call("fetch_post_details", arguments)
+            invalid_ok = "分页游标" in invalid and "分页游标" in garbage and "评论已变化" in stale
+            
+            success = hot_ok and search_ok and comments_ok and proportional_ok and stream_ok and invalid_ok
+            self.log_test(
+                "分页游标",
+                success,
+                f"热门 {len(hot)} 个 {hot_ok}，搜索 {len(search)} 个 {search_ok}，评论 {total} 条分页 {comments_ok}，"
+                f"续页翻译 {len(translated)} 条 {proportional_ok}，流式 {stream_ok}，无效游标 {invalid_ok}"
+            )
+            return success
+        except Exception as e:
+            self.log_test("分页游标", False, f"分页游标测试失败: {str(e)}")
+            return False
+        finally:
+            if reddit_translator.reddit_mcp is not None:
+                await reddit_translator.reddit_mcp.close()
+            reddit_translator.reddit_mcp = None
+            await runner.cleanup()
+    
+    async def test_startup_time(self):
+        """测试启动耗时：导入时不加载重依赖，导入和 MCP 握手在时间预算内"""
+        try:
+            imports = [await asyncio.to_thread(measure_import) for _ in range(3)]
+            import_seconds = sorted(run["seconds"] for run in imports)[1]
+            eager = imports[-1]["eager_modules"]
+            handshake = await asyncio.to_thread(measure_handshake)
+            
+            success = (
+                not eager
+                and import_seconds < STARTUP_IMPORT_BUDGET
+                and handshake["handshake"] < STARTUP_HANDSHAKE_BUDGET
+            )
+            self.log_test(
+                "启动耗时",
+                success,
+                f"导入 {import_seconds * 1000:.0f}ms（预算 {STARTUP_IMPORT_BUDGET * 1000:.0f}ms），"
+                f"握手 {handshake['handshake'] * 1000:.0f}ms（预算 {STARTUP_HANDSHAKE_BUDGET * 1000:.0f}ms），"
+                f"首次调用 {handshake['first_call'] * 1000:.0f}ms，提前加载 {eager or '无'}"
+            )
+            return success
+        except Exception as e:
+            self.log_test("启动耗时", False, f"启动耗时测试失败: {str(e)}")
+            return False
     
     def generate_report(self):
         """生成测试报告"""
@@ -240,7 +1750,7 @@ class TranslationTester:
             status = "✅" if result["success"] else "❌"
             report += f"   {status} {result['test']}: {result['message']}\n"
         
-        report += f"""
+        report += """
 
 💡 建议:
 """
@@ -275,6 +1785,7 @@ class TranslationTester:
         
         # 运行各项测试
         await self.test_config_loading()
+        await self.test_config_precedence()
         await self.test_google_translation()
         await self.test_translation_cache()
         await self.test_batch_translation()
@@ -282,6 +1793,30 @@ class TranslationTester:
         await self.test_reddit_integration()
         await self.test_error_handling()
         await self.test_performance()
+        await self.test_shared_session()
+        await self.test_bounded_batch()
+        await self.test_multi_segment_requests()
+        await self.test_persistent_cache()
+        await self.test_cache_eviction()
+        await self.test_cache_key_schema()
+        await self.test_post_details_batch()
+        await self.test_deep_comment_tree()
+        await self.test_streaming_results()
+        await self.test_search_index()
+        await self.test_concurrent_post_views()
+        await self.test_reddit_data_source()
+        await self.test_retry_and_failover()
+        await self.test_provider_rate_limit()
+        await self.test_single_flight()
+        await self.test_long_text_chunking()
+        await self.test_script_classifier()
+        await self.test_markdown_segmentation()
+        await self.test_translation_memory()
+        await self.test_metrics()
+        await self.test_structured_logging()
+        await self.test_output_format()
+        await self.test_cursor_pagination()
+        await self.test_startup_time()
         
         # 生成报告
         report = self.generate_report()